@@ -0,0 +1,132 @@
+import asyncio
+import math
+from typing import Awaitable, Callable, Optional
+
+from fastapi import HTTPException
+
+from app.config import INTENT_BATCH_WINDOW_MS, INTENT_BATCH_MAX_SIZE
+from app.services.admission import current_max_wait, current_priority
+
+IntentResult = tuple[str, float]
+
+
+class IntentBatcher:
+    """Coalesce concurrent intent classifications into shared LLM calls.
+
+    Identical inputs that are already in flight share one pending future
+    (single-flight). Distinct inputs are collected for up to ``window_ms`` or
+    until ``max_size`` are pending, then classified with one batched prompt and
+    the results are fanned back out to the waiting callers.
+
+    A batch runs at the best admission priority and the tightest wait budget
+    among the callers in it, so an interactive request is never queued behind
+    the class of whoever happened to open the window.
+    """
+
+    def __init__(
+        self,
+        classify_one: Callable[[str], Awaitable[IntentResult]],
+        classify_many: Callable[[list[str]], Awaitable[list[IntentResult]]],
+        window_ms: float = INTENT_BATCH_WINDOW_MS,
+        max_size: int = INTENT_BATCH_MAX_SIZE,
+    ):
+        self.classify_one = classify_one
+        self.classify_many = classify_many
+        self.window = max(window_ms, 0.0) / 1000
+        self.max_size = max(max_size, 1)
+        self._inflight: dict[str, asyncio.Future] = {}
+        self._pending: list[str] = []
+        self._priority: Optional[int] = None
+        self._max_wait = math.inf
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: set[asyncio.Task] = set()
+        self.coalesced = 0
+        self.batches = 0
+        self.batched_inputs = 0
+
+    async def classify(self, raw_input: str) -> IntentResult:
+        """Classify one input, sharing work with identical and concurrent requests."""
+        future = self._inflight.get(raw_input)
+        if future is not None:
+            self.coalesced += 1
+            if raw_input in self._pending:
+                self._join()
+        else:
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            self._inflight[raw_input] = future
+            self._pending.append(raw_input)
+            self._join()
+            if len(self._pending) >= self.max_size:
+                self._flush()
+            elif self._timer is None:
+                self._timer = loop.call_later(self.window, self._flush)
+        # Shield so one cancelled caller does not cancel the result others wait on
+        return await asyncio.shield(future)
+
+    def _join(self) -> None:
+        """Fold the calling request's priority and wait budget into the pending batch."""
+        priority = current_priority.get()
+        if self._priority is None or priority < self._priority:
+            self._priority = priority
+        max_wait = current_max_wait.get()
+        if max_wait is not None:
+            self._max_wait = min(self._max_wait, max_wait)
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, []
+        priority, max_wait = self._priority, self._max_wait
+        self._priority, self._max_wait = None, math.inf
+        task = asyncio.get_running_loop().create_task(
+            self._run(batch, priority, None if math.isinf(max_wait) else max_wait)
+        )
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: list[str], priority: int, max_wait: Optional[float]) -> None:
+        # The task copied the context of whoever flushed; run at the batch's own class instead
+        current_priority.set(priority)
+        current_max_wait.set(max_wait)
+        self.batches += 1
+        self.batched_inputs += len(batch)
+        try:
+            if len(batch) == 1:
+                results = [await self.classify_one(batch[0])]
+            else:
+                try:
+                    results = await self.classify_many(batch)
+                except HTTPException:
+                    # Shed or rate limited: retrying item by item would only add load
+                    raise
+                except Exception:
+                    results = None
+                if results is None or len(results) != len(batch):
+                    # Batched prompt failed or came back misaligned; classify individually
+                    results = await asyncio.gather(*(self.classify_one(text) for text in batch))
+        except BaseException as e:
+            for text in batch:
+                future = self._inflight.pop(text, None)
+                if future is not None and not future.done():
+                    future.set_exception(e)
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            return
+
+        for text, result in zip(batch, results):
+            future = self._inflight.pop(text, None)
+            if future is not None and not future.done():
+                future.set_result(result)
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "in_flight": len(self._inflight),
+            "pending": len(self._pending),
+            "coalesced": self.coalesced,
+            "batches": self.batches,
+            "batched_inputs": self.batched_inputs,
+        }
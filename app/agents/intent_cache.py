@@ -0,0 +1,103 @@
+import hashlib
+import json
+import logging
+import re
+from typing import Optional
+
+from app.config import INTENT_CACHE_SIZE, INTENT_CACHE_TTL
+from app.utils.cache import TTLCache
+from app.utils.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_input(raw_input: str) -> str:
+    """Casefold and collapse whitespace so trivially different inputs share an entry."""
+    return _WHITESPACE.sub(" ", raw_input.casefold()).strip()
+
+
+class IntentCache:
+    """Two-tier intent result cache: in-process LRU in front of an optional shared Redis tier.
+
+    Keys are a digest of the normalized input namespaced by ``version``; changing
+    the version (e.g. when the prompt or model changes) invalidates every entry at once.
+    """
+
+    def __init__(self, version: str, maxsize: int = INTENT_CACHE_SIZE, ttl: float = INTENT_CACHE_TTL):
+        self.version = version
+        self.ttl = ttl
+        self.local = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.shared_hits = 0
+        self.shared_misses = 0
+        self.shared_errors = 0
+
+    def key(self, raw_input: str) -> str:
+        digest = hashlib.sha256(normalize_input(raw_input).encode("utf-8")).hexdigest()
+        return f"intent:{self.version}:{digest}"
+
+    async def get(self, raw_input: str) -> Optional[tuple[str, float]]:
+        key = self.key(raw_input)
+        result = self.local.get(key)
+        if result is not None:
+            return result
+
+        client = get_redis()
+        if client is None:
+            return None
+        try:
+            value = await client.get(key)
+        except Exception as e:
+            self.shared_errors += 1
+            logger.warning("Intent cache Redis get failed: %s", e)
+            return None
+        if value is None:
+            self.shared_misses += 1
+            return None
+
+        self.shared_hits += 1
+        intent, confidence = json.loads(value)
+        result = (intent, float(confidence))
+        self.local.set(key, result)
+        return result
+
+    async def set(self, raw_input: str, result: tuple[str, float], shared: bool = True) -> None:
+        """Store a result locally and, when ``shared``, in Redis for other workers."""
+        key = self.key(raw_input)
+        self.local.set(key, result)
+        if not shared:
+            return
+        client = get_redis()
+        if client is None:
+            return
+        try:
+            await client.set(key, json.dumps(result), ex=int(self.ttl))
+        except Exception as e:
+            self.shared_errors += 1
+            logger.warning("Intent cache Redis set failed: %s", e)
+
+    async def invalidate(self, raw_input: str) -> None:
+        key = self.key(raw_input)
+        self.local.delete(key)
+        client = get_redis()
+        if client is not None:
+            try:
+                await client.delete(key)
+            except Exception as e:
+                self.shared_errors += 1
+                logger.warning("Intent cache Redis delete failed: %s", e)
+
+    def set_version(self, version: str) -> None:
+        """Switch to a new key namespace; old Redis entries simply age out."""
+        if version != self.version:
+            self.version = version
+            self.local.clear()
+
+    def stats(self) -> dict[str, int]:
+        return {
+            **self.local.stats(),
+            "shared_hits": self.shared_hits,
+            "shared_misses": self.shared_misses,
+            "shared_errors": self.shared_errors,
+        }
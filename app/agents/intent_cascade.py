@@ -0,0 +1,67 @@
+from collections import Counter
+from typing import Awaitable, Callable, Optional
+
+from app.config import (
+    INTENT_CASCADE_MODELS,
+    INTENT_CASCADE_MAX_DEPTH,
+    INTENT_CASCADE_DEFAULT_THRESHOLD,
+    INTENT_CASCADE_THRESHOLDS,
+)
+
+IntentResult = tuple[str, float]
+
+
+class IntentCascade:
+    """Escalate intent classification through models ordered from cheapest to largest.
+
+    A stage's answer is accepted once its confidence reaches the threshold for
+    the predicted intent; otherwise the next model is tried, up to ``max_depth``
+    stages. If no stage is confident, the most confident answer seen is returned.
+    """
+
+    def __init__(
+        self,
+        models: list[str] = INTENT_CASCADE_MODELS,
+        max_depth: int = INTENT_CASCADE_MAX_DEPTH,
+        default_threshold: float = INTENT_CASCADE_DEFAULT_THRESHOLD,
+        thresholds: Optional[dict[str, float]] = None,
+    ):
+        if not models:
+            raise ValueError("The intent cascade needs at least one model")
+        self.models = models[:max(max_depth, 1)]
+        self.default_threshold = default_threshold
+        self.thresholds = INTENT_CASCADE_THRESHOLDS if thresholds is None else thresholds
+        self.resolved: Counter[str] = Counter()
+        self.unresolved = 0
+
+    def accepts(self, intent: str, confidence: float) -> bool:
+        return confidence >= self.thresholds.get(intent, self.default_threshold)
+
+    async def run(
+        self,
+        raw_input: str,
+        classify: Callable[[str, str], Awaitable[IntentResult]],
+        start: int = 0,
+        first: Optional[IntentResult] = None,
+    ) -> IntentResult:
+        """Classify ``raw_input`` from stage ``start``; ``first`` is an answer already obtained below it."""
+        best = first
+        for model in self.models[start:]:
+            intent, confidence = await classify(raw_input, model)
+            if self.accepts(intent, confidence):
+                self.resolved[model] += 1
+                return intent, confidence
+            if best is None or confidence > best[1]:
+                best = (intent, confidence)
+        self.unresolved += 1
+        return best if best is not None else ("unknown", 0.0)
+
+    def record(self, stage: int, result: IntentResult) -> bool:
+        """Count a result obtained outside ``run`` (e.g. batched); returns whether it was accepted."""
+        if self.accepts(*result):
+            self.resolved[self.models[stage]] += 1
+            return True
+        return False
+
+    def stats(self) -> dict:
+        return {"resolved_by_model": dict(self.resolved), "unresolved": self.unresolved}
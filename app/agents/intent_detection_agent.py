@@ -1,8 +1,36 @@
 from app.utils.intent_detection import rule_based_intent_detection
-from app.llm.factory import llm
+from app.utils.semantic_intent import semantic_intent_classifier
+from app.agents.intent_batcher import IntentBatcher
+from app.agents.intent_cache import IntentCache
+from app.agents.intent_cascade import IntentCascade
+from app.config import (
+    INTENT_CACHE_VERSION,
+    INTENT_STRUCTURED_OUTPUT,
+    INTENT_MAX_TOKENS,
+    INTENT_BATCH_MAX_TOKENS_PER_ITEM,
+)
+from app.llm.factory import StreamInfo, llm
+from app.services.intent_analytics import intent_rollups
+from app.utils.json_stream import JsonObjectStreamParser
+from app.utils.metrics import registry, timed
+import asyncio
+import hashlib
+import httpx
 import json
+import logging
 import re
 
+logger = logging.getLogger(__name__)
+
+INTENT_STAGE_SECONDS = registry.histogram(
+    "intent_stage_seconds", "Time spent in each stage of the intent pipeline", ["stage"]
+)
+INTENT_RESOLVED = registry.counter("intent_resolved_total", "Intent detections by the tier that answered", ["tier"])
+INTENT_CACHE_STATS = registry.gauge("intent_cache_stats", "Intent cache size and event counts since startup", ["stat"])
+INTENT_CASCADE_RESOLVED = registry.gauge("intent_cascade_resolved", "Intents accepted at each cascade model since startup", ["model"])
+INTENT_CASCADE_UNRESOLVED = registry.gauge("intent_cascade_unresolved", "Intents no cascade model was confident about since startup")
+INTENT_BATCHER_STATS = registry.gauge("intent_batcher_stats", "Intent batcher queue sizes and counts since startup", ["stat"])
+
 INTENT_PROMPT = """
 You are an intent classifier. Return JSON only.
 
@@ -19,6 +47,63 @@ Reply format:
 {"intent": "...", "confidence": 0.0}
 """
 
+BATCH_INTENT_PROMPT = """
+You are an intent classifier. Classify every numbered user input below. Return JSON only.
+
+Intents:
+- greeting
+- task_request
+- summarization
+- rag_query
+- coding_help
+- agent_command
+- unknown
+
+Reply with a JSON object whose "results" array holds exactly one object per input, in input order:
+{"results": [{"intent": "...", "confidence": 0.0}, ...]}
+"""
+
+INTENTS = ["greeting", "task_request", "summarization", "rag_query", "coding_help", "agent_command", "unknown"]
+
+_INTENT_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "intent": {"type": "string", "enum": INTENTS},
+        "confidence": {"type": "number", "minimum": 0, "maximum": 1},
+    },
+    "required": ["intent", "confidence"],
+    "additionalProperties": False,
+}
+
+# Grammar-constrained output: the server can only emit the JSON we parse
+INTENT_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {"name": "intent", "strict": True, "schema": _INTENT_SCHEMA},
+}
+
+BATCH_INTENT_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "intents",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {"results": {"type": "array", "items": _INTENT_SCHEMA}},
+            "required": ["results"],
+            "additionalProperties": False,
+        },
+    },
+}
+
+
+def _completion_params(response_format: dict, max_tokens: int) -> dict:
+    params = {"temperature": 0, "max_tokens": max_tokens}
+    if INTENT_STRUCTURED_OUTPUT:
+        params["response_format"] = response_format
+    return params
+
+intent_cascade = IntentCascade()
+
 
 def extract_json_from_text(text: str) -> dict:
     """Extract JSON from text that might contain extra content."""
@@ -70,36 +155,183 @@ def extract_json_from_text(text: str) -> dict:
     raise ValueError(f"Could not extract valid JSON from LLM response. Response: {text[:200]}")
 
 
-async def llm_intent_detection(raw_input: str) -> tuple[str, float]:
-    """LLM intent detection."""
+async def _stream_intent_json(prompt: str, model: str) -> tuple[dict | None, str]:
+    """Stream an intent completion and stop as soon as a complete object has arrived.
+
+    Returns the parsed object (or None) and the text received so far.
+    """
+    parser = JsonObjectStreamParser()
+    messages = [{"role": "user", "content": prompt}]
+    params = _completion_params(INTENT_RESPONSE_FORMAT, INTENT_MAX_TOKENS)
+    info = StreamInfo()
+    stream = llm.chat_stream(messages, model=model, info=info, **params)
+    try:
+        async for delta in stream:
+            result = parser.feed(delta)
+            if result is not None and "intent" in result and "confidence" in result:
+                break
+        else:
+            return None, parser.buffer
+    finally:
+        # Closing early drops the upstream request so the server stops generating
+        await stream.aclose()
+    if not info.cached and not info.finished:
+        # A live stream cut short never reached chat_stream's own caching; store the complete object
+        await llm.remember_completion(messages, parser.buffer, model=model, **params)
+    return result, parser.buffer
+
+
+async def classify_with_model(raw_input: str, model: str) -> tuple[str, float]:
+    """LLM intent detection with one specific model."""
     prompt = f"{INTENT_PROMPT}\n\nUser input: {raw_input}"
     try:
-        response = await llm.chat([
-            {"role": "user", "content": prompt}
-        ])
-        
-        if not response:
-            print("Warning: Empty response from LLM")
-            return "unknown", 0.0
-        
-        print(f"LLM Response: {response[:200]}")  # Debug: log first 200 chars
-        
-        result = extract_json_from_text(response)
-        
+        result, response = await _stream_intent_json(prompt, model)
+
+        if result is None:
+            if not response:
+                logger.warning("Empty response from LLM (model=%s)", model)
+                return "unknown", 0.0
+            logger.debug("Unparsed LLM response: %s", response[:200])
+            # Server ignored the schema or stopped early; fall back to the lenient extractor
+            result = extract_json_from_text(response)
+
         intent = result.get("intent", "unknown")
         confidence = float(result.get("confidence", 0.0))
-        
+
         return intent, confidence
-    except (json.JSONDecodeError, ValueError, KeyError) as e:
-        # Fallback to unknown intent if LLM fails
-        print(f"Error in LLM intent detection: {str(e)}")
+    except (json.JSONDecodeError, ValueError, KeyError, httpx.HTTPError) as e:
+        # Fallback to unknown intent if LLM fails; the cascade may escalate it
+        logger.warning("LLM intent detection failed (model=%s): %s", model, e)
         return "unknown", 0.0
 
 
+async def llm_intent_detection(raw_input: str) -> tuple[str, float]:
+    """LLM intent detection, escalating through the model cascade until confident."""
+    return await intent_cascade.run(raw_input, classify_with_model)
+
+
+def extract_json_array_from_text(text: str) -> list:
+    """Extract a JSON array from text that might contain extra content."""
+    if not text or not text.strip():
+        raise ValueError("Empty response from LLM")
+
+    first_bracket = text.find('[')
+    last_bracket = text.rfind(']')
+    if first_bracket == -1 or last_bracket <= first_bracket:
+        raise ValueError(f"Could not find a JSON array in LLM response. Response: {text[:200]}")
+
+    json_str = text[first_bracket:last_bracket + 1]
+    json_str = re.sub(r',\s*}', '}', json_str)  # Remove trailing commas
+    json_str = re.sub(r',\s*]', ']', json_str)  # Remove trailing commas in arrays
+    result = json.loads(json_str)
+    if not isinstance(result, list):
+        raise ValueError("LLM response is not a JSON array")
+    return result
+
+
+async def llm_intent_detection_batch(raw_inputs: list[str]) -> list[tuple[str, float]]:
+    """LLM intent detection for several inputs with one batched prompt.
+
+    The batch goes to the first cascade model; answers it isn't confident about
+    escalate individually to the larger models.
+    """
+    numbered = "\n".join(f"{i + 1}. {json.dumps(text)}" for i, text in enumerate(raw_inputs))
+    prompt = f"{BATCH_INTENT_PROMPT}\n\nUser inputs:\n{numbered}"
+    max_tokens = INTENT_BATCH_MAX_TOKENS_PER_ITEM * len(raw_inputs) + 16
+    response = await llm.chat([
+        {"role": "user", "content": prompt}
+    ], model=intent_cascade.models[0], **_completion_params(BATCH_INTENT_RESPONSE_FORMAT, max_tokens))
+
+    items = extract_json_array_from_text(response)
+    if len(items) != len(raw_inputs):
+        raise ValueError(f"Expected {len(raw_inputs)} results from LLM, got {len(items)}")
+
+    results = []
+    for item in items:
+        if not isinstance(item, dict):
+            raise ValueError("Batched LLM result is not a JSON object")
+        results.append((item.get("intent", "unknown"), float(item.get("confidence", 0.0))))
+
+    escalated = [i for i, result in enumerate(results) if not intent_cascade.record(0, result)]
+    if escalated:
+        answers = await asyncio.gather(*(
+            intent_cascade.run(raw_inputs[i], classify_with_model, start=1, first=results[i]) for i in escalated
+        ))
+        for i, answer in zip(escalated, answers):
+            results[i] = answer
+    return results
+
+
+intent_batcher = IntentBatcher(llm_intent_detection, llm_intent_detection_batch)
+
+
+def intent_cache_version() -> str:
+    """Cache namespace; changes whenever the prompts, cascade models or INTENT_CACHE_VERSION change."""
+    fingerprint = "\n".join([
+        INTENT_CACHE_VERSION, *intent_cascade.models, INTENT_PROMPT, BATCH_INTENT_PROMPT, json.dumps(INTENT_RESPONSE_FORMAT)
+    ])
+    return hashlib.sha256(fingerprint.encode("utf-8")).hexdigest()[:16]
+
+
+intent_cache = IntentCache(version=intent_cache_version())
+
+
+def collect_metrics() -> None:
+    for name, value in intent_cache.stats().items():
+        INTENT_CACHE_STATS.labels(name).set(value)
+    cascade = intent_cascade.stats()
+    for model in intent_cascade.models:
+        INTENT_CASCADE_RESOLVED.labels(model).set(cascade["resolved_by_model"].get(model, 0))
+    INTENT_CASCADE_UNRESOLVED.set(cascade["unresolved"])
+    for name, value in intent_batcher.stats().items():
+        INTENT_BATCHER_STATS.labels(name).set(value)
+
+
+registry.collect(collect_metrics)
+
+
+def record_resolution(tier: str, intent: str, confidence: float, count: int = 1) -> None:
+    """Count detections answered by ``tier`` in the metrics and the analytics rollups."""
+    INTENT_RESOLVED.labels(tier).inc(count)
+    intent_rollups.record(intent, confidence, tier, count)
+
+
+async def detect_intent_with_tier(raw_input: str) -> tuple[str, float, str]:
+    """Intent detection that also reports which tier answered (rules, cache, semantic or llm).
+
+    Rules run first: they take microseconds, less than hashing the input for
+    the cache (let alone a Redis round trip), so the cache only fronts the
+    semantic and LLM tiers.
+    """
+    with timed(INTENT_STAGE_SECONDS.labels("rules")):
+        intent, confidence = rule_based_intent_detection(raw_input)
+    if intent is not None:
+        record_resolution("rules", intent, confidence)
+        return intent, confidence, "rules"
+
+    with timed(INTENT_STAGE_SECONDS.labels("cache")):
+        cached = await intent_cache.get(raw_input)
+    if cached is not None:
+        record_resolution("cache", *cached)
+        return (*cached, "cache")
+
+    with timed(INTENT_STAGE_SECONDS.labels("semantic")):
+        intent, confidence = semantic_intent_classifier.predict(raw_input)
+    if intent is not None:
+        record_resolution("semantic", intent, confidence)
+        await intent_cache.set(raw_input, (intent, confidence), shared=False)
+        return intent, confidence, "semantic"
+
+    with timed(INTENT_STAGE_SECONDS.labels("llm")):
+        intent, confidence = await intent_batcher.classify(raw_input)
+    record_resolution("llm", intent, confidence)
+    if confidence:
+        # A zero confidence means the LLM call failed; don't pin that result
+        await intent_cache.set(raw_input, (intent, confidence))
+    return intent, confidence, "llm"
+
+
 async def intent_detection_agent(raw_input: str) -> tuple[str, float]:
     """Intent detection agent."""
-    intent, confidence = rule_based_intent_detection(raw_input)
-    if intent is None:
-        print("LLM intent detection...")
-        intent, confidence = await llm_intent_detection(raw_input)
-    return intent, confidence
\ No newline at end of file
+    intent, confidence, _ = await detect_intent_with_tier(raw_input)
+    return intent, confidence
@@ -0,0 +1,242 @@
+"""Classify a JSONL corpus offline with the same pipeline as ``/detect-intent``.
+
+    python -m app.classify_jsonl requests.jsonl -o intents.jsonl --workers 4 --concurrency 32
+
+The input is streamed in chunks of ``--chunk-size`` lines. Rule matching for a
+chunk is sharded across a process pool; lines the rules miss go through
+``intent_detection_agent`` (cache, semantic classifier, LLM) on the event loop
+with at most ``--concurrency`` in flight. Chunks overlap in a pipeline but are
+written in input order, and after each one the input and output byte offsets
+are saved to ``<output>.checkpoint``. Re-running the same command resumes after
+the last completed chunk; output past the checkpoint is truncated first.
+
+Each output line mirrors an ``Intent`` row plus the input line number. With
+``--persist`` the rows are also bulk-inserted into the intents table and
+counted in the analytics rollups (a crash between the insert and the
+checkpoint can repeat one chunk there).
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import BinaryIO, Optional
+
+from app.agents.intent_detection_agent import intent_detection_agent, record_resolution
+from app.db import dispose_engine
+from app.llm.factory import llm
+from app.models.intent import Intent
+from app.services.intent_analytics import intent_rollups
+from app.services.intent_writer import intent_writer
+from app.utils.intent_detection import classify_many
+from app.utils.semantic_intent import semantic_intent_classifier
+
+TEXT_FIELDS = ("message", "text", "body", "raw_input", "title")
+_INTENT_COLUMNS = [column.name for column in Intent.__table__.columns if column.name != "id"]
+
+
+def extract_text(line: bytes, field: Optional[str]) -> Optional[str]:
+    """The text to classify from one JSONL line (a JSON string, or an object's ``field``)."""
+    try:
+        record = json.loads(line)
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        return None
+    if isinstance(record, str):
+        return record
+    if not isinstance(record, dict):
+        return None
+    for key in (field,) if field else TEXT_FIELDS:
+        value = record.get(key)
+        if isinstance(value, str) and value:
+            return value
+    return None
+
+
+class Checkpoint:
+    """Byte offsets of the last fully written chunk, saved atomically next to the output."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.input_offset = 0
+        self.output_size = 0
+        self.lines = 0
+        self.counts: dict[str, int] = {}
+
+    def load(self, input_path: str) -> bool:
+        if not os.path.exists(self.path):
+            return False
+        with open(self.path, encoding="utf-8") as f:
+            state = json.load(f)
+        if state.get("input") != os.path.abspath(input_path):
+            raise SystemExit(f"{self.path} belongs to {state.get('input')}; remove it or choose another output")
+        self.input_offset = state["input_offset"]
+        self.output_size = state["output_size"]
+        self.lines = state["lines"]
+        self.counts = state.get("counts", {})
+        return True
+
+    def save(self, input_path: str) -> None:
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({
+                "input": os.path.abspath(input_path),
+                "input_offset": self.input_offset,
+                "output_size": self.output_size,
+                "lines": self.lines,
+                "counts": self.counts,
+            }, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+
+
+def _intent_row(record: dict) -> dict:
+    row = {column: record[column] for column in _INTENT_COLUMNS}
+    row["created_at"] = datetime.fromisoformat(record["created_at"])
+    return row
+
+
+def read_chunk(f: BinaryIO, size: int) -> list[bytes]:
+    lines = []
+    while len(lines) < size:
+        line = f.readline()
+        if not line:
+            break
+        lines.append(line)
+    return lines
+
+
+async def classify_rules(pool: Optional[ProcessPoolExecutor], texts: list[str], workers: int) -> list[tuple]:
+    """Rule results for ``texts``, split into one shard per worker."""
+    if pool is None or len(texts) < 2 * workers:
+        return classify_many(texts)
+    loop = asyncio.get_running_loop()
+    step = -(-len(texts) // workers)
+    shards = await asyncio.gather(*(
+        loop.run_in_executor(pool, classify_many, texts[start:start + step]) for start in range(0, len(texts), step)
+    ))
+    return [result for shard in shards for result in shard]
+
+
+async def process_chunk(lines: list[bytes], first_line: int, field: Optional[str], pool: Optional[ProcessPoolExecutor],
+                        workers: int, semaphore: asyncio.Semaphore) -> list[dict]:
+    texts = [extract_text(line, field) for line in lines]
+    present = [i for i, text in enumerate(texts) if text is not None]
+    rules = await classify_rules(pool, [texts[i] for i in present], workers)
+
+    results: list[Optional[tuple[str, float]]] = [None] * len(lines)
+    misses = []
+    for i, (intent, confidence) in zip(present, rules):
+        if intent is not None:
+            results[i] = (intent, confidence)
+            record_resolution("rules", intent, confidence)
+        else:
+            misses.append(i)
+
+    async def fallback(i: int) -> None:
+        async with semaphore:
+            results[i] = await intent_detection_agent(texts[i])
+
+    await asyncio.gather(*(fallback(i) for i in misses))
+
+    records = []
+    now = datetime.utcnow().isoformat()
+    for offset, (text, result) in enumerate(zip(texts, results)):
+        line = first_line + offset
+        if result is None:
+            records.append({"line": line, "error": "no text to classify"})
+            continue
+        values = {"name": result[0], "confidence": result[1], "raw_input": text, "description": None, "created_at": now}
+        records.append({"line": line, **{column: values[column] for column in _INTENT_COLUMNS}})
+    return records
+
+
+async def run(args) -> Checkpoint:
+    checkpoint = Checkpoint(f"{args.output}.checkpoint")
+    if args.restart and os.path.exists(checkpoint.path):
+        os.remove(checkpoint.path)
+    resumed = checkpoint.load(args.input)
+    if resumed:
+        print(f"Resuming at line {checkpoint.lines} (byte {checkpoint.input_offset})", file=sys.stderr)
+
+    await llm.start()
+    semantic_intent_classifier.load()
+    semaphore = asyncio.Semaphore(max(args.concurrency, 1))
+    pool = ProcessPoolExecutor(max_workers=args.workers) if args.workers > 0 else None
+    started = time.perf_counter()
+    done_at_start = checkpoint.lines
+
+    try:
+        with open(args.input, "rb") as source, open(args.output, "ab") as sink:
+            # Drop anything written after the last checkpoint
+            sink.truncate(checkpoint.output_size if resumed else 0)
+            source.seek(checkpoint.input_offset if resumed else 0)
+            next_line = checkpoint.lines
+            in_flight: deque[tuple[asyncio.Task, int, int]] = deque()
+
+            async def write_oldest() -> None:
+                task, end_offset, count = in_flight.popleft()
+                records = await task
+                sink.write(b"".join(json.dumps(record).encode("utf-8") + b"\n" for record in records))
+                sink.flush()
+                os.fsync(sink.fileno())
+                if args.persist:
+                    await intent_writer.insert_many([_intent_row(record) for record in records if "error" not in record])
+                    await intent_rollups.flush()
+                for record in records:
+                    key = record.get("name", "error")
+                    checkpoint.counts[key] = checkpoint.counts.get(key, 0) + 1
+                checkpoint.input_offset = end_offset
+                checkpoint.output_size = sink.tell()
+                checkpoint.lines += count
+                checkpoint.save(args.input)
+                elapsed = time.perf_counter() - started
+                rate = (checkpoint.lines - done_at_start) / elapsed if elapsed else 0.0
+                print(f"{checkpoint.lines} lines done ({rate:.0f} lines/s)", file=sys.stderr)
+
+            while True:
+                lines = read_chunk(source, args.chunk_size)
+                if not lines:
+                    break
+                task = asyncio.create_task(process_chunk(lines, next_line, args.field, pool, args.workers, semaphore))
+                in_flight.append((task, source.tell(), len(lines)))
+                next_line += len(lines)
+                # Bounded pipeline: read ahead at most --pipeline-depth chunks
+                while len(in_flight) >= args.pipeline_depth:
+                    await write_oldest()
+            while in_flight:
+                await write_oldest()
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+        await llm.aclose()
+        await dispose_engine()
+
+    os.remove(checkpoint.path)
+    return checkpoint
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Classify the intents of every line in a JSONL file")
+    parser.add_argument("input", help="JSONL file; each line a JSON string or an object with a text field")
+    parser.add_argument("-o", "--output", required=True, help="JSONL results file (appended to when resuming)")
+    parser.add_argument("--field", help=f"field holding the text (default: first of {', '.join(TEXT_FIELDS)})")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="rule-matching processes (0: in-process)")
+    parser.add_argument("--concurrency", type=int, default=32, help="max lines in the LLM fallback at once")
+    parser.add_argument("--chunk-size", type=int, default=5000, help="lines per chunk (and per checkpoint)")
+    parser.add_argument("--pipeline-depth", type=int, default=2, help="chunks processed concurrently")
+    parser.add_argument("--persist", action="store_true", help="also insert the results into the intents table")
+    parser.add_argument("--restart", action="store_true", help="ignore an existing checkpoint and start over")
+    args = parser.parse_args()
+
+    checkpoint = asyncio.run(run(args))
+    print(f"Classified {checkpoint.lines} lines -> {args.output}")
+    print(json.dumps(checkpoint.counts, indent=2, sort_keys=True))
+
+
+if __name__ == "__main__":
+    main()
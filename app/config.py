@@ -17,3 +17,161 @@ ALGORITHM = os.getenv("ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
 REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "7"))
 
+
+# LLM client configuration
+LLM_BASE_URL = os.getenv("LLM_BASE_URL", "http://127.0.0.1:1234")
+# Comma-separated OpenAI-compatible endpoints to balance across (defaults to LLM_BASE_URL)
+LLM_BASE_URLS = [url.strip() for url in os.getenv("LLM_BASE_URLS", LLM_BASE_URL).split(",") if url.strip()]
+LLM_MODEL = os.getenv("LLM_MODEL", "google/gemma-3-4b")
+
+# Connection pool limits for the shared LLM HTTP client
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "32"))
+LLM_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", "16"))
+LLM_KEEPALIVE_EXPIRY = float(os.getenv("LLM_KEEPALIVE_EXPIRY", "30"))
+
+# Per-phase timeouts (seconds)
+LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", "5"))
+LLM_READ_TIMEOUT = float(os.getenv("LLM_READ_TIMEOUT", "30"))
+LLM_WRITE_TIMEOUT = float(os.getenv("LLM_WRITE_TIMEOUT", "10"))
+LLM_POOL_TIMEOUT = float(os.getenv("LLM_POOL_TIMEOUT", "5"))
+
+# Maximum number of completions in flight against the model server
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "4"))
+
+# Intent classification micro-batching
+INTENT_BATCH_WINDOW_MS = float(os.getenv("INTENT_BATCH_WINDOW_MS", "10"))
+INTENT_BATCH_MAX_SIZE = int(os.getenv("INTENT_BATCH_MAX_SIZE", "16"))
+
+# Redis (optional shared tier for caches; disabled when unset)
+REDIS_URL = os.getenv("REDIS_URL", "")
+
+# Intent result cache
+INTENT_CACHE_SIZE = int(os.getenv("INTENT_CACHE_SIZE", "10000"))
+INTENT_CACHE_TTL = float(os.getenv("INTENT_CACHE_TTL", "3600"))
+INTENT_CACHE_VERSION = os.getenv("INTENT_CACHE_VERSION", "1")
+
+# Semantic (hashed n-gram nearest-centroid) intent tier
+SEMANTIC_INTENT_MODEL_PATH = os.getenv("SEMANTIC_INTENT_MODEL_PATH", "artifacts/semantic_intent")
+SEMANTIC_INTENT_MIN_CONFIDENCE = float(os.getenv("SEMANTIC_INTENT_MIN_CONFIDENCE", "0.7"))
+SEMANTIC_INTENT_TEMPERATURE = float(os.getenv("SEMANTIC_INTENT_TEMPERATURE", "10"))
+SEMANTIC_INTENT_FEATURE_BITS = int(os.getenv("SEMANTIC_INTENT_FEATURE_BITS", "18"))
+SEMANTIC_INTENT_TRAIN_MIN_CONFIDENCE = float(os.getenv("SEMANTIC_INTENT_TRAIN_MIN_CONFIDENCE", "0.8"))
+
+# Write-behind persistence of detected intents
+INTENT_WRITE_MODE = os.getenv("INTENT_WRITE_MODE", "async")  # "async" (fire-and-forget) or "sync" (wait for flush)
+INTENT_WRITE_QUEUE_SIZE = int(os.getenv("INTENT_WRITE_QUEUE_SIZE", "10000"))
+INTENT_WRITE_BATCH_SIZE = int(os.getenv("INTENT_WRITE_BATCH_SIZE", "500"))
+INTENT_WRITE_FLUSH_INTERVAL_MS = float(os.getenv("INTENT_WRITE_FLUSH_INTERVAL_MS", "200"))
+
+# Password hashing
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "64"))
+
+# Authenticated principal caching
+PRINCIPAL_CACHE_SIZE = int(os.getenv("PRINCIPAL_CACHE_SIZE", "10000"))
+PRINCIPAL_CACHE_TTL = float(os.getenv("PRINCIPAL_CACHE_TTL", "300"))
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
+# Build the principal straight from access-token claims, skipping the users lookup
+AUTH_TRUST_TOKEN_CLAIMS = os.getenv("AUTH_TRUST_TOKEN_CLAIMS", "false").lower() in ("1", "true", "yes")
+
+# Short-term conversation memory
+SHORT_TERM_BACKEND = os.getenv("SHORT_TERM_BACKEND", "memory")  # "memory" or "redis"
+SHORT_TERM_TOKEN_BUDGET = int(os.getenv("SHORT_TERM_TOKEN_BUDGET", "3000"))
+SHORT_TERM_MAX_MESSAGES = int(os.getenv("SHORT_TERM_MAX_MESSAGES", "200"))
+SHORT_TERM_MAX_TOTAL_TOKENS = int(os.getenv("SHORT_TERM_MAX_TOTAL_TOKENS", "5000000"))
+SHORT_TERM_IDLE_TTL = float(os.getenv("SHORT_TERM_IDLE_TTL", "3600"))
+
+# Embeddings and long-term memory
+LLM_EMBEDDING_MODEL = os.getenv("LLM_EMBEDDING_MODEL", "text-embedding-nomic-embed-text-v1.5")
+LONG_TERM_PATH = os.getenv("LONG_TERM_PATH", "artifacts/long_term")
+LONG_TERM_NPROBE = int(os.getenv("LONG_TERM_NPROBE", "8"))
+
+# Chat orchestration deadlines (seconds)
+CHAT_STEP_TIMEOUT = float(os.getenv("CHAT_STEP_TIMEOUT", "5"))
+CHAT_TURN_DEADLINE = float(os.getenv("CHAT_TURN_DEADLINE", "8"))
+CHAT_RETRIEVAL_TOP_K = int(os.getenv("CHAT_RETRIEVAL_TOP_K", "4"))
+
+# LLM backend health checks and hedged requests
+LLM_HEALTH_CHECK_INTERVAL = float(os.getenv("LLM_HEALTH_CHECK_INTERVAL", "10"))
+LLM_HEALTH_FAILURE_THRESHOLD = int(os.getenv("LLM_HEALTH_FAILURE_THRESHOLD", "3"))
+LLM_LATENCY_EWMA_ALPHA = float(os.getenv("LLM_LATENCY_EWMA_ALPHA", "0.2"))
+LLM_HEDGE_ENABLED = os.getenv("LLM_HEDGE_ENABLED", "false").lower() in ("1", "true", "yes")
+LLM_HEDGE_MIN_DELAY_MS = float(os.getenv("LLM_HEDGE_MIN_DELAY_MS", "50"))
+LLM_HEDGE_DEFAULT_DELAY_MS = float(os.getenv("LLM_HEDGE_DEFAULT_DELAY_MS", "2000"))
+
+# Confidence-gated intent model cascade (smallest model first)
+INTENT_CASCADE_MODELS = [m.strip() for m in os.getenv("INTENT_CASCADE_MODELS", LLM_MODEL).split(",") if m.strip()]
+INTENT_CASCADE_MAX_DEPTH = int(os.getenv("INTENT_CASCADE_MAX_DEPTH", str(len(INTENT_CASCADE_MODELS))))
+INTENT_CASCADE_DEFAULT_THRESHOLD = float(os.getenv("INTENT_CASCADE_DEFAULT_THRESHOLD", "0.7"))
+# Per-intent acceptance thresholds, e.g. "coding_help=0.8,unknown=0.95"
+INTENT_CASCADE_THRESHOLDS = {
+    intent.strip(): float(threshold)
+    for intent, _, threshold in (
+        item.partition("=") for item in os.getenv("INTENT_CASCADE_THRESHOLDS", "").split(",") if "=" in item
+    )
+}
+
+# Constrained intent completions
+INTENT_STRUCTURED_OUTPUT = os.getenv("INTENT_STRUCTURED_OUTPUT", "true").lower() in ("1", "true", "yes")
+INTENT_MAX_TOKENS = int(os.getenv("INTENT_MAX_TOKENS", "48"))
+INTENT_BATCH_MAX_TOKENS_PER_ITEM = int(os.getenv("INTENT_BATCH_MAX_TOKENS_PER_ITEM", "24"))
+
+# Logging and metrics
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")  # "text" or "json"
+LOG_REQUESTS = os.getenv("LOG_REQUESTS", "true").lower() in ("1", "true", "yes")
+EVENT_LOOP_LAG_INTERVAL_MS = float(os.getenv("EVENT_LOOP_LAG_INTERVAL_MS", "100"))  # 0 disables
+
+# Bulk intent detection
+INTENT_BULK_MAX_ITEMS = int(os.getenv("INTENT_BULK_MAX_ITEMS", "100000"))
+INTENT_BULK_LLM_CONCURRENCY = int(os.getenv("INTENT_BULK_LLM_CONCURRENCY", "32"))
+
+# Database: DATABASE_URL, or built from the individual DB_* settings
+DATABASE_URL = os.getenv("DATABASE_URL") or "postgresql+asyncpg://{user}:{password}@{host}:{port}/{name}".format(
+    user=os.getenv("DB_USER", "postgres"),
+    password=os.getenv("DB_PASSWORD", "admin"),
+    host=os.getenv("DB_HOST", "localhost"),
+    port=os.getenv("DB_PORT", "5432"),
+    name=os.getenv("DB_NAME", "multi_ai"),
+)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))  # seconds; -1 disables
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "500"))  # asyncpg prepared statements per connection
+DB_ECHO = os.getenv("DB_ECHO", "false").lower() in ("1", "true", "yes")
+
+# Startup warm-up
+DB_WARM_CONNECTIONS = int(os.getenv("DB_WARM_CONNECTIONS", "4"))
+LLM_WARMUP = os.getenv("LLM_WARMUP", "true").lower() in ("1", "true", "yes")
+
+# Intent analytics rollups and retention
+INTENT_ROLLUP_FLUSH_INTERVAL = float(os.getenv("INTENT_ROLLUP_FLUSH_INTERVAL", "10"))  # seconds
+INTENT_RETENTION_DAYS = float(os.getenv("INTENT_RETENTION_DAYS", "30"))  # raw intents rows; 0 keeps forever
+INTENT_ROLLUP_RETENTION_DAYS = float(os.getenv("INTENT_ROLLUP_RETENTION_DAYS", "400"))  # 0 keeps forever
+INTENT_RETENTION_INTERVAL = float(os.getenv("INTENT_RETENTION_INTERVAL", "3600"))  # seconds; 0 disables the job
+INTENT_RETENTION_BATCH_SIZE = int(os.getenv("INTENT_RETENTION_BATCH_SIZE", "10000"))
+
+# Admission control: per-client token buckets and priority-aware LLM admission
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "true").lower() in ("1", "true", "yes")
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory")  # "memory" or "redis"
+RATE_LIMIT_RATE = float(os.getenv("RATE_LIMIT_RATE", "10"))  # tokens per second per client
+RATE_LIMIT_BURST = float(os.getenv("RATE_LIMIT_BURST", "40"))
+RATE_LIMIT_MAX_CLIENTS = int(os.getenv("RATE_LIMIT_MAX_CLIENTS", "100000"))
+RATE_LIMIT_BATCH_ITEMS_PER_TOKEN = int(os.getenv("RATE_LIMIT_BATCH_ITEMS_PER_TOKEN", "100"))
+# Longest expected LLM queue wait (seconds) each priority class accepts before being shed
+ADMISSION_MAX_WAIT_INTERACTIVE = float(os.getenv("ADMISSION_MAX_WAIT_INTERACTIVE", "8"))
+ADMISSION_MAX_WAIT_STANDARD = float(os.getenv("ADMISSION_MAX_WAIT_STANDARD", "5"))
+ADMISSION_MAX_WAIT_BULK = float(os.getenv("ADMISSION_MAX_WAIT_BULK", "30"))
+ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "256"))  # LLM waiters across all classes
+
+# Persistent completion cache for deterministic (temperature 0) LLM requests; opt-in
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "false").lower() in ("1", "true", "yes")
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "artifacts/llm_cache.sqlite3")
+LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", str(7 * 24 * 3600)))
+# How long past its TTL an entry is still served while it is refreshed in the background
+LLM_CACHE_STALE_TTL = float(os.getenv("LLM_CACHE_STALE_TTL", str(24 * 3600)))
+LLM_CACHE_VERSION = os.getenv("LLM_CACHE_VERSION", "1")
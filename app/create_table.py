@@ -1,13 +1,15 @@
 import asyncio
-from app.db import engine, Base
+from app.db import Base, dispose_engine, get_engine
 # Import all models so they're registered with Base.metadata
 from app.models.user import User  # noqa: F401
 from app.models.intent import Intent  # noqa: F401
+from app.models.intent_rollup import IntentRollup  # noqa: F401
+from app.models.chat_message import ChatMessage  # noqa: F401
 
 async def create_all():
-    async with engine.begin() as conn:
+    async with get_engine().begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
-    await engine.dispose()
+    await dispose_engine()
 
 if __name__ == "__main__":
     asyncio.run(create_all())
@@ -1,27 +1,122 @@
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
+import asyncio
+import logging
+import time
+from typing import Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine, async_sessionmaker
 from sqlalchemy.orm import declarative_base
-import os
-from dotenv import load_dotenv
-
-load_dotenv()
-
-# Get DATABASE_URL from environment, or construct it from individual components
-DB_URL = os.getenv("DATABASE_URL")
-if not DB_URL:
-    # Construct URL from individual environment variables
-    db_user = os.getenv("DB_USER", "postgres")
-    db_password = os.getenv("DB_PASSWORD", "admin")
-    db_host = os.getenv("DB_HOST", "localhost")
-    db_port = os.getenv("DB_PORT", "5432")
-    db_name = os.getenv("DB_NAME", "multi_ai")
-    DB_URL = f"postgresql+asyncpg://{db_user}:{db_password}@{db_host}:{db_port}/{db_name}"
-
-# Create async engine
-engine = create_async_engine(DB_URL, pool_pre_ping=True, echo=False)
-
-# Create async session factory
-AsyncSessionLocal = async_sessionmaker(
-    engine,
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from app.config import (
+    DATABASE_URL,
+    DB_POOL_SIZE,
+    DB_MAX_OVERFLOW,
+    DB_POOL_TIMEOUT,
+    DB_POOL_RECYCLE,
+    DB_POOL_PRE_PING,
+    DB_STATEMENT_CACHE_SIZE,
+    DB_ECHO,
+)
+from app.utils.metrics import registry
+
+DB_POOL_CHECKOUT_SECONDS = registry.histogram(
+    "db_pool_checkout_seconds", "Time spent waiting for a pooled database connection"
+)
+DB_POOL_CHECKED_OUT = registry.gauge("db_pool_checked_out", "Database connections currently checked out")
+DB_POOL_SIZE_GAUGE = registry.gauge("db_pool_size", "Database connections currently held by the pool")
+
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """Queue pool that records how long each checkout waits (including pre-ping and connect)."""
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            return super().connect()
+        finally:
+            DB_POOL_CHECKOUT_SECONDS.observe(time.perf_counter() - started)
+
+
+# SQLAlchemy logs pool events under the pool class's own module; keep this one as quiet as sqlalchemy.pool
+logging.getLogger(f"{__name__}.{TimedQueuePool.__name__}").setLevel(logging.WARNING)
+
+_engine: Optional[AsyncEngine] = None
+
+
+def get_engine() -> AsyncEngine:
+    """The process-wide async engine, created on first use from the DB_* settings."""
+    global _engine
+    if _engine is None:
+        connect_args = {}
+        if make_url(DATABASE_URL).get_driver_name() == "asyncpg":
+            connect_args["prepared_statement_cache_size"] = DB_STATEMENT_CACHE_SIZE
+        _engine = create_async_engine(
+            DATABASE_URL,
+            poolclass=TimedQueuePool,
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+            pool_recycle=DB_POOL_RECYCLE,
+            pool_pre_ping=DB_POOL_PRE_PING,
+            connect_args=connect_args,
+            echo=DB_ECHO,
+        )
+        AsyncSessionLocal.configure(bind=_engine)
+    return _engine
+
+
+async def warm_pool(connections: int) -> int:
+    """Open up to ``connections`` pooled connections concurrently so first requests don't pay for connect.
+
+    With asyncpg this also runs the per-connection type introspection up front.
+    """
+    engine = get_engine()
+    connections = max(min(connections, DB_POOL_SIZE), 0)
+    if not connections:
+        return 0
+    # Every task holds its connection until all are open, so each one is a distinct connection
+    barrier = asyncio.Barrier(connections)
+
+    async def touch() -> None:
+        try:
+            async with engine.connect() as conn:
+                await conn.execute(text("SELECT 1"))
+                await barrier.wait()
+        except BaseException:
+            await barrier.abort()
+            raise
+
+    await asyncio.gather(*(touch() for _ in range(connections)))
+    return engine.pool.checkedin()
+
+
+async def dispose_engine() -> None:
+    """Close every pooled connection; the next ``get_engine()`` builds a fresh engine."""
+    global _engine
+    if _engine is not None:
+        await _engine.dispose()
+        _engine = None
+        AsyncSessionLocal.configure(bind=None)
+
+
+@registry.collect
+def _collect_pool_metrics() -> None:
+    if _engine is not None:
+        DB_POOL_CHECKED_OUT.set(_engine.pool.checkedout())
+        DB_POOL_SIZE_GAUGE.set(_engine.pool.checkedout() + _engine.pool.checkedin())
+
+
+class _LazySessionMaker(async_sessionmaker):
+    def __call__(self, **local_kw) -> AsyncSession:
+        if self.kw.get("bind") is None:
+            get_engine()
+        return super().__call__(**local_kw)
+
+
+# Create async session factory (bound to the engine on first use)
+AsyncSessionLocal = _LazySessionMaker(
     class_=AsyncSession,
     expire_on_commit=False,
     autocommit=False,
@@ -40,4 +135,3 @@ async def get_db():
         except Exception:
             await session.rollback()
             raise
-
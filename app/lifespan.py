@@ -0,0 +1,101 @@
+"""Application lifespan: open, warm up and release every shared resource.
+
+Startup runs the independent warm-ups concurrently. It opens
+``DB_WARM_CONNECTIONS`` pooled connections, and connects to and probes every
+LLM backend. So the first requests after a deploy don't pay for TCP/TLS
+handshakes, authentication or asyncpg type introspection. The duration of each
+phase is logged and exported as ``app_startup_seconds``.
+"""
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI
+
+from app.config import DB_WARM_CONNECTIONS, EVENT_LOOP_LAG_INTERVAL_MS, LLM_WARMUP
+from app.db import dispose_engine, get_engine, warm_pool
+from app.llm.factory import llm
+from app.memory.long_term import long_term_memory
+from app.services.intent_analytics import intent_rollups
+from app.services.intent_writer import intent_writer
+from app.utils.auth import shutdown_password_hasher
+from app.utils.logging import setup_logging, shutdown_logging
+from app.utils.metrics import EventLoopLagMonitor, registry
+from app.utils.redis_client import close_redis
+from app.utils.semantic_intent import semantic_intent_classifier
+
+logger = logging.getLogger(__name__)
+
+STARTUP_SECONDS = registry.gauge("app_startup_seconds", "Duration of each startup phase", ["phase"])
+
+
+class _Phases:
+    def __init__(self):
+        self.started = time.perf_counter()
+
+    async def run(self, phase: str, awaitable):
+        started = time.perf_counter()
+        try:
+            return await awaitable
+        finally:
+            STARTUP_SECONDS.labels(phase).set(time.perf_counter() - started)
+
+    def done(self) -> float:
+        total = time.perf_counter() - self.started
+        STARTUP_SECONDS.labels("total").set(total)
+        return total
+
+
+async def _warm_database() -> None:
+    get_engine()
+    try:
+        opened = await warm_pool(DB_WARM_CONNECTIONS)
+        logger.info("Database pool warmed with %d connections", opened)
+    except Exception as e:
+        # Not fatal: requests will connect on demand (and fail loudly if the DB is really down)
+        logger.warning("Database warm-up failed: %s", e)
+
+
+async def _warm_llm() -> None:
+    await llm.start()
+    if LLM_WARMUP:
+        healthy = await llm.router.probe_all(llm.client)
+        if healthy:
+            logger.info("LLM warm-up: %d/%d backends healthy", healthy, len(llm.router.backends))
+        else:
+            logger.warning("LLM warm-up: no backend answered; requests will retry them")
+
+
+async def _load_models() -> None:
+    # Memory-maps the on-disk artifacts; cheap, but keep it off the first request
+    semantic_intent_classifier.load()
+    long_term_memory.open()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Open shared resources on startup and release them on shutdown."""
+    setup_logging()
+    phases = _Phases()
+    lag_monitor = EventLoopLagMonitor(EVENT_LOOP_LAG_INTERVAL_MS / 1000)
+    lag_monitor.start()
+    await asyncio.gather(
+        phases.run("database", _warm_database()),
+        phases.run("llm", _warm_llm()),
+        phases.run("models", _load_models()),
+    )
+    await phases.run("intent_writer", intent_writer.start())
+    await intent_rollups.start()
+    logger.info("Startup complete in %.3fs", phases.done())
+    try:
+        yield
+    finally:
+        await intent_writer.stop()
+        await intent_rollups.stop()
+        await llm.aclose()
+        await close_redis()
+        shutdown_password_hasher()
+        await dispose_engine()
+        await lag_monitor.stop()
+        shutdown_logging()
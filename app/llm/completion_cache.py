@@ -0,0 +1,207 @@
+"""On-disk cache of deterministic LLM completions, shared across restarts and workers.
+
+Entries live in one SQLite table keyed by a SHA-256 digest of the canonical
+request (model, messages and every sampling parameter except ``stream``), so
+the same prompt hits the same row whichever agent sent it. Only requests with
+``temperature`` 0 are cached. An entry is fresh for ``ttl`` seconds and can be
+served stale for ``stale_ttl`` more while the caller refreshes it. When the
+stored completions exceed ``max_bytes`` the least recently used rows are
+evicted. The database runs in WAL mode, so several worker processes can share
+one file.
+
+All SQLite work runs on a single background thread; the event loop only waits
+on it.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from app.config import (
+    LLM_CACHE_PATH,
+    LLM_CACHE_MAX_BYTES,
+    LLM_CACHE_TTL,
+    LLM_CACHE_STALE_TTL,
+    LLM_CACHE_VERSION,
+)
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS completions (
+    key TEXT PRIMARY KEY,
+    content TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    expires_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_completions_accessed_at ON completions (accessed_at);
+"""
+# Hits refresh accessed_at (for LRU) at most this often, to keep reads from writing every time
+_TOUCH_INTERVAL = 60.0
+# Re-read the total size from the database every so many writes (other workers write too)
+_RECOUNT_EVERY = 200
+
+
+def is_deterministic(params: dict) -> bool:
+    """Only greedy decoding gives the same completion for the same request."""
+    temperature = params.get("temperature")
+    return temperature is not None and float(temperature) == 0 and params.get("n", 1) == 1
+
+
+def completion_key(payload: dict) -> str:
+    """Digest of the canonical request body; ``stream`` does not change the completion."""
+    canonical = {key: value for key, value in payload.items() if key != "stream"}
+    raw = json.dumps([LLM_CACHE_VERSION, canonical], sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class CompletionCache:
+    """Size-bounded LRU of completions in SQLite, with TTLs and a stale window."""
+
+    def __init__(
+        self,
+        path: str = LLM_CACHE_PATH,
+        max_bytes: int = LLM_CACHE_MAX_BYTES,
+        ttl: float = LLM_CACHE_TTL,
+        stale_ttl: float = LLM_CACHE_STALE_TTL,
+    ):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._conn: Optional[sqlite3.Connection] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._total_bytes = 0
+        self._writes = 0
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.errors = 0
+
+    # Everything below prefixed with _db runs on the cache thread
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._total_bytes = conn.execute("SELECT COALESCE(SUM(size), 0) FROM completions").fetchone()[0]
+            self._conn = conn
+        return self._conn
+
+    def _db_get(self, key: str, now: float) -> Optional[tuple[str, float]]:
+        conn = self._db()
+        row = conn.execute("SELECT content, expires_at, accessed_at FROM completions WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        content, expires_at, accessed_at = row
+        if now >= expires_at + self.stale_ttl:
+            conn.execute("DELETE FROM completions WHERE key = ?", (key,))
+            return None
+        if now - accessed_at > _TOUCH_INTERVAL:
+            conn.execute("UPDATE completions SET accessed_at = ? WHERE key = ?", (now, key))
+        return content, expires_at
+
+    def _db_set(self, key: str, content: str, now: float, replace_fresh: bool) -> None:
+        conn = self._db()
+        size = len(content.encode("utf-8"))
+        previous = conn.execute("SELECT size, expires_at FROM completions WHERE key = ?", (key,)).fetchone()
+        if previous and not replace_fresh and previous[1] > now:
+            return
+        conn.execute(
+            "INSERT OR REPLACE INTO completions (key, content, size, expires_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+            (key, content, size, now + self.ttl, now),
+        )
+        self._total_bytes += size - (previous[0] if previous else 0)
+        self._writes += 1
+        if self._writes % _RECOUNT_EVERY == 0:
+            self._total_bytes = conn.execute("SELECT COALESCE(SUM(size), 0) FROM completions").fetchone()[0]
+        if self._total_bytes > self.max_bytes:
+            self._db_evict(now)
+
+    def _db_evict(self, now: float) -> None:
+        """Drop dead rows, then least recently used ones until 90% of ``max_bytes``."""
+        conn = self._db()
+        target = int(self.max_bytes * 0.9)
+        conn.execute("DELETE FROM completions WHERE expires_at + ? <= ?", (self.stale_ttl, now))
+        self._total_bytes = conn.execute("SELECT COALESCE(SUM(size), 0) FROM completions").fetchone()[0]
+        while self._total_bytes > target:
+            rows = conn.execute(
+                "SELECT key, size FROM completions ORDER BY accessed_at LIMIT 100"
+            ).fetchall()
+            if not rows:
+                break
+            victims = []
+            for key, size in rows:
+                victims.append((key,))
+                self._total_bytes -= size
+                if self._total_bytes <= target:
+                    break
+            conn.executemany("DELETE FROM completions WHERE key = ?", victims)
+            self.evictions += len(victims)
+
+    def _db_close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    async def _run(self, func, *args):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="llm-cache")
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    async def get(self, key: str) -> Optional[tuple[str, bool]]:
+        """``(content, stale)`` for a live entry, else None. Cache failures count as misses."""
+        now = time.time()
+        try:
+            entry = await self._run(self._db_get, key, now)
+        except sqlite3.Error as e:
+            self.errors += 1
+            logger.warning("LLM completion cache read failed: %s", e)
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return None
+        content, expires_at = entry
+        stale = now >= expires_at
+        if stale:
+            self.stale_hits += 1
+        else:
+            self.hits += 1
+        return content, stale
+
+    async def set(self, key: str, content: str, replace_fresh: bool = True) -> None:
+        try:
+            await self._run(self._db_set, key, content, time.time(), replace_fresh)
+        except sqlite3.Error as e:
+            self.errors += 1
+            logger.warning("LLM completion cache write failed: %s", e)
+
+    async def close(self) -> None:
+        if self._executor is None:
+            return
+        await self._run(self._db_close)
+        self._executor.shutdown(wait=True)
+        self._executor = None
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "bytes": self._total_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "errors": self.errors,
+        }
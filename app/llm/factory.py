@@ -1,36 +1,373 @@
+import asyncio
+import json
+import logging
+import time
 import httpx
-from typing import List, Dict
+from dataclasses import dataclass
+from typing import AsyncIterator, List, Dict, Optional
+
+from app.config import (
+    LLM_BASE_URLS,
+    LLM_MODEL,
+    LLM_MAX_CONNECTIONS,
+    LLM_MAX_KEEPALIVE_CONNECTIONS,
+    LLM_KEEPALIVE_EXPIRY,
+    LLM_CONNECT_TIMEOUT,
+    LLM_READ_TIMEOUT,
+    LLM_WRITE_TIMEOUT,
+    LLM_POOL_TIMEOUT,
+    LLM_MAX_CONCURRENCY,
+    LLM_EMBEDDING_MODEL,
+    LLM_HEDGE_ENABLED,
+    LLM_CACHE_ENABLED,
+)
+from app.llm.completion_cache import CompletionCache, completion_key, is_deterministic
+from app.llm.router import Backend, BackendRouter, track_request
+from app.services.admission import BULK, PriorityLimiter, current_max_wait, current_priority
+from app.utils.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+LLM_QUEUE_WAIT_SECONDS = registry.histogram("llm_queue_wait_seconds", "Time spent waiting for a free completion slot")
+LLM_TOKENS = registry.counter("llm_tokens_total", "Tokens reported by (or, when streaming, received from) the LLM", ["kind"])
+LLM_IN_FLIGHT = registry.gauge("llm_in_flight", "LLM requests holding a completion slot")
+LLM_QUEUE_DEPTH = registry.gauge("llm_queue_depth", "Callers waiting for a completion slot")
+LLM_BACKEND_HEALTHY = registry.gauge("llm_backend_healthy", "1 if the backend is in rotation", ["backend"])
+LLM_CACHE_REQUESTS = registry.counter("llm_cache_requests_total", "Completion cache lookups", ["result"])
+
+
+@dataclass
+class StreamInfo:
+    """Filled in by ``LLM.chat_stream`` for callers that need to know where the text came from."""
+    cached: bool = False  # served from the completion cache
+    finished: bool = False  # upstream stream read to its end (and cached, if eligible)
 
 
 class LLM:
-    """Simple LLM client for LM Studio."""
-    
-    def __init__(self, base_url: str = "http://127.0.0.1:1234", model: str = "google/gemma-3-4b"):
-        self.base_url = base_url
+    """Simple LLM client for LM Studio and other OpenAI-compatible servers.
+
+    Owns one long-lived, keep-alive ``httpx.AsyncClient`` that is opened with
+    ``start()`` and closed with ``aclose()`` (see the FastAPI lifespan in
+    ``app.lifespan``), and caps the number of completions in flight with a
+    ``PriorityLimiter``.
+    Requests go to the least-loaded healthy backend in ``base_urls``; with
+    ``hedge`` enabled a duplicate completion is sent to a second backend once the
+    first is slower than the recent p95, and the loser is cancelled.
+    Slots are granted by request priority, and calls that could not get one
+    within their class's wait budget are shed (see ``app.services.admission``).
+
+    With ``cache`` (on by default when ``LLM_CACHE_ENABLED``), deterministic
+    completions (``temperature=0``) are answered from a persistent on-disk cache
+    without taking a slot; stale entries are served while one background
+    request refreshes them.
+    """
+
+    def __init__(
+        self,
+        base_urls: Optional[List[str]] = None,
+        model: str = LLM_MODEL,
+        embedding_model: str = LLM_EMBEDDING_MODEL,
+        max_concurrency: int = LLM_MAX_CONCURRENCY,
+        limits: Optional[httpx.Limits] = None,
+        timeout: Optional[httpx.Timeout] = None,
+        hedge: bool = LLM_HEDGE_ENABLED,
+        cache: Optional[CompletionCache] = None,
+    ):
+        self.router = BackendRouter(base_urls or LLM_BASE_URLS)
+        self.hedge = hedge
         self.model = model
-    
-    async def chat(self, messages: List[Dict[str, str]]) -> str:
-        """Send messages and get response."""
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.post(
-                f"{self.base_url}/v1/chat/completions",
-                json={
-                    "model": self.model,
-                    "messages": messages
-                }
-            )
+        self.embedding_model = embedding_model
+        self.max_concurrency = max_concurrency
+        self.limits = limits or httpx.Limits(
+            max_connections=LLM_MAX_CONNECTIONS,
+            max_keepalive_connections=LLM_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=LLM_KEEPALIVE_EXPIRY,
+        )
+        self.timeout = timeout or httpx.Timeout(
+            connect=LLM_CONNECT_TIMEOUT,
+            read=LLM_READ_TIMEOUT,
+            write=LLM_WRITE_TIMEOUT,
+            pool=LLM_POOL_TIMEOUT,
+        )
+        self._client: Optional[httpx.AsyncClient] = None
+        self.limiter = PriorityLimiter(max_concurrency)
+        self._in_flight = 0
+        self._waiting = 0
+        self.cache = cache if cache is not None else (CompletionCache() if LLM_CACHE_ENABLED else None)
+        self._refreshing: Dict[str, asyncio.Task] = {}
+
+    async def start(self) -> None:
+        """Open the shared HTTP client (idempotent)."""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(limits=self.limits, timeout=self.timeout)
+        self.router.start(lambda: self.client)
+
+    async def aclose(self) -> None:
+        """Close the shared HTTP client and release pooled connections."""
+        for task in list(self._refreshing.values()):
+            task.cancel()
+        await asyncio.gather(*self._refreshing.values(), return_exceptions=True)
+        await self.router.stop()
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+        if self.cache is not None:
+            await self.cache.close()
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """Shared client; opened lazily for scripts that run outside the app lifespan."""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(limits=self.limits, timeout=self.timeout)
+        return self._client
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    @property
+    def queue_depth(self) -> int:
+        """Number of callers waiting for a free completion slot."""
+        return self._waiting
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "in_flight": self._in_flight,
+            "queue_depth": self._waiting,
+            "max_concurrency": self.max_concurrency,
+            "admission": self.limiter.stats(),
+            "cache": self.cache.stats() if self.cache is not None else None,
+            "backends": self.router.stats(),
+        }
+
+    def collect_metrics(self) -> None:
+        LLM_IN_FLIGHT.set(self._in_flight)
+        LLM_QUEUE_DEPTH.set(self._waiting)
+        for backend in self.router.backends:
+            LLM_BACKEND_HEALTHY.labels(backend.url).set(1 if backend.healthy else 0)
+
+    async def _acquire(self) -> float:
+        """Wait for a completion slot (by request priority); returns when it was granted."""
+        self._waiting += 1
+        started = time.perf_counter()
+        try:
+            await self.limiter.acquire()
+        finally:
+            self._waiting -= 1
+            LLM_QUEUE_WAIT_SECONDS.observe(time.perf_counter() - started)
+        self._in_flight += 1
+        return time.perf_counter()
+
+    def _release(self, acquired_at: float) -> None:
+        self._in_flight -= 1
+        self.limiter.release(time.perf_counter() - acquired_at)
+
+    def _pick(self, exclude: tuple = ()) -> Backend:
+        backend = self.router.pick(exclude)
+        if backend is None:
+            raise RuntimeError("No LLM backend available")
+        return backend
+
+    async def _complete(self, backend: Backend, payload: dict) -> dict:
+        with track_request(backend):
+            response = await self.client.post(f"{backend.url}/v1/chat/completions", json=payload)
             response.raise_for_status()
-            result = response.json()
-            
-            if "choices" not in result or not result["choices"]:
-                raise ValueError("No choices in LLM response")
-            
-            content = result["choices"][0]["message"].get("content", "")
-            if not content:
-                raise ValueError("Empty content in LLM response")
-            
-            return content
+        return response.json()
+
+    async def _complete_hedged(self, payload: dict) -> dict:
+        """Send to the best backend; past the p95 delay race a duplicate on the next best."""
+        primary = self._pick()
+        first = asyncio.create_task(self._complete(primary, payload))
+        if not self.hedge or self.router.healthy_count < 2:
+            return await first
+
+        tasks = {first}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=self.router.hedge_delay())
+            if not done:
+                secondary = self.router.pick(exclude=(primary,))
+                if secondary is not None:
+                    tasks.add(asyncio.create_task(self._complete(secondary, payload)))
+            while tasks:
+                done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                if not tasks:
+                    # Both failed; surface the first error
+                    return next(iter(done)).result()
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def _cache_key(self, payload: dict) -> Optional[str]:
+        if self.cache is None or not is_deterministic(payload):
+            return None
+        return completion_key(payload)
+
+    async def _cached(self, key: str, payload: dict) -> Optional[str]:
+        """A cached completion, scheduling a refresh if it is stale; None on a miss."""
+        cached = await self.cache.get(key)
+        if cached is None:
+            LLM_CACHE_REQUESTS.labels("miss").inc()
+            return None
+        content, stale = cached
+        LLM_CACHE_REQUESTS.labels("stale" if stale else "hit").inc()
+        if stale and key not in self._refreshing:
+            task = asyncio.create_task(self._revalidate(key, payload), name="llm-cache-refresh")
+            self._refreshing[key] = task
+            task.add_done_callback(lambda _: self._refreshing.pop(key, None))
+        return content
+
+    async def _revalidate(self, key: str, payload: dict) -> None:
+        # Background work: queue behind live traffic and never shed
+        current_priority.set(BULK)
+        current_max_wait.set(None)
+        # Streamed entries are refreshed with a plain completion; same key, same content
+        payload = {name: value for name, value in payload.items() if name != "stream"}
+        try:
+            await self.cache.set(key, await self._generate(payload))
+        except Exception as e:
+            logger.warning("LLM cache refresh failed: %s", e)
+
+    async def remember_completion(self, messages: List[Dict[str, str]], content: str,
+                                  model: Optional[str] = None, **params) -> None:
+        """Cache ``content`` for a request unless a fresh entry exists.
+
+        For callers that stop a stream as soon as they have what they need (so
+        ``chat_stream`` never sees the end of it) but whose partial text is a
+        complete answer, e.g. the intent JSON object.
+        """
+        payload = {**params, "model": model or self.model, "messages": messages}
+        key = self._cache_key(payload)
+        if key is not None and content:
+            await self.cache.set(key, content, replace_fresh=False)
+
+    async def _generate(self, payload: dict) -> str:
+        acquired_at = await self._acquire()
+        try:
+            result = await self._complete_hedged(payload)
+        finally:
+            self._release(acquired_at)
+
+        if "choices" not in result or not result["choices"]:
+            raise ValueError("No choices in LLM response")
+
+        usage = result.get("usage") or {}
+        LLM_TOKENS.labels("prompt").inc(usage.get("prompt_tokens", 0))
+        LLM_TOKENS.labels("completion").inc(usage.get("completion_tokens", 0))
+
+        content = result["choices"][0]["message"].get("content", "")
+        if not content:
+            raise ValueError("Empty content in LLM response")
+
+        return content
+
+    async def chat(self, messages: List[Dict[str, str]], model: Optional[str] = None, **params) -> str:
+        """Send messages and get response.
+
+        ``model`` overrides the default model; extra keyword arguments (e.g.
+        ``temperature``, ``max_tokens``, ``response_format``) go into the request body.
+        """
+        payload = {
+            **params,
+            "model": model or self.model,
+            "messages": messages
+        }
+        key = self._cache_key(payload)
+        if key is not None:
+            cached = await self._cached(key, payload)
+            if cached is not None:
+                return cached
+        content = await self._generate(payload)
+        if key is not None:
+            await self.cache.set(key, content)
+        return content
+
+    async def chat_stream(self, messages: List[Dict[str, str]], model: Optional[str] = None,
+                          info: Optional[StreamInfo] = None, **params) -> AsyncIterator[str]:
+        """Send messages and yield content deltas as the model produces them.
+
+        Consumes the OpenAI-compatible ``stream: true`` server-sent events. The
+        completion slot and the upstream connection are held only while the
+        generator is being iterated; closing the generator early (e.g. because the
+        client went away) closes the upstream stream so the model stops generating.
+        A cached completion is yielded as a single delta; one streamed to the end
+        is cached. Pass ``info`` to learn which of the two happened.
+        """
+        payload = {
+            **params,
+            "model": model or self.model,
+            "messages": messages,
+            "stream": True
+        }
+        key = self._cache_key(payload)
+        if key is not None:
+            cached = await self._cached(key, payload)
+            if cached is not None:
+                if info is not None:
+                    info.cached = True
+                yield cached
+                return
+        parts: List[str] = []
+        acquired_at = await self._acquire()
+        try:
+            backend = self._pick()
+            with track_request(backend):
+                async with self.client.stream(
+                    "POST",
+                    f"{backend.url}/v1/chat/completions",
+                    json=payload
+                ) as response:
+                    response.raise_for_status()
+                    async for line in response.aiter_lines():
+                        if not line.startswith("data:"):
+                            continue
+                        data = line[5:].strip()
+                        if data == "[DONE]":
+                            break
+                        try:
+                            chunk = json.loads(data)
+                        except json.JSONDecodeError:
+                            continue
+                        choices = chunk.get("choices") or []
+                        if not choices:
+                            continue
+                        delta = choices[0].get("delta", {}).get("content")
+                        if delta:
+                            # Servers send roughly one token per chunk
+                            LLM_TOKENS.labels("completion").inc()
+                            if key is not None:
+                                parts.append(delta)
+                            yield delta
+        finally:
+            self._release(acquired_at)
+        if parts:
+            await self.cache.set(key, "".join(parts))
+        if info is not None:
+            info.finished = True
 
+    async def embed(self, texts: List[str]) -> List[List[float]]:
+        """Embed texts with the OpenAI-compatible embeddings endpoint."""
+        acquired_at = await self._acquire()
+        try:
+            backend = self._pick()
+            with track_request(backend, record_latency=False):
+                response = await self.client.post(
+                    f"{backend.url}/v1/embeddings",
+                    json={
+                        "model": self.embedding_model,
+                        "input": texts
+                    }
+                )
+                response.raise_for_status()
+        finally:
+            self._release(acquired_at)
+        data = sorted(response.json().get("data", []), key=lambda item: item.get("index", 0))
+        if len(data) != len(texts):
+            raise ValueError(f"Expected {len(texts)} embeddings, got {len(data)}")
+        return [item["embedding"] for item in data]
 
 
-llm = LLM()
\ No newline at end of file
+llm = LLM()
+registry.collect(llm.collect_metrics)
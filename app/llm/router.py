@@ -0,0 +1,197 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Iterable, List, Optional
+
+import httpx
+
+from app.config import (
+    LLM_HEALTH_CHECK_INTERVAL,
+    LLM_HEALTH_FAILURE_THRESHOLD,
+    LLM_LATENCY_EWMA_ALPHA,
+    LLM_HEDGE_MIN_DELAY_MS,
+    LLM_HEDGE_DEFAULT_DELAY_MS,
+)
+from app.utils.metrics import registry
+
+LLM_REQUEST_SECONDS = registry.histogram(
+    "llm_request_seconds", "LLM HTTP request duration (streams: until the stream is closed)", ["backend", "outcome"]
+)
+LLM_ERRORS = registry.counter("llm_errors_total", "Failed LLM requests", ["backend", "kind"])
+
+logger = logging.getLogger(__name__)
+
+
+class Backend:
+    """One OpenAI-compatible model server and its live load/latency statistics."""
+
+    def __init__(self, url: str, alpha: float = LLM_LATENCY_EWMA_ALPHA):
+        self.url = url.rstrip("/")
+        self.alpha = alpha
+        self.in_flight = 0
+        self.ewma_ms: Optional[float] = None
+        self.latencies: deque[float] = deque(maxlen=256)
+        self.healthy = True
+        self.consecutive_failures = 0
+        self.requests = 0
+        self.failures = 0
+
+    def load_score(self, default_ms: float) -> float:
+        """Expected wait if one more request were sent here."""
+        return (self.in_flight + 1) * (self.ewma_ms if self.ewma_ms is not None else default_ms)
+
+    def record_latency(self, latency_ms: float) -> None:
+        self.latencies.append(latency_ms)
+        self.ewma_ms = latency_ms if self.ewma_ms is None else self.alpha * latency_ms + (1 - self.alpha) * self.ewma_ms
+
+    def record_success(self) -> None:
+        self.requests += 1
+        self.consecutive_failures = 0
+
+    def record_failure(self, threshold: int = LLM_HEALTH_FAILURE_THRESHOLD) -> None:
+        self.requests += 1
+        self.failures += 1
+        self.consecutive_failures += 1
+        if self.healthy and self.consecutive_failures >= threshold:
+            self.healthy = False
+            logger.warning("Ejecting LLM backend %s after %d consecutive failures", self.url, self.consecutive_failures)
+
+    def stats(self) -> dict:
+        return {
+            "url": self.url,
+            "healthy": self.healthy,
+            "in_flight": self.in_flight,
+            "ewma_ms": round(self.ewma_ms, 2) if self.ewma_ms is not None else None,
+            "requests": self.requests,
+            "failures": self.failures,
+        }
+
+
+class BackendRouter:
+    """Least-loaded selection over healthy backends, with periodic health probes.
+
+    Backends are ejected after ``failure_threshold`` consecutive request or probe
+    failures and readmitted by the first successful probe.
+    """
+
+    def __init__(
+        self,
+        urls: List[str],
+        health_check_interval: float = LLM_HEALTH_CHECK_INTERVAL,
+        failure_threshold: int = LLM_HEALTH_FAILURE_THRESHOLD,
+    ):
+        if not urls:
+            raise ValueError("At least one LLM backend URL is required")
+        self.backends = [Backend(url) for url in urls]
+        self.health_check_interval = health_check_interval
+        self.failure_threshold = failure_threshold
+        self._probe_task: Optional[asyncio.Task] = None
+
+    def pick(self, exclude: Iterable[Backend] = ()) -> Optional[Backend]:
+        excluded = set(map(id, exclude))
+        candidates = [b for b in self.backends if b.healthy and id(b) not in excluded]
+        if not candidates and not excluded:
+            # Everything is ejected: fail open rather than refuse all traffic
+            candidates = self.backends
+        if not candidates:
+            return None
+        return min(candidates, key=lambda b: b.load_score(LLM_HEDGE_DEFAULT_DELAY_MS))
+
+    @property
+    def healthy_count(self) -> int:
+        return sum(b.healthy for b in self.backends)
+
+    def hedge_delay(self) -> float:
+        """Seconds to wait before hedging: the p95 of recent completion latencies."""
+        samples = sorted(latency for b in self.backends for latency in b.latencies)
+        if len(samples) < 20:
+            delay_ms = LLM_HEDGE_DEFAULT_DELAY_MS
+        else:
+            delay_ms = samples[int(len(samples) * 0.95) - 1]
+        return max(delay_ms, LLM_HEDGE_MIN_DELAY_MS) / 1000
+
+    def start(self, client_getter: Callable[[], httpx.AsyncClient]) -> None:
+        if self._probe_task is None and self.health_check_interval > 0:
+            self._probe_task = asyncio.create_task(self._probe_loop(client_getter), name="llm-health-probe")
+
+    async def stop(self) -> None:
+        if self._probe_task is not None:
+            self._probe_task.cancel()
+            try:
+                await self._probe_task
+            except asyncio.CancelledError:
+                pass
+            self._probe_task = None
+
+    async def probe(self, client: httpx.AsyncClient, backend: Backend) -> bool:
+        try:
+            response = await client.get(f"{backend.url}/v1/models", timeout=min(self.health_check_interval, 5.0))
+            response.raise_for_status()
+        except (httpx.HTTPError, OSError):
+            backend.record_failure(self.failure_threshold)
+            return False
+        if not backend.healthy:
+            logger.info("Readmitting LLM backend %s", backend.url)
+        backend.healthy = True
+        backend.consecutive_failures = 0
+        return True
+
+    async def probe_all(self, client: httpx.AsyncClient) -> int:
+        results = await asyncio.gather(*(self.probe(client, b) for b in self.backends))
+        return sum(results)
+
+    async def _probe_loop(self, client_getter: Callable[[], httpx.AsyncClient]) -> None:
+        while True:
+            await asyncio.sleep(self.health_check_interval)
+            await self.probe_all(client_getter())
+
+    def stats(self) -> List[dict]:
+        return [b.stats() for b in self.backends]
+
+
+@contextmanager
+def track_request(backend: Backend, record_latency: bool = True):
+    """Track in-flight count, outcome and (optionally) latency of one request to ``backend``.
+
+    For a stream the latency is the time until the caller had what it needed:
+    the end of the stream, or the point where it closed the stream early (the
+    intent agent stops as soon as its JSON object is complete).
+    """
+    backend.in_flight += 1
+    started = time.perf_counter()
+    outcome = "ok"
+    try:
+        yield backend
+    except httpx.HTTPStatusError as e:
+        outcome = "error"
+        LLM_ERRORS.labels(backend.url, f"http_{e.response.status_code}").inc()
+        # A 4xx is the request's fault, not the backend's
+        if e.response.status_code >= 500:
+            backend.record_failure()
+        else:
+            backend.record_success()
+        raise
+    except (httpx.HTTPError, OSError) as e:
+        outcome = "error"
+        LLM_ERRORS.labels(backend.url, type(e).__name__).inc()
+        backend.record_failure()
+        raise
+    except GeneratorExit:
+        # Stream closed early by the caller (e.g. intent early stop, client gone)
+        outcome = "closed"
+        if record_latency:
+            backend.record_latency((time.perf_counter() - started) * 1000)
+        raise
+    except BaseException:
+        # Cancelled, e.g. the losing side of a hedge
+        outcome = "cancelled"
+        raise
+    else:
+        backend.record_success()
+        if record_latency:
+            backend.record_latency((time.perf_counter() - started) * 1000)
+    finally:
+        backend.in_flight -= 1
+        LLM_REQUEST_SECONDS.labels(backend.url, outcome).observe(time.perf_counter() - started)
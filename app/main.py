@@ -1,23 +1,48 @@
+import logging
 import uvicorn
-from time import time
+from time import perf_counter
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 
-from app.routers import chat, auth, detect_intent
+from app.config import LOG_REQUESTS
+from app.lifespan import lifespan
+from app.utils.metrics import registry
+from app.routers import chat, auth, detect_intent, metrics, analytics
+
+logger = logging.getLogger("app.access")
+
+HTTP_REQUEST_SECONDS = registry.histogram(
+    "http_request_duration_seconds", "Time to the response head, by route template", ["method", "route", "status"]
+)
+HTTP_IN_FLIGHT = registry.gauge("http_requests_in_flight", "Requests currently being handled")
 
 
 # Create FastAPI app
-app = FastAPI(title="Multi Agent API")
+app = FastAPI(title="Multi Agent API", lifespan=lifespan)
 
 
-# Middleware: Request logging
+# Middleware: Request metrics and access log
 @app.middleware("http")
 async def log_requests(request: Request, call_next):
-    start = time()
-    response = await call_next(request)
-    duration = round(time() - start, 4)
-    print(f"{request.method} {request.url.path} completed_in={duration}s status_code={response.status_code}")
-    return response
+    start = perf_counter()
+    HTTP_IN_FLIGHT.inc()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        return response
+    finally:
+        HTTP_IN_FLIGHT.dec()
+        duration = perf_counter() - start
+        # Label by route template so path parameters don't explode the label set
+        route = request.scope.get("route")
+        path = route.path if route is not None else "unmatched"
+        HTTP_REQUEST_SECONDS.labels(request.method, path, status_code).observe(duration)
+        if LOG_REQUESTS:
+            logger.info("request", extra={"fields": {
+                "method": request.method, "path": request.url.path,
+                "status_code": status_code, "completed_in": round(duration, 4),
+            }})
 
 
 # CORS Middleware
@@ -34,6 +59,8 @@ app.add_middleware(
 app.include_router(chat.router, prefix="/chat", tags=["chat"])
 app.include_router(auth.router, prefix="/auth", tags=["auth"])
 app.include_router(detect_intent.router, prefix="/detect-intent", tags=["intent"])
+app.include_router(analytics.router, prefix="/analytics", tags=["analytics"])
+app.include_router(metrics.router)
 
 
 # Root endpoint
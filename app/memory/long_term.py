@@ -0,0 +1,323 @@
+"""Long-term memory: an append-only, memory-mapped vector store with cosine top-k search.
+
+On-disk layout (one directory per store):
+
+- ``store.json``    -- dimension and, once built, IVF index settings
+- ``vectors.f32``   -- row-major float32 matrix of L2-normalized embeddings
+- ``meta.jsonl``    -- one JSON metadata object per vector
+- ``meta.idx``      -- int64 byte offset of each vector's line in ``meta.jsonl``
+- ``ivf_*.npy``     -- optional coarse partitioning (centroids, ids grouped by list, list offsets)
+
+Everything is memory-mapped, so opening a store costs a few syscalls no matter
+how large it is. Vectors added after the IVF index was built form an unindexed
+tail that is scanned exhaustively until the next ``build_ivf``.
+
+Ingest documents and build the coarse index with:
+
+    python -m app.memory.long_term ingest docs.jsonl --field text
+    python -m app.memory.long_term build-index --lists 1024
+"""
+import argparse
+import asyncio
+import json
+import os
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+from app.config import LONG_TERM_PATH, LONG_TERM_NPROBE
+from app.llm.factory import llm
+
+_SEARCH_CHUNK_ROWS = 65536
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.where(norms > 0, norms, 1.0)
+
+
+def _top_k(scores: np.ndarray, ids: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+    """Best ``k`` columns per row of ``scores`` (descending), carrying the matching ``ids``."""
+    if scores.shape[1] > k:
+        keep = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        scores = np.take_along_axis(scores, keep, axis=1)
+        ids = np.take_along_axis(ids, keep, axis=1)
+    order = np.argsort(-scores, axis=1, kind="stable")
+    return np.take_along_axis(scores, order, axis=1), np.take_along_axis(ids, order, axis=1)
+
+
+def _save_atomic(path: Path, array: np.ndarray) -> None:
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as f:
+        np.save(f, array)
+    os.replace(tmp, path)
+
+
+@dataclass(frozen=True)
+class _Mapped:
+    """One consistent view of the mapped files; replaced whole, never mutated."""
+    vectors: np.ndarray
+    meta_offsets: np.ndarray
+    indexed: int = 0  # rows covered by the IVF lists; later rows are the tail
+    centroids: Optional[np.ndarray] = None
+    ivf_ids: Optional[np.ndarray] = None
+    ivf_offsets: Optional[np.ndarray] = None
+
+
+class VectorStore:
+    """Append-only float32 embedding matrix with a metadata sidecar.
+
+    Writers hold ``_lock`` and publish a new ``_Mapped`` in one assignment, so
+    readers take a snapshot without locking and never see half-updated arrays.
+    """
+
+    def __init__(self, path: str = LONG_TERM_PATH):
+        self.path = Path(path)
+        self.dim: Optional[int] = None
+        self.ivf: Optional[dict] = None
+        self._mapped: Optional[_Mapped] = None
+        self._lock = threading.Lock()
+
+    @property
+    def count(self) -> int:
+        mapped = self._mapped
+        return 0 if mapped is None else mapped.vectors.shape[0]
+
+    def open(self) -> "VectorStore":
+        with self._lock:
+            manifest = self.path / "store.json"
+            if manifest.exists():
+                settings = json.loads(manifest.read_text())
+                self.dim = settings["dim"]
+                self.ivf = settings.get("ivf")
+            self._map()
+        return self
+
+    def _write_manifest(self) -> None:
+        tmp = self.path / "store.json.tmp"
+        tmp.write_text(json.dumps({"dim": self.dim, "ivf": self.ivf}))
+        os.replace(tmp, self.path / "store.json")
+
+    def _map(self) -> None:
+        """Remap the files and publish the result; callers hold ``_lock``."""
+        self._mapped = self._build_mapping()
+
+    def _build_mapping(self) -> Optional[_Mapped]:
+        if self.dim is None:
+            return None
+        vectors_file = self.path / "vectors.f32"
+        offsets_file = self.path / "meta.idx"
+        if not vectors_file.exists() or not offsets_file.exists():
+            return None
+        # A crash between the two appends leaves one file longer; trust the shorter
+        count = min(vectors_file.stat().st_size // (4 * self.dim), offsets_file.stat().st_size // 8)
+        if count == 0:
+            return None
+        vectors = np.memmap(vectors_file, dtype=np.float32, mode="r", shape=(count, self.dim))
+        meta_offsets = np.memmap(offsets_file, dtype=np.int64, mode="r", shape=(count,))
+        if not self.ivf:
+            return _Mapped(vectors, meta_offsets)
+        return _Mapped(
+            vectors,
+            meta_offsets,
+            indexed=self.ivf["indexed"],
+            centroids=np.load(self.path / "ivf_centroids.npy", mmap_mode="r"),
+            ivf_ids=np.load(self.path / "ivf_ids.npy", mmap_mode="r"),
+            ivf_offsets=np.load(self.path / "ivf_offsets.npy"),
+        )
+
+    def add(self, vectors: np.ndarray, metadatas: list[dict]) -> list[int]:
+        """Append vectors and their metadata; returns the new ids."""
+        vectors = _normalize(np.atleast_2d(vectors))
+        if len(vectors) != len(metadatas):
+            raise ValueError("vectors and metadatas must have the same length")
+        with self._lock:
+            if self.dim is None:
+                self.dim = vectors.shape[1]
+                self.path.mkdir(parents=True, exist_ok=True)
+                self._write_manifest()
+            elif vectors.shape[1] != self.dim:
+                raise ValueError(f"Expected {self.dim}-dimensional vectors, got {vectors.shape[1]}")
+
+            start = self.count
+            with open(self.path / "meta.jsonl", "ab") as meta_file:
+                position = meta_file.tell()
+                offsets = np.empty(len(metadatas), dtype=np.int64)
+                for i, metadata in enumerate(metadatas):
+                    line = (json.dumps(metadata) + "\n").encode("utf-8")
+                    offsets[i] = position
+                    meta_file.write(line)
+                    position += len(line)
+            with open(self.path / "vectors.f32", "ab") as vectors_file:
+                vectors_file.write(vectors.tobytes())
+            with open(self.path / "meta.idx", "ab") as offsets_file:
+                offsets_file.write(offsets.tobytes())
+            self._map()
+            return list(range(start, start + len(vectors)))
+
+    def metadata(self, ids: list[int]) -> list[dict]:
+        meta_offsets = self._mapped.meta_offsets if ids else None
+        results = []
+        with open(self.path / "meta.jsonl", "rb") as meta_file:
+            for vector_id in ids:
+                meta_file.seek(int(meta_offsets[vector_id]))
+                results.append(json.loads(meta_file.readline()))
+        return results
+
+    def search(self, queries: np.ndarray, k: int = 5, nprobe: int = LONG_TERM_NPROBE) -> tuple[np.ndarray, np.ndarray]:
+        """Top-k cosine similarity; returns ``(scores, ids)`` of shape ``(len(queries), <=k)``."""
+        queries = _normalize(np.atleast_2d(queries))
+        # One snapshot for the whole search; a concurrent add publishes a new one
+        mapped = self._mapped
+        if mapped is None:
+            empty = np.empty((len(queries), 0))
+            return empty.astype(np.float32), empty.astype(np.int64)
+        count = mapped.vectors.shape[0]
+        k = min(k, count)
+        if mapped.centroids is not None:
+            return self._search_ivf(mapped, queries, k, nprobe)
+        return self._search_range(mapped.vectors, queries, k, 0, count)
+
+    @staticmethod
+    def _search_range(vectors: np.ndarray, queries: np.ndarray, k: int,
+                      start: int, stop: int) -> tuple[np.ndarray, np.ndarray]:
+        best_scores = np.empty((len(queries), 0), dtype=np.float32)
+        best_ids = np.empty((len(queries), 0), dtype=np.int64)
+        for chunk_start in range(start, stop, _SEARCH_CHUNK_ROWS):
+            chunk_stop = min(chunk_start + _SEARCH_CHUNK_ROWS, stop)
+            scores = queries @ vectors[chunk_start:chunk_stop].T
+            ids = np.broadcast_to(np.arange(chunk_start, chunk_stop), scores.shape)
+            best_scores, best_ids = _top_k(
+                np.concatenate([best_scores, scores], axis=1),
+                np.concatenate([best_ids, ids], axis=1),
+                k,
+            )
+        return best_scores, best_ids
+
+    @staticmethod
+    def _search_ivf(mapped: _Mapped, queries: np.ndarray, k: int, nprobe: int) -> tuple[np.ndarray, np.ndarray]:
+        nprobe = min(nprobe, len(mapped.centroids))
+        probes = np.argpartition(-(queries @ mapped.centroids.T), nprobe - 1, axis=1)[:, :nprobe]
+        tail = np.arange(mapped.indexed, mapped.vectors.shape[0])
+        all_scores, all_ids = [], []
+        for query, lists in zip(queries, probes):
+            # Sorted ids turn the gather into a forward sweep over the mapped file
+            candidates = np.sort(np.concatenate(
+                [mapped.ivf_ids[mapped.ivf_offsets[lst]:mapped.ivf_offsets[lst + 1]] for lst in lists] + [tail]
+            ))
+            scores = (mapped.vectors[candidates] @ query)[None, :]
+            top_scores, top_ids = _top_k(scores, candidates[None, :], min(k, len(candidates)))
+            all_scores.append(top_scores[0])
+            all_ids.append(top_ids[0])
+        width = max(len(ids) for ids in all_ids)
+        scores_out = np.full((len(queries), width), -np.inf, dtype=np.float32)
+        ids_out = np.full((len(queries), width), -1, dtype=np.int64)
+        for row, (scores, ids) in enumerate(zip(all_scores, all_ids)):
+            scores_out[row, :len(scores)] = scores
+            ids_out[row, :len(ids)] = ids
+        return scores_out, ids_out
+
+    def build_ivf(self, n_lists: int, iterations: int = 10, sample_size: int = 100_000, seed: int = 0) -> None:
+        """Partition current vectors into ``n_lists`` cells with spherical k-means."""
+        with self._lock:
+            count = self.count
+            if count < n_lists:
+                raise ValueError(f"Need at least {n_lists} vectors to build {n_lists} lists, have {count}")
+            rng = np.random.default_rng(seed)
+            vectors = self._mapped.vectors
+            sample = np.asarray(vectors[np.sort(rng.choice(count, min(sample_size, count), replace=False))])
+            centroids = sample[rng.choice(len(sample), n_lists, replace=False)].copy()
+            for _ in range(iterations):
+                assignment = (sample @ centroids.T).argmax(axis=1)
+                sums = np.zeros_like(centroids)
+                np.add.at(sums, assignment, sample)
+                empty = ~sums.any(axis=1)
+                sums[empty] = sample[rng.choice(len(sample), int(empty.sum()))]
+                centroids = _normalize(sums)
+
+            assignment = np.empty(count, dtype=np.int32)
+            for start in range(0, count, _SEARCH_CHUNK_ROWS):
+                stop = min(start + _SEARCH_CHUNK_ROWS, count)
+                assignment[start:stop] = (vectors[start:stop] @ centroids.T).argmax(axis=1)
+            ids = np.argsort(assignment, kind="stable").astype(np.int64)
+            offsets = np.searchsorted(assignment[ids], np.arange(n_lists + 1)).astype(np.int64)
+
+            _save_atomic(self.path / "ivf_centroids.npy", centroids)
+            _save_atomic(self.path / "ivf_ids.npy", ids)
+            _save_atomic(self.path / "ivf_offsets.npy", offsets)
+            self.ivf = {"n_lists": n_lists, "indexed": count}
+            self._write_manifest()
+            self._map()
+
+
+class LongTermMemory:
+    """Embeds text with the LLM backend and stores/retrieves it from a VectorStore."""
+
+    def __init__(self, path: str = LONG_TERM_PATH):
+        self.store = VectorStore(path)
+
+    def open(self) -> None:
+        self.store.open()
+
+    async def remember(self, texts: list[str], metadatas: Optional[list[dict]] = None) -> list[int]:
+        embeddings = await llm.embed(texts)
+        metadatas = metadatas or [{} for _ in texts]
+        records = [{**metadata, "text": text} for text, metadata in zip(texts, metadatas)]
+        return await asyncio.to_thread(self.store.add, np.asarray(embeddings, dtype=np.float32), records)
+
+    async def recall(self, query: str, k: int = 5) -> list[dict]:
+        """Most similar stored texts, best first, each with its ``score``."""
+        if self.store.count == 0:
+            return []
+        embedding = (await llm.embed([query]))[0]
+        scores, ids = await asyncio.to_thread(self.store.search, np.asarray([embedding], dtype=np.float32), k)
+        hits = [(float(score), int(vector_id)) for score, vector_id in zip(scores[0], ids[0]) if vector_id >= 0]
+        metadatas = await asyncio.to_thread(self.store.metadata, [vector_id for _, vector_id in hits])
+        return [{**metadata, "score": score} for (score, _), metadata in zip(hits, metadatas)]
+
+
+long_term_memory = LongTermMemory()
+
+
+async def _ingest(path: str, field: str, batch_size: int) -> int:
+    long_term_memory.open()
+    total = 0
+    batch: list[dict] = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            batch.append(record)
+            if len(batch) >= batch_size:
+                total += len(await long_term_memory.remember([r[field] for r in batch], batch))
+                batch = []
+    if batch:
+        total += len(await long_term_memory.remember([r[field] for r in batch], batch))
+    await llm.aclose()
+    return total
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage the long-term memory vector store")
+    commands = parser.add_subparsers(dest="command", required=True)
+    ingest = commands.add_parser("ingest", help="embed and append JSONL records")
+    ingest.add_argument("input")
+    ingest.add_argument("--field", default="text", help="record field holding the text to embed")
+    ingest.add_argument("--batch-size", type=int, default=64)
+    build = commands.add_parser("build-index", help="(re)build the coarse IVF partitioning")
+    build.add_argument("--lists", type=int, required=True)
+    build.add_argument("--iterations", type=int, default=10)
+    args = parser.parse_args()
+
+    if args.command == "ingest":
+        added = asyncio.run(_ingest(args.input, args.field, args.batch_size))
+        print(f"Added {added} records to {LONG_TERM_PATH}")
+    else:
+        store = VectorStore().open()
+        store.build_ivf(args.lists, iterations=args.iterations)
+        print(f"Built {args.lists}-list IVF index over {store.count} vectors")
@@ -0,0 +1,177 @@
+import json
+import time
+from collections import OrderedDict, deque
+from typing import Optional
+
+from app.config import (
+    SHORT_TERM_BACKEND,
+    SHORT_TERM_TOKEN_BUDGET,
+    SHORT_TERM_MAX_MESSAGES,
+    SHORT_TERM_MAX_TOTAL_TOKENS,
+    SHORT_TERM_IDLE_TTL,
+)
+from app.utils.redis_client import get_redis
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token plus per-message overhead)."""
+    return len(text) // 4 + 4
+
+
+class MessageRecord:
+    """One conversation turn. The chat message dict is built once and reused in every prompt."""
+    __slots__ = ("role", "content", "tokens", "message")
+
+    def __init__(self, role: str, content: str, tokens: Optional[int] = None):
+        self.role = role
+        self.content = content
+        self.tokens = estimate_tokens(content) if tokens is None else tokens
+        self.message = {"role": role, "content": content}
+
+
+class Conversation:
+    """Ring buffer of recent messages trimmed to a token budget; appends and trims are O(1)."""
+    __slots__ = ("records", "tokens", "last_used")
+
+    def __init__(self, max_messages: int):
+        self.records: deque[MessageRecord] = deque(maxlen=max_messages)
+        self.tokens = 0
+        self.last_used = time.monotonic()
+
+    def append(self, record: MessageRecord, token_budget: int) -> int:
+        """Append a record and trim the oldest ones; returns the change in held tokens."""
+        before = self.tokens
+        if len(self.records) == self.records.maxlen:
+            self.tokens -= self.records[0].tokens
+        self.records.append(record)
+        self.tokens += record.tokens
+        while self.tokens > token_budget and len(self.records) > 1:
+            self.tokens -= self.records.popleft().tokens
+        self.last_used = time.monotonic()
+        return self.tokens - before
+
+
+class ShortTermMemory:
+    """In-process short-term memory.
+
+    Conversations are kept in least-recently-used order so idle ones can be
+    evicted from the front, either after ``idle_ttl`` seconds or whenever the
+    total held tokens exceed ``max_total_tokens``.
+    """
+
+    def __init__(
+        self,
+        token_budget: int = SHORT_TERM_TOKEN_BUDGET,
+        max_messages: int = SHORT_TERM_MAX_MESSAGES,
+        max_total_tokens: int = SHORT_TERM_MAX_TOTAL_TOKENS,
+        idle_ttl: float = SHORT_TERM_IDLE_TTL,
+    ):
+        self.token_budget = token_budget
+        self.max_messages = max_messages
+        self.max_total_tokens = max_total_tokens
+        self.idle_ttl = idle_ttl
+        self._conversations: OrderedDict[str, Conversation] = OrderedDict()
+        self.total_tokens = 0
+        self.evictions = 0
+
+    async def append(self, conversation_id: str, role: str, content: str) -> None:
+        conversation = self._conversations.get(conversation_id)
+        if conversation is None:
+            conversation = self._conversations[conversation_id] = Conversation(self.max_messages)
+        else:
+            self._conversations.move_to_end(conversation_id)
+        self.total_tokens += conversation.append(MessageRecord(role, content), self.token_budget)
+        self._evict()
+
+    async def messages(self, conversation_id: str) -> list[dict]:
+        """Messages for prompt assembly, oldest first (shares the cached message dicts)."""
+        conversation = self._conversations.get(conversation_id)
+        if conversation is None:
+            return []
+        self._conversations.move_to_end(conversation_id)
+        conversation.last_used = time.monotonic()
+        return [record.message for record in conversation.records]
+
+    async def clear(self, conversation_id: str) -> None:
+        conversation = self._conversations.pop(conversation_id, None)
+        if conversation is not None:
+            self.total_tokens -= conversation.tokens
+
+    def _evict(self) -> None:
+        idle_before = time.monotonic() - self.idle_ttl
+        while self._conversations:
+            conversation_id, conversation = next(iter(self._conversations.items()))
+            if self.total_tokens <= self.max_total_tokens and conversation.last_used >= idle_before:
+                break
+            del self._conversations[conversation_id]
+            self.total_tokens -= conversation.tokens
+            self.evictions += 1
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "conversations": len(self._conversations),
+            "total_tokens": self.total_tokens,
+            "evictions": self.evictions,
+        }
+
+
+class RedisShortTermMemory:
+    """Short-term memory in Redis lists so every worker sees the same conversations.
+
+    Each conversation is a capped list (``LTRIM``) that expires after ``idle_ttl``;
+    the token budget is applied when reading. The global ceiling is Redis' own
+    ``maxmemory`` policy.
+    """
+
+    def __init__(
+        self,
+        token_budget: int = SHORT_TERM_TOKEN_BUDGET,
+        max_messages: int = SHORT_TERM_MAX_MESSAGES,
+        idle_ttl: float = SHORT_TERM_IDLE_TTL,
+    ):
+        self.token_budget = token_budget
+        self.max_messages = max_messages
+        self.idle_ttl = int(idle_ttl)
+
+    @staticmethod
+    def _key(conversation_id: str) -> str:
+        return f"stm:{conversation_id}"
+
+    async def append(self, conversation_id: str, role: str, content: str) -> None:
+        key = self._key(conversation_id)
+        entry = json.dumps({"r": role, "c": content, "t": estimate_tokens(content)})
+        async with get_redis().pipeline(transaction=False) as pipe:
+            pipe.rpush(key, entry)
+            pipe.ltrim(key, -self.max_messages, -1)
+            pipe.expire(key, self.idle_ttl)
+            await pipe.execute()
+
+    async def messages(self, conversation_id: str) -> list[dict]:
+        entries = await get_redis().lrange(self._key(conversation_id), 0, -1)
+        selected = []
+        tokens = 0
+        for entry in reversed(entries):
+            item = json.loads(entry)
+            tokens += item["t"]
+            if tokens > self.token_budget and selected:
+                break
+            selected.append({"role": item["r"], "content": item["c"]})
+        selected.reverse()
+        return selected
+
+    async def clear(self, conversation_id: str) -> None:
+        await get_redis().delete(self._key(conversation_id))
+
+    def stats(self) -> dict[str, int]:
+        return {}
+
+
+def create_short_term_memory():
+    if SHORT_TERM_BACKEND == "redis":
+        if get_redis() is None:
+            raise RuntimeError("SHORT_TERM_BACKEND=redis requires REDIS_URL")
+        return RedisShortTermMemory()
+    return ShortTermMemory()
+
+
+short_term_memory = create_short_term_memory()
@@ -1,10 +1,15 @@
-from sqlalchemy import Column, Integer, String, DateTime
+from sqlalchemy import Column, Integer, String, DateTime, Index
 from datetime import datetime
 from app.db import Base
 from sqlalchemy.types import Float
 
 class Intent(Base):
     __tablename__ = "intents"
+    # created_at drives the retention job's range deletes; (name, created_at) serves per-intent drill-downs
+    __table_args__ = (
+        Index("ix_intents_created_at", "created_at"),
+        Index("ix_intents_name_created_at", "name", "created_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, nullable=False)
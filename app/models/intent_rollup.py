@@ -0,0 +1,21 @@
+from sqlalchemy import Column, Integer, String, DateTime, Float
+from app.db import Base
+
+
+class IntentRollup(Base):
+    """Per-minute intent counts and confidence sums, by detection tier.
+
+    Maintained incrementally by ``app.services.intent_analytics``; reports read
+    these rows instead of scanning ``intents``.
+    """
+    __tablename__ = "intent_rollups"
+
+    # Primary key (bucket, intent, tier) also serves range scans on bucket
+    bucket = Column(DateTime, primary_key=True)
+    intent = Column(String, primary_key=True)
+    tier = Column(String, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+    confidence_sum = Column(Float, nullable=False, default=0.0)
+
+    def __repr__(self):
+        return f"<IntentRollup(bucket={self.bucket}, intent='{self.intent}', tier='{self.tier}', count={self.count})>"
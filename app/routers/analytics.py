@@ -0,0 +1,40 @@
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from app.services.intent_analytics import intent_rollups
+from app.utils.auth import get_current_user
+from app.utils.principal_cache import Principal
+
+router = APIRouter()
+
+MAX_RANGE = timedelta(days=400)
+
+
+def _naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    # Stored timestamps are naive UTC
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+@router.get("/intents")
+async def intent_analytics(
+    minutes: int = Query(60, ge=1, description="Window ending now; ignored when start is given"),
+    start: Optional[datetime] = Query(None, description="UTC start of the range (inclusive)"),
+    end: Optional[datetime] = Query(None, description="UTC end of the range (exclusive); defaults to now"),
+    step: int = Query(1, ge=1, le=1440, description="Minutes per time-series point"),
+    current_user: Principal = Depends(get_current_user)
+):
+    """Intent and detection-tier mix over a time range, served from per-minute rollups.
+
+    Cost is proportional to the number of minutes in the range, not to the
+    number of detections.
+    """
+    # Round up so the current, still-filling minute is included
+    end = _naive_utc(end) or datetime.utcnow() + timedelta(minutes=1)
+    start = _naive_utc(start) or end - timedelta(minutes=minutes)
+    if start >= end:
+        raise HTTPException(status_code=400, detail="start must be before end")
+    if end - start > MAX_RANGE:
+        raise HTTPException(status_code=400, detail=f"Range is limited to {MAX_RANGE.days} days")
+    return await intent_rollups.summary(start, end, step)
@@ -6,7 +6,13 @@ from pydantic import BaseModel, EmailStr, Field
 
 from app.db import get_db
 from app.models.user import User
-from app.utils.auth import hash_password, verify_password, create_access_token, create_refresh_token
+from app.utils.auth import (
+    hash_password_async,
+    verify_password_async,
+    password_needs_rehash,
+    create_access_token,
+    create_refresh_token,
+)
 from app.schema.user import UserCreate, UserResponse, TokenResponse
 
 router = APIRouter()
@@ -22,41 +28,50 @@ async def register(user_in: UserCreate, db: AsyncSession = Depends(get_db)):
     user = User(
         email=user_in.email,
         full_name=user_in.full_name,
-        hashed_password=hash_password(user_in.password)
+        hashed_password=await hash_password_async(user_in.password)
     )
     db.add(user)
     await db.commit()
     await db.refresh(user)
     return user
 
+
 # Login request schema
 class LoginRequest(BaseModel):
     """Schema for login request."""
     email: EmailStr = Field(..., description="User email address")
     password: str = Field(..., description="User password")
-    
 
 
-@router.post("/token", response_model=TokenResponse)
-async def token(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_db)):
-    """OAuth2 token endpoint for Swagger UI - accepts form data (username=email, password)."""
-    # OAuth2 uses 'username' field, but we authenticate with email
-    result = await db.execute(select(User).where(User.email == form_data.username))
+async def _authenticate(db: AsyncSession, email: str, password: str) -> User:
+    """Check credentials, transparently rehashing if the bcrypt cost factor changed."""
+    result = await db.execute(select(User).where(User.email == email))
     user = result.scalar_one_or_none()
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    if not user or not await verify_password_async(password, user.hashed_password):
         raise HTTPException(status_code=401, detail="Invalid email/password")
-    access = create_access_token({"user_id": user.id})
+    if password_needs_rehash(user.hashed_password):
+        user.hashed_password = await hash_password_async(password)
+        await db.commit()
+    return user
+
+
+def _issue_tokens(user: User) -> dict:
+    # Profile claims let get_current_user skip the users lookup (see AUTH_TRUST_TOKEN_CLAIMS)
+    access = create_access_token({"user_id": user.id, "email": user.email, "full_name": user.full_name})
     refresh = create_refresh_token({"user_id": user.id})
     return {"access_token": access, "refresh_token": refresh, "token_type": "bearer"}
 
 
+@router.post("/token", response_model=TokenResponse)
+async def token(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_db)):
+    """OAuth2 token endpoint for Swagger UI - accepts form data (username=email, password)."""
+    # OAuth2 uses 'username' field, but we authenticate with email
+    user = await _authenticate(db, form_data.username, form_data.password)
+    return _issue_tokens(user)
+
+
 @router.post("/login", response_model=TokenResponse)
 async def login(login_data: LoginRequest, db: AsyncSession = Depends(get_db)):
     """Login endpoint that accepts JSON with email and password."""
-    result = await db.execute(select(User).where(User.email == login_data.email))
-    user = result.scalar_one_or_none()
-    if not user or not verify_password(login_data.password, user.hashed_password):
-        raise HTTPException(status_code=401, detail="Invalid email/password")
-    access = create_access_token({"user_id": user.id})
-    refresh = create_refresh_token({"user_id": user.id})
-    return {"access_token": access, "refresh_token": refresh, "token_type": "bearer"}
+    user = await _authenticate(db, login_data.email, login_data.password)
+    return _issue_tokens(user)
@@ -1,7 +1,21 @@
-from fastapi import APIRouter, Depends
+import asyncio
+import base64
+import json
+from datetime import datetime
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
+from sqlalchemy import insert, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db import AsyncSessionLocal, get_db
+from app.llm.factory import llm
+from app.memory.short_term import short_term_memory
+from app.models.chat_message import ChatMessage
+from app.services.admission import INTERACTIVE, enter
+from app.services.chat_agent import ChatPlan, plan_chat_turn
 from app.utils.auth import get_current_user
-from app.models.user import User
+from app.utils.principal_cache import Principal
 
 router = APIRouter()
 
@@ -10,27 +24,185 @@ router = APIRouter()
 class ChatRequest(BaseModel):
     """Schema for chat request."""
     message: str = Field(..., description="User's chat message")
+    stream: bool = Field(True, description="Relay tokens as server-sent events instead of one JSON body")
+
+
+def _sse(data: dict, event: str | None = None) -> str:
+    """Format one server-sent event."""
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n"
+
+
+def _conversation_id(user: Principal) -> str:
+    return f"user:{user.id}"
+
+
+async def _save_turn(user: Principal, message: str, started_at: datetime, reply: Optional[str]) -> None:
+    """Persist the user's message and, if the model finished, its reply.
+
+    Only completed turns enter short-term memory, so a failed or abandoned
+    generation never leaves an unanswered message in the model's context.
+    """
+    rows = [{"user_id": user.id, "role": "user", "content": message, "created_at": started_at}]
+    if reply is not None:
+        rows.append({"user_id": user.id, "role": "assistant", "content": reply, "created_at": datetime.utcnow()})
+    async with AsyncSessionLocal() as session:
+        await session.execute(insert(ChatMessage), rows)
+        await session.commit()
+    if reply is not None:
+        conversation_id = _conversation_id(user)
+        await short_term_memory.append(conversation_id, "user", message)
+        await short_term_memory.append(conversation_id, "assistant", reply)
+
+
+async def _relay_tokens(request: Request, plan: ChatPlan, user: Principal, message: str, started_at: datetime):
+    """Relay LLM tokens as SSE frames, stopping as soon as the client disconnects.
+
+    StreamingResponse only pulls the next frame once the previous one has been
+    sent, so a slow client slows the upstream read instead of buffering tokens.
+    """
+    yield _sse({"intent": plan.intent, "confidence": plan.confidence, "trace": plan.trace.to_list()}, event="plan")
+    step = plan.trace.begin("generation")
+    stream = llm.chat_stream(plan.messages)
+    parts = []
+    # Anything but a finished or failed stream (a disconnect, or the server closing
+    # this generator) counts as cancelled
+    status, error = "cancelled", None
+    try:
+        async for token in stream:
+            if await request.is_disconnected():
+                break
+            parts.append(token)
+            yield _sse({"token": token})
+        else:
+            status = "ok"
+    except Exception as e:
+        status, error = "error", str(e)
+    finally:
+        try:
+            # Closing the generator closes the upstream request and frees the model slot
+            await stream.aclose()
+        finally:
+            # The turn is persisted exactly once, however the stream ended; shielded so a
+            # cancelled response task still records it
+            plan.trace.end(step, status, error)
+            reply = "".join(parts) if status == "ok" else None
+            await asyncio.shield(_save_turn(user, message, started_at, reply))
+    if status == "ok":
+        yield _sse({"trace": plan.trace.to_list()}, event="done")
+    elif status == "error":
+        yield _sse({"detail": error}, event="error")
 
 
 @router.post("/")
 async def chat_endpoint(
     chat_request: ChatRequest,
-    current_user: User = Depends(get_current_user)
+    request: Request,
+    current_user: Principal = Depends(get_current_user)
 ):
     """Protected chat endpoint - requires authentication."""
+    await enter(request, INTERACTIVE, user_id=current_user.id)
+    started_at = datetime.utcnow()
+    conversation_id = _conversation_id(current_user)
+    # Intent, recent turns and retrieval are prepared concurrently
+    plan = await plan_chat_turn(conversation_id, chat_request.message)
+    # Shed before the stream starts, so overload is a 503 rather than an SSE error
+    llm.limiter.check()
+    if chat_request.stream:
+        return StreamingResponse(
+            _relay_tokens(request, plan, current_user, chat_request.message, started_at),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
+    step = plan.trace.begin("generation")
+    try:
+        response = await llm.chat(plan.messages)
+    except HTTPException:
+        # Shed by admission control: keep the 503 and its Retry-After
+        plan.trace.end(step, "shed")
+        raise
+    except Exception as e:
+        plan.trace.end(step, "error", str(e))
+        await _save_turn(current_user, chat_request.message, started_at, None)
+        raise HTTPException(status_code=502, detail=f"LLM request failed: {e}")
+    plan.trace.end(step)
+    await _save_turn(current_user, chat_request.message, started_at, response)
     return {
-        "response": "Chat slave not implemented yet.",
+        "response": response,
         "user": current_user.email,
-        "message": chat_request.message
+        "message": chat_request.message,
+        "intent": plan.intent,
+        "trace": plan.trace.to_list()
     }
 
 
+def _encode_cursor(created_at: datetime, message_id: int) -> str:
+    raw = json.dumps([created_at.isoformat(), message_id]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def _decode_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        created_at, message_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return datetime.fromisoformat(created_at), int(message_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _message_dict(row) -> dict:
+    return {"id": row.id, "role": row.role, "content": row.content, "created_at": row.created_at.isoformat()}
+
+
+_HISTORY_COLUMNS = (ChatMessage.id, ChatMessage.role, ChatMessage.content, ChatMessage.created_at)
+
+
 @router.get("/history")
 async def get_chat_history(
-    current_user: User = Depends(get_current_user)
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
-    """Get chat history for the current user."""
+    """Get chat history for the current user, newest first.
+
+    Uses keyset pagination on (created_at, id), so every page is one index range
+    scan no matter how far back it is.
+    """
+    query = select(*_HISTORY_COLUMNS).where(ChatMessage.user_id == current_user.id)
+    if cursor:
+        query = query.where(tuple_(ChatMessage.created_at, ChatMessage.id) < _decode_cursor(cursor))
+    query = query.order_by(ChatMessage.created_at.desc(), ChatMessage.id.desc()).limit(limit + 1)
+    rows = (await db.execute(query)).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = _encode_cursor(rows[-1].created_at, rows[-1].id)
     return {
-        "history": "Chat history not implemented yet.",
+        "history": [_message_dict(row) for row in rows],
+        "next_cursor": next_cursor,
         "user": current_user.email
-    }
\ No newline at end of file
+    }
+
+
+async def _export_history(user_id: int):
+    # Own session: the request-scoped one is closed before the body is streamed
+    query = (
+        select(*_HISTORY_COLUMNS)
+        .where(ChatMessage.user_id == user_id)
+        .order_by(ChatMessage.created_at, ChatMessage.id)
+        .execution_options(yield_per=1000)
+    )
+    async with AsyncSessionLocal() as session:
+        result = await session.stream(query)
+        async for row in result:
+            yield json.dumps(_message_dict(row)) + "\n"
+
+
+@router.get("/history/export")
+async def export_chat_history(
+    current_user: Principal = Depends(get_current_user)
+):
+    """Stream the full chat history as NDJSON, oldest first, from a server-side cursor."""
+    return StreamingResponse(_export_history(current_user.id), media_type="application/x-ndjson")
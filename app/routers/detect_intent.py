@@ -1,23 +1,98 @@
-from fastapi import APIRouter, Depends
+import json
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
-from app.agents.intent_detection_agent import intent_detection_agent
-from app.utils.auth import get_current_user
-from app.models.user import User
+from app.agents.intent_detection_agent import INTENT_STAGE_SECONDS, intent_detection_agent
 from app.schema.intent import IntentResponse
-from app.models.intent import Intent
-from app.db import get_db
-from sqlalchemy.ext.asyncio import AsyncSession
+from app.config import INTENT_BULK_MAX_ITEMS, RATE_LIMIT_BATCH_ITEMS_PER_TOKEN
+from app.services.admission import BULK, STANDARD, admit, charge, enter, rate_limiter
+from app.services.intent_bulk import detect_intents_bulk
+from app.services.intent_writer import intent_writer
+from app.utils.metrics import timed
 
 router = APIRouter()
 
 class DetectIntentRequest(BaseModel):
     message: str = Field(..., description="User's message")
 
-@router.post("/", response_model=IntentResponse)
-async def detect_intent(request: DetectIntentRequest, db: AsyncSession = Depends(get_db)):
+@router.post("/", response_model=IntentResponse, dependencies=[Depends(admit(STANDARD))])
+async def detect_intent(request: DetectIntentRequest):
     intent, confidence = await intent_detection_agent(request.message)
-    intent_model = Intent(name=intent, confidence=confidence, raw_input=request.message)
-    db.add(intent_model)
-    await db.commit()
-    await db.refresh(intent_model)
-    return IntentResponse(name=intent_model.name, confidence=intent_model.confidence)
\ No newline at end of file
+    # Persisted write-behind; the response doesn't wait on the database
+    with timed(INTENT_STAGE_SECONDS.labels("db")):
+        await intent_writer.submit(name=intent, confidence=confidence, raw_input=request.message)
+    return IntentResponse(name=intent, confidence=confidence)
+
+
+
+def _message_of(item) -> str:
+    if isinstance(item, str):
+        return item
+    if isinstance(item, dict) and isinstance(item.get("message"), str):
+        return item["message"]
+    raise HTTPException(status_code=400, detail="Each item must be a string or an object with a 'message' string")
+
+
+async def _read_messages(request: Request) -> list[str]:
+    """Messages from a JSON list (or {"messages": [...]}) or an NDJSON upload.
+
+    The caller has already charged one rate-limit token; one more is charged per
+    RATE_LIMIT_BATCH_ITEMS_PER_TOKEN messages as they are read, so a client out
+    of tokens is cut off mid-upload rather than after it.
+    """
+    messages: list[str] = []
+    per_token = max(RATE_LIMIT_BATCH_ITEMS_PER_TOKEN, 1)
+    charged = 1
+
+    async def add(item) -> None:
+        nonlocal charged
+        if len(messages) >= INTENT_BULK_MAX_ITEMS:
+            raise HTTPException(status_code=413, detail=f"At most {INTENT_BULK_MAX_ITEMS} messages per request")
+        messages.append(_message_of(item))
+        # Like RateLimiter.take, a batch never costs more than a full bucket
+        if len(messages) % per_token == 0 and charged < rate_limiter.burst:
+            charged += 1
+            await charge(request, BULK)
+
+    content_type = request.headers.get("content-type", "")
+    try:
+        if "ndjson" in content_type or "jsonl" in content_type:
+            buffer = b""
+            async for chunk in request.stream():
+                buffer += chunk
+                *lines, buffer = buffer.split(b"\n")
+                for line in lines:
+                    if line.strip():
+                        await add(json.loads(line))
+            if buffer.strip():
+                await add(json.loads(buffer))
+        else:
+            body = await request.json()
+            items = body.get("messages") if isinstance(body, dict) else body
+            if not isinstance(items, list):
+                raise HTTPException(status_code=400, detail="Expected a JSON list of messages or {\"messages\": [...]}")
+            for item in items:
+                await add(item)
+    except (json.JSONDecodeError, UnicodeDecodeError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid JSON: {e}")
+    return messages
+
+
+@router.post("/batch")
+async def detect_intent_batch(request: Request):
+    """Classify many messages; results stream back as NDJSON in completion order.
+
+    Accepts a JSON list (of strings or ``{"message": ...}`` objects), a
+    ``{"messages": [...]}`` object, or an ``application/x-ndjson`` upload. Each
+    output line carries the input ``index`` so callers can re-order.
+    """
+    # Charged before the body is read, so a rate-limited client is refused without uploading it;
+    # LLM fallbacks queue behind other traffic
+    await enter(request, BULK)
+    messages = await _read_messages(request)
+
+    async def lines():
+        async for result in detect_intents_bulk(messages):
+            yield json.dumps(result) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
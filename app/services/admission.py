@@ -0,0 +1,290 @@
+"""Admission control: per-client rate limits and priority-aware admission to the LLM.
+
+Two layers:
+
+* ``RateLimiter`` — a token bucket per client (user id, or client address
+  for anonymous endpoints), kept in process or in Redis so several workers
+  share one budget. An empty bucket answers 429 with ``Retry-After``.
+* ``PriorityLimiter`` — the global budget of in-flight LLM calls. Waiters are
+  served by priority class, then first come first served. A call whose
+  expected queue wait exceeds its class's budget is shed right away with 503
+  and ``Retry-After``, and one still queued when the budget runs out is shed
+  then, instead of timing out later.
+  When the queue is full, a newcomer displaces the most recent waiter of a
+  lower class.
+
+Endpoints declare their class with the ``admit`` dependency, which charges
+the rate limit and sets the priority and wait budget for every LLM call the
+request makes (see ``current_priority``). Work outside a request (scripts, the
+CLI) has no budget and is never shed. Answers from the cache, rules or semantic
+tiers don't take an LLM slot at all, so they are never queued behind LLM work.
+"""
+import asyncio
+import contextvars
+import heapq
+import itertools
+import logging
+import math
+import time
+from typing import Optional
+
+from fastapi import HTTPException, Request
+
+from app.config import (
+    ADMISSION_ENABLED,
+    RATE_LIMIT_BACKEND,
+    RATE_LIMIT_RATE,
+    RATE_LIMIT_BURST,
+    RATE_LIMIT_MAX_CLIENTS,
+    ADMISSION_MAX_WAIT_INTERACTIVE,
+    ADMISSION_MAX_WAIT_STANDARD,
+    ADMISSION_MAX_WAIT_BULK,
+    ADMISSION_MAX_QUEUE,
+)
+from app.utils.cache import TTLCache
+from app.utils.metrics import registry
+from app.utils.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+# Priority classes; lower is served first
+INTERACTIVE = 0
+STANDARD = 1
+BULK = 2
+PRIORITY_NAMES = {INTERACTIVE: "interactive", STANDARD: "standard", BULK: "bulk"}
+MAX_WAIT = {
+    INTERACTIVE: ADMISSION_MAX_WAIT_INTERACTIVE,
+    STANDARD: ADMISSION_MAX_WAIT_STANDARD,
+    BULK: ADMISSION_MAX_WAIT_BULK,
+}
+
+current_priority: contextvars.ContextVar[int] = contextvars.ContextVar("admission_priority", default=STANDARD)
+# Seconds one LLM call may queue for a slot; None = as long as it takes
+current_max_wait: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("admission_max_wait", default=None)
+
+ADMISSION_REJECTED = registry.counter(
+    "admission_rejected_total", "Requests refused by admission control", ["reason", "priority"]
+)
+
+
+def _retry_after(seconds: float) -> dict[str, str]:
+    return {"Retry-After": str(max(1, math.ceil(seconds)))}
+
+
+class RateLimiter:
+    """Token bucket per client: ``rate`` tokens per second, up to ``burst``."""
+
+    # Atomic refill-and-take; returns {allowed, seconds until enough tokens}
+    _SCRIPT = """
+    local rate, burst, now, cost = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3]), tonumber(ARGV[4])
+    local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+    local tokens = tonumber(state[1]) or burst
+    local ts = tonumber(state[2]) or now
+    tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+    local allowed, wait = 0, (cost - tokens) / rate
+    if tokens >= cost then
+        tokens, allowed, wait = tokens - cost, 1, 0
+    end
+    redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+    redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+    return {allowed, tostring(wait)}
+    """
+
+    def __init__(self, rate: float = RATE_LIMIT_RATE, burst: float = RATE_LIMIT_BURST,
+                 backend: str = RATE_LIMIT_BACKEND, max_clients: int = RATE_LIMIT_MAX_CLIENTS):
+        if backend not in ("memory", "redis"):
+            raise ValueError(f"Unknown rate limit backend: {backend}")
+        self.rate = rate
+        self.burst = burst
+        self.backend = backend
+        # An idle bucket is full again after burst / rate seconds, so it can be forgotten
+        self.local = TTLCache(maxsize=max_clients, ttl=burst / rate if rate > 0 else 0)
+        self.redis_errors = 0
+
+    def _take_local(self, key: str, cost: float) -> float:
+        now = time.monotonic()
+        bucket = self.local.get(key)
+        if bucket is None:
+            bucket = [self.burst, now]
+        tokens = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+        if tokens >= cost:
+            self.local.set(key, [tokens - cost, now])
+            return 0.0
+        self.local.set(key, [tokens, now])
+        return (cost - tokens) / self.rate
+
+    async def take(self, key: str, cost: float = 1.0) -> float:
+        """Take ``cost`` tokens; returns 0 if allowed, otherwise the seconds until they would be."""
+        if self.rate <= 0:
+            return 0.0
+        # A cost above the burst could never be paid; charge a full bucket instead
+        cost = min(cost, self.burst)
+        client = get_redis() if self.backend == "redis" else None
+        if client is not None:
+            try:
+                allowed, wait = await client.eval(
+                    self._SCRIPT, 1, f"ratelimit:{key}", self.rate, self.burst, time.time(), cost
+                )
+                return 0.0 if int(allowed) else float(wait)
+            except Exception as e:
+                # Fall back to a per-process bucket rather than failing requests
+                self.redis_errors += 1
+                logger.warning("Rate limit Redis call failed: %s", e)
+        return self._take_local(key, cost)
+
+    async def check(self, key: str, cost: float, priority: int) -> None:
+        wait = await self.take(key, cost)
+        if wait > 0:
+            ADMISSION_REJECTED.labels("rate_limit", PRIORITY_NAMES[priority]).inc()
+            raise HTTPException(status_code=429, detail="Rate limit exceeded", headers=_retry_after(wait))
+
+
+class PriorityLimiter:
+    """At most ``capacity`` holders; waiters are granted slots by (priority, arrival)."""
+
+    def __init__(self, capacity: int, max_queue: int = ADMISSION_MAX_QUEUE, alpha: float = 0.2):
+        self.capacity = max(capacity, 1)
+        self.max_queue = max_queue
+        self.alpha = alpha
+        self.in_use = 0
+        self._heap: list[tuple[int, int, asyncio.Future]] = []
+        self._waiters = 0
+        self._seq = itertools.count()
+        # EWMA of how long a slot is held, for queue-wait estimates
+        self.hold_seconds: Optional[float] = None
+        self.shed = 0
+
+    @property
+    def waiting(self) -> int:
+        return self._waiters
+
+    def expected_wait(self, priority: int) -> float:
+        """Rough wait for a new arrival of ``priority``: rounds of ``capacity`` slots ahead of it."""
+        if self.in_use < self.capacity:
+            return 0.0
+        ahead = sum(1 for p, _, future in self._heap if p <= priority and not future.done())
+        return (ahead + 1) / self.capacity * (self.hold_seconds or 1.0)
+
+    def _reject(self, priority: int, reason: str, retry_after: float) -> HTTPException:
+        self.shed += 1
+        ADMISSION_REJECTED.labels(reason, PRIORITY_NAMES.get(priority, str(priority))).inc()
+        return HTTPException(
+            status_code=503,
+            detail="The model server is overloaded, try again shortly",
+            headers=_retry_after(retry_after),
+        )
+
+    def check(self, priority: Optional[int] = None) -> None:
+        """Raise 503 now if a new LLM call of this priority would wait past its budget."""
+        priority = current_priority.get() if priority is None else priority
+        max_wait = current_max_wait.get()
+        if max_wait is None:
+            return
+        expected = self.expected_wait(priority)
+        if expected > max_wait:
+            raise self._reject(priority, "expected_wait", expected)
+
+    async def acquire(self) -> float:
+        """Take a slot; returns the seconds waited. Sheds (503) instead of waiting past the budget."""
+        if self.in_use < self.capacity and not self._waiters:
+            self.in_use += 1
+            return 0.0
+
+        priority = current_priority.get()
+        max_wait = current_max_wait.get()
+        loop = asyncio.get_running_loop()
+        if max_wait is not None:
+            self.check(priority)
+        if self._waiters >= self.max_queue:
+            self._make_room(priority)
+
+        started = loop.time()
+        future = loop.create_future()
+        heapq.heappush(self._heap, (priority, next(self._seq), future))
+        self._waiters += 1
+        try:
+            if max_wait is None:
+                await future
+            else:
+                async with asyncio.timeout(max_wait):
+                    await future
+        except BaseException as e:
+            if future.done() and not future.cancelled() and future.exception() is None:
+                # Granted just as we timed out or were cancelled: pass the slot on
+                self.release()
+            if isinstance(e, TimeoutError):
+                raise self._reject(priority, "deadline", self.expected_wait(priority)) from None
+            raise
+        finally:
+            self._waiters -= 1
+            if not future.done():
+                future.cancel()
+        return loop.time() - started
+
+    def _make_room(self, priority: int) -> None:
+        """Full queue: evict the newest waiter of the lowest class below ``priority``, or refuse."""
+        live = [entry for entry in self._heap if not entry[2].done()]
+        heapq.heapify(live)
+        self._heap = live
+        if len(live) < self.max_queue:
+            return
+        victim = max(live, key=lambda entry: (entry[0], entry[1]))
+        if victim[0] <= priority:
+            raise self._reject(priority, "queue_full", self.expected_wait(priority))
+        victim[2].set_exception(self._reject(victim[0], "displaced", self.expected_wait(victim[0])))
+        # Consume the exception if the victim was cancelled before noticing
+        victim[2].exception()
+
+    def release(self, held_seconds: Optional[float] = None) -> None:
+        if held_seconds is not None:
+            self.hold_seconds = held_seconds if self.hold_seconds is None else (
+                self.alpha * held_seconds + (1 - self.alpha) * self.hold_seconds
+            )
+        while self._heap:
+            _, _, future = heapq.heappop(self._heap)
+            if not future.done():
+                # Hand the slot straight to the next waiter
+                future.set_result(None)
+                return
+        self.in_use -= 1
+
+    def stats(self) -> dict:
+        return {
+            "capacity": self.capacity,
+            "in_use": self.in_use,
+            "waiting": self.waiting,
+            "hold_seconds": round(self.hold_seconds, 4) if self.hold_seconds is not None else None,
+            "shed": self.shed,
+        }
+
+
+rate_limiter = RateLimiter()
+
+
+def client_key(request: Request, user_id: Optional[int] = None) -> str:
+    if user_id is not None:
+        return f"user:{user_id}"
+    return f"ip:{request.client.host if request.client else 'unknown'}"
+
+
+async def enter(request: Request, priority: int, cost: float = 1.0, user_id: Optional[int] = None) -> None:
+    """Charge the client's rate limit and tag the rest of the request with ``priority`` and its wait budget."""
+    if not ADMISSION_ENABLED:
+        return
+    await rate_limiter.check(client_key(request, user_id), cost, priority)
+    current_priority.set(priority)
+    current_max_wait.set(MAX_WAIT[priority])
+
+
+async def charge(request: Request, priority: int, cost: float = 1.0, user_id: Optional[int] = None) -> None:
+    """Charge more of the client's rate limit for work found after ``enter``, e.g. while reading a body."""
+    if not ADMISSION_ENABLED:
+        return
+    await rate_limiter.check(client_key(request, user_id), cost, priority)
+
+
+def admit(priority: int):
+    """Dependency for anonymous endpoints; authenticated ones call ``enter`` with the user id."""
+    async def dependency(request: Request) -> None:
+        await enter(request, priority)
+    return dependency
@@ -0,0 +1,187 @@
+"""Chat orchestrator: turns one chat message into concurrently executed agent steps.
+
+Intent detection, history loading and a speculative long-term retrieval start
+together. Once the intent is known, retrieval is kept or cancelled and the
+intent's own steps (tool calls, ...) run concurrently. Every step runs under
+its own timeout, capped by the turn's overall deadline, and is recorded in a
+per-request execution trace. The final prompt is handed back to the caller,
+which streams or awaits the generation.
+"""
+import asyncio
+import re
+import time
+from dataclasses import dataclass, field, asdict
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Optional
+
+from app.agents.intent_detection_agent import intent_detection_agent
+from app.config import CHAT_STEP_TIMEOUT, CHAT_TURN_DEADLINE, CHAT_RETRIEVAL_TOP_K
+from app.memory.long_term import long_term_memory
+from app.memory.short_term import short_term_memory
+from app.services.intent_writer import intent_writer
+
+SYSTEM_PROMPTS = {
+    "greeting": "You are a friendly assistant. Keep greetings short.",
+    "summarization": "You summarize text faithfully and concisely. Use bullet points for key facts.",
+    "rag_query": "Answer using the retrieved context below when it is relevant. Say so if it does not contain the answer.",
+    "coding_help": "You are an expert programming assistant. Give correct, minimal code and explain briefly.",
+    "task_request": "You help users plan and complete tasks step by step.",
+    "agent_command": "You carry out commands using the tool results below and report what happened.",
+}
+DEFAULT_SYSTEM_PROMPT = "You are a helpful assistant."
+
+RETRIEVAL_INTENTS = {"rag_query"}
+TOOL_INTENTS = {"agent_command", "task_request"}
+
+
+# Tool registry: name -> async callable taking the user's message
+TOOLS: dict[str, Callable[[str], Awaitable[Any]]] = {}
+
+
+def register_tool(name: str):
+    """Register an async tool; it runs when an agent command mentions ``name``."""
+    def decorator(func: Callable[[str], Awaitable[Any]]):
+        TOOLS[name] = func
+        return func
+    return decorator
+
+
+@register_tool("time")
+async def current_time(message: str) -> str:
+    return datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+
+def select_tools(message: str) -> list[str]:
+    return [name for name in TOOLS if re.search(rf"\b{re.escape(name)}\b", message, re.IGNORECASE)]
+
+
+@dataclass
+class StepTrace:
+    name: str
+    status: str = "pending"  # ok | timeout | error | cancelled | discarded
+    started_ms: float = 0.0
+    duration_ms: float = 0.0
+    speculative: bool = False
+    detail: Optional[str] = None
+
+
+@dataclass
+class Trace:
+    """Execution trace for one chat turn; times are relative to the start of the turn."""
+    deadline_s: float = CHAT_TURN_DEADLINE
+    steps: list[StepTrace] = field(default_factory=list)
+
+    def __post_init__(self):
+        self._start = time.perf_counter()
+        self._deadline = asyncio.get_running_loop().time() + self.deadline_s
+
+    def elapsed_ms(self) -> float:
+        return round((time.perf_counter() - self._start) * 1000, 2)
+
+    async def run(self, name: str, awaitable: Awaitable, default: Any = None,
+                  timeout: float = CHAT_STEP_TIMEOUT, speculative: bool = False) -> Any:
+        """Run one step under min(step timeout, turn deadline); failures yield ``default``."""
+        step = StepTrace(name=name, started_ms=self.elapsed_ms(), speculative=speculative)
+        self.steps.append(step)
+        loop = asyncio.get_running_loop()
+        try:
+            async with asyncio.timeout_at(min(loop.time() + timeout, self._deadline)):
+                result = await awaitable
+            step.status = "ok"
+            return result
+        except TimeoutError:
+            step.status = "timeout"
+            return default
+        except asyncio.CancelledError:
+            step.status = "cancelled"
+            raise
+        except Exception as e:
+            step.status = "error"
+            step.detail = str(e)
+            return default
+        finally:
+            step.duration_ms = round(self.elapsed_ms() - step.started_ms, 2)
+
+    def begin(self, name: str) -> StepTrace:
+        """Start a step that is timed by the caller rather than run through ``run``."""
+        step = StepTrace(name=name, started_ms=self.elapsed_ms())
+        self.steps.append(step)
+        return step
+
+    def end(self, step: StepTrace, status: str = "ok", detail: Optional[str] = None) -> None:
+        step.status = status
+        step.detail = detail
+        step.duration_ms = round(self.elapsed_ms() - step.started_ms, 2)
+
+    def discard(self, name: str) -> None:
+        """Mark a finished speculative step whose result went unused."""
+        for step in self.steps:
+            if step.name == name and step.status == "ok":
+                step.status = "discarded"
+
+    def to_list(self) -> list[dict]:
+        return [asdict(step) for step in self.steps]
+
+
+@dataclass
+class ChatPlan:
+    intent: str
+    confidence: float
+    messages: list[dict]
+    trace: Trace
+
+
+def _build_messages(intent: str, history: list[dict], message: str,
+                    retrieved: list[dict], tool_results: dict[str, Any]) -> list[dict]:
+    system = SYSTEM_PROMPTS.get(intent, DEFAULT_SYSTEM_PROMPT)
+    if retrieved:
+        context = "\n".join(f"- {hit['text']}" for hit in retrieved)
+        system += f"\n\nRetrieved context:\n{context}"
+    if tool_results:
+        results = "\n".join(f"- {name}: {value}" for name, value in tool_results.items())
+        system += f"\n\nTool results:\n{results}"
+    return [{"role": "system", "content": system}, *history, {"role": "user", "content": message}]
+
+
+async def plan_chat_turn(conversation_id: str, message: str) -> ChatPlan:
+    """Prepare the generation prompt for one chat turn.
+
+    Wall-clock time tracks the slowest step rather than the sum of all steps.
+    """
+    trace = Trace()
+    retrieved: list[dict] = []
+    tool_results: dict[str, Any] = {}
+
+    async with asyncio.TaskGroup() as group:
+        intent_task = group.create_task(
+            trace.run("intent_detection", intent_detection_agent(message), default=("unknown", 0.0))
+        )
+        history_task = group.create_task(
+            trace.run("history", short_term_memory.messages(conversation_id), default=[])
+        )
+        # Started before the intent is known; cancelled below if it isn't needed
+        retrieval_task = group.create_task(
+            trace.run("retrieval", long_term_memory.recall(message, CHAT_RETRIEVAL_TOP_K), default=[], speculative=True)
+        )
+
+        intent, confidence = await intent_task
+        if intent not in RETRIEVAL_INTENTS:
+            retrieval_task.cancel()
+
+        tool_tasks = {}
+        if intent in TOOL_INTENTS:
+            for name in select_tools(message):
+                tool_tasks[name] = group.create_task(trace.run(f"tool:{name}", TOOLS[name](message)))
+
+    if intent in RETRIEVAL_INTENTS:
+        retrieved = retrieval_task.result()
+    elif not retrieval_task.cancelled():
+        # Retrieval finished before the intent was known; its result is not for this prompt
+        trace.discard("retrieval")
+    for name, task in tool_tasks.items():
+        if task.result() is not None:
+            tool_results[name] = task.result()
+
+    await intent_writer.submit(name=intent, confidence=confidence, raw_input=message)
+    messages = _build_messages(intent, history_task.result(), message, retrieved, tool_results)
+    return ChatPlan(intent=intent, confidence=confidence, messages=messages, trace=trace)
@@ -0,0 +1,240 @@
+"""Incrementally maintained intent analytics and retention for the ``intents`` table.
+
+Every detection is added to an in-memory per-minute rollup keyed by
+(minute, intent, tier); a background task periodically upserts the increments
+into ``intent_rollups`` (``count = count + excluded.count``), so several
+workers can flush into the same rows. Reports read rollup rows, so their cost
+grows with the number of minutes in the range, not with traffic.
+
+A second loop deletes ``intents`` rows older than ``INTENT_RETENTION_DAYS`` in
+small batches (and rollups older than ``INTENT_ROLLUP_RETENTION_DAYS``), which
+keeps the raw table bounded without long-running deletes.
+"""
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import delete, select
+
+from app.config import (
+    INTENT_ROLLUP_FLUSH_INTERVAL,
+    INTENT_RETENTION_DAYS,
+    INTENT_ROLLUP_RETENTION_DAYS,
+    INTENT_RETENTION_INTERVAL,
+    INTENT_RETENTION_BATCH_SIZE,
+)
+from app.db import AsyncSessionLocal
+from app.models.intent import Intent
+from app.models.intent_rollup import IntentRollup
+
+logger = logging.getLogger(__name__)
+
+RollupKey = tuple[datetime, str, str]
+
+
+def minute_bucket(at: datetime) -> datetime:
+    return at.replace(second=0, microsecond=0)
+
+
+def _upsert(dialect: str):
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise RuntimeError(f"Intent rollups need an upsert; unsupported database dialect: {dialect}")
+    return insert
+
+
+class IntentRollups:
+    """In-memory per-minute rollups with periodic additive flushes to ``intent_rollups``."""
+
+    def __init__(
+        self,
+        flush_interval: float = INTENT_ROLLUP_FLUSH_INTERVAL,
+        retention_days: float = INTENT_RETENTION_DAYS,
+        rollup_retention_days: float = INTENT_ROLLUP_RETENTION_DAYS,
+        retention_interval: float = INTENT_RETENTION_INTERVAL,
+        retention_batch_size: int = INTENT_RETENTION_BATCH_SIZE,
+    ):
+        self.flush_interval = flush_interval
+        self.retention_days = retention_days
+        self.rollup_retention_days = rollup_retention_days
+        self.retention_interval = retention_interval
+        self.retention_batch_size = max(retention_batch_size, 1)
+        self._pending: dict[RollupKey, list] = {}
+        self._tasks: list[asyncio.Task] = []
+        self.recorded = 0
+        self.flushes = 0
+        self.flush_failures = 0
+        self.deleted_rows = 0
+
+    def record(self, intent: str, confidence: float, tier: str, count: int = 1, at: Optional[datetime] = None) -> None:
+        """Count ``count`` detections of ``intent`` by ``tier``; O(1), no I/O."""
+        key = (minute_bucket(at or datetime.utcnow()), intent, tier)
+        entry = self._pending.get(key)
+        if entry is None:
+            self._pending[key] = [count, confidence * count]
+        else:
+            entry[0] += count
+            entry[1] += confidence * count
+        self.recorded += count
+
+    async def start(self) -> None:
+        if self._tasks:
+            return
+        self._tasks.append(asyncio.create_task(self._flush_loop(), name="intent-rollups-flush"))
+        if self.retention_interval > 0:
+            self._tasks.append(asyncio.create_task(self._retention_loop(), name="intent-retention"))
+
+    async def stop(self) -> None:
+        """Stop the background loops and flush what is still in memory."""
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
+        await self.flush()
+
+    async def flush(self) -> None:
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, {}
+        rows = [
+            {"bucket": bucket, "intent": intent, "tier": tier, "count": count, "confidence_sum": confidence_sum}
+            for (bucket, intent, tier), (count, confidence_sum) in pending.items()
+        ]
+        self.flushes += 1
+        try:
+            async with AsyncSessionLocal() as session:
+                insert = _upsert(session.bind.dialect.name)
+                statement = insert(IntentRollup)
+                statement = statement.on_conflict_do_update(
+                    index_elements=[IntentRollup.bucket, IntentRollup.intent, IntentRollup.tier],
+                    set_={
+                        "count": IntentRollup.count + statement.excluded.count,
+                        "confidence_sum": IntentRollup.confidence_sum + statement.excluded.confidence_sum,
+                    },
+                )
+                await session.execute(statement, rows)
+                await session.commit()
+        except Exception as e:
+            self.flush_failures += 1
+            logger.error("Failed to flush %d intent rollup rows: %s", len(rows), e)
+            # Merge back so the next flush retries them
+            for key, (count, confidence_sum) in pending.items():
+                entry = self._pending.setdefault(key, [0, 0.0])
+                entry[0] += count
+                entry[1] += confidence_sum
+
+    async def _flush_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def apply_retention(self) -> int:
+        """Delete expired raw intents in batches, then expired rollups; returns raw rows deleted."""
+        deleted = 0
+        now = datetime.utcnow()
+        if self.retention_days > 0:
+            cutoff = now - timedelta(days=self.retention_days)
+            expired = (
+                select(Intent.id).where(Intent.created_at < cutoff).limit(self.retention_batch_size).scalar_subquery()
+            )
+            while True:
+                async with AsyncSessionLocal() as session:
+                    result = await session.execute(delete(Intent).where(Intent.id.in_(expired)))
+                    await session.commit()
+                deleted += result.rowcount
+                if result.rowcount < self.retention_batch_size:
+                    break
+                # Short transactions; let other work in between batches
+                await asyncio.sleep(0)
+        if self.rollup_retention_days > 0:
+            cutoff = minute_bucket(now - timedelta(days=self.rollup_retention_days))
+            async with AsyncSessionLocal() as session:
+                await session.execute(delete(IntentRollup).where(IntentRollup.bucket < cutoff))
+                await session.commit()
+        self.deleted_rows += deleted
+        return deleted
+
+    async def _retention_loop(self) -> None:
+        while True:
+            try:
+                deleted = await self.apply_retention()
+                if deleted:
+                    logger.info("Intent retention deleted %d rows", deleted)
+            except Exception as e:
+                logger.error("Intent retention failed: %s", e)
+            await asyncio.sleep(self.retention_interval)
+
+    async def summary(self, start: datetime, end: datetime, step_minutes: int = 1) -> dict:
+        """Intent mix, tier mix and a time series for [start, end), read from rollups plus unflushed counts."""
+        start, end = minute_bucket(start), minute_bucket(end)
+        query = select(
+            IntentRollup.bucket, IntentRollup.intent, IntentRollup.tier, IntentRollup.count, IntentRollup.confidence_sum
+        ).where(IntentRollup.bucket >= start, IntentRollup.bucket < end)
+        async with AsyncSessionLocal() as session:
+            rows = [tuple(row) for row in (await session.execute(query)).all()]
+        rows.extend(
+            (bucket, intent, tier, count, confidence_sum)
+            for (bucket, intent, tier), (count, confidence_sum) in self._pending.items()
+            if start <= bucket < end
+        )
+
+        step = timedelta(minutes=max(step_minutes, 1))
+        by_intent: dict[str, list] = {}
+        by_tier: dict[str, list] = {}
+        series: dict[datetime, dict[str, int]] = {}
+        total = 0
+        confidence_total = 0.0
+        for bucket, intent, tier, count, confidence_sum in rows:
+            total += count
+            confidence_total += confidence_sum
+            for groups, key in ((by_intent, intent), (by_tier, tier)):
+                entry = groups.setdefault(key, [0, 0.0])
+                entry[0] += count
+                entry[1] += confidence_sum
+            slot = start + ((bucket - start) // step) * step
+            counts = series.setdefault(slot, {})
+            counts[intent] = counts.get(intent, 0) + count
+
+        def describe(groups: dict[str, list]) -> dict:
+            return {
+                key: {
+                    "count": count,
+                    "share": round(count / total, 4) if total else 0.0,
+                    "avg_confidence": round(confidence_sum / count, 4) if count else None,
+                }
+                for key, (count, confidence_sum) in sorted(groups.items(), key=lambda item: -item[1][0])
+            }
+
+        return {
+            "start": start.isoformat(),
+            "end": end.isoformat(),
+            "step_minutes": int(step.total_seconds() // 60),
+            "total": total,
+            "avg_confidence": round(confidence_total / total, 4) if total else None,
+            "by_intent": describe(by_intent),
+            "by_tier": describe(by_tier),
+            "series": [
+                {"bucket": slot.isoformat(), "count": sum(counts.values()), "by_intent": counts}
+                for slot, counts in sorted(series.items())
+            ],
+        }
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "pending_keys": len(self._pending),
+            "recorded": self.recorded,
+            "flushes": self.flushes,
+            "flush_failures": self.flush_failures,
+            "deleted_rows": self.deleted_rows,
+        }
+
+
+intent_rollups = IntentRollups()
@@ -0,0 +1,137 @@
+"""Bulk intent detection: classify many messages with shared work and stream the results.
+
+All inputs go through the rule engine in a single regex pass. The misses are
+deduplicated on their normalized text, answered from the intent cache or the
+semantic classifier where possible, and only the remaining unique texts reach
+the LLM, through the intent batcher with bounded concurrency. Results are
+yielded as soon as they are known (completion order) and persisted with one
+bulk insert per ``chunk_size`` rows.
+"""
+import asyncio
+from contextlib import aclosing
+from datetime import datetime
+from typing import AsyncIterator, Optional
+
+from fastapi import HTTPException
+
+from app.agents.intent_cache import normalize_input
+from app.agents.intent_detection_agent import intent_batcher, intent_cache, record_resolution
+from app.config import INTENT_BULK_LLM_CONCURRENCY, INTENT_WRITE_BATCH_SIZE
+from app.services.intent_writer import intent_writer
+from app.utils.intent_detection import classify_many
+from app.utils.semantic_intent import semantic_intent_classifier
+
+# Semantic scoring is CPU-bound; yield to the event loop between slices
+_SEMANTIC_SLICE = 1000
+
+
+class _Persister:
+    def __init__(self, chunk_size: int):
+        self.chunk_size = max(chunk_size, 1)
+        self.rows: list[dict] = []
+
+    async def add(self, name: str, confidence: float, raw_input: str) -> None:
+        self.rows.append({
+            "name": name,
+            "confidence": confidence,
+            "raw_input": raw_input,
+            "description": None,
+            "created_at": datetime.utcnow(),
+        })
+        if len(self.rows) >= self.chunk_size:
+            await self.flush()
+
+    async def flush(self) -> None:
+        rows, self.rows = self.rows, []
+        await intent_writer.insert_many(rows)
+
+
+async def detect_intents_bulk(
+    messages: list[str],
+    llm_concurrency: int = INTENT_BULK_LLM_CONCURRENCY,
+    chunk_size: int = INTENT_WRITE_BATCH_SIZE,
+    persist: bool = True,
+) -> AsyncIterator[dict]:
+    """Yield ``{"index", "name", "confidence", "tier"}`` for every message, in completion order.
+
+    Messages whose LLM call was shed under overload get ``{"index", "error"}`` instead.
+    """
+    persister = _Persister(chunk_size) if persist else None
+    try:
+        async with aclosing(_resolve(messages, llm_concurrency)) as groups:
+            async for tier, indices, intent, confidence in groups:
+                if tier == "shed":
+                    for index in indices:
+                        yield {"index": index, "error": "overloaded, retry later"}
+                    continue
+                record_resolution(tier, intent, confidence, len(indices))
+                for index in indices:
+                    if persister is not None:
+                        await persister.add(intent, confidence, messages[index])
+                    yield {"index": index, "name": intent, "confidence": confidence, "tier": tier}
+    finally:
+        # Whatever was classified is persisted, even if the consumer stopped early
+        if persister is not None:
+            await persister.flush()
+
+
+async def _resolve(messages: list[str], llm_concurrency: int) -> AsyncIterator[tuple[str, list[int], str, float]]:
+    """Yield ``(tier, indices, intent, confidence)`` groups as they are resolved."""
+    # Tier 1: rules, one regex pass over everything
+    misses: dict[str, list[int]] = {}
+    for index, (intent, confidence) in enumerate(classify_many(messages)):
+        if intent is not None:
+            yield "rules", [index], intent, confidence
+        else:
+            misses.setdefault(normalize_input(messages[index]), []).append(index)
+
+    # Tier 2: cache, per unique miss
+    pending: list[list[int]] = []
+    for indices in misses.values():
+        cached = await intent_cache.get(messages[indices[0]])
+        if cached is not None:
+            yield "cache", indices, *cached
+        else:
+            pending.append(indices)
+
+    # Tier 3: semantic classifier, vectorized
+    unresolved: list[list[int]] = []
+    for start in range(0, len(pending), _SEMANTIC_SLICE):
+        group = pending[start:start + _SEMANTIC_SLICE]
+        predictions = semantic_intent_classifier.predict_many([messages[indices[0]] for indices in group])
+        for indices, (intent, confidence) in zip(group, predictions):
+            if intent is not None:
+                await intent_cache.set(messages[indices[0]], (intent, confidence), shared=False)
+                yield "semantic", indices, intent, confidence
+            else:
+                unresolved.append(indices)
+        await asyncio.sleep(0)
+
+    # Tier 4: LLM, unique misses only; the batcher folds concurrent calls into batched prompts
+    semaphore = asyncio.Semaphore(max(llm_concurrency, 1))
+
+    async def classify(indices: list[int]) -> tuple[list[int], Optional[tuple[str, float]]]:
+        async with semaphore:
+            try:
+                return indices, await intent_batcher.classify(messages[indices[0]])
+            except HTTPException as e:
+                if e.status_code != 503:
+                    raise
+                # Shed by admission control; report these items and carry on with the rest
+                return indices, None
+
+    tasks = [asyncio.create_task(classify(indices)) for indices in unresolved]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            indices, result = await next_done
+            if result is None:
+                yield "shed", indices, "", 0.0
+                continue
+            intent, confidence = result
+            if confidence:
+                await intent_cache.set(messages[indices[0]], (intent, confidence))
+            yield "llm", indices, intent, confidence
+    finally:
+        # If the client went away, stop spending LLM time on the rest
+        for task in tasks:
+            task.cancel()
@@ -0,0 +1,185 @@
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import insert
+
+from app.config import (
+    INTENT_WRITE_MODE,
+    INTENT_WRITE_QUEUE_SIZE,
+    INTENT_WRITE_BATCH_SIZE,
+    INTENT_WRITE_FLUSH_INTERVAL_MS,
+)
+from app.db import AsyncSessionLocal
+from app.models.intent import Intent
+from app.utils.metrics import registry, timed
+
+DB_WRITE_SECONDS = registry.histogram("db_write_seconds", "Bulk insert duration, including commit", ["table"])
+INTENT_WRITE_QUEUE_DEPTH = registry.gauge("intent_write_queue_depth", "Intent records waiting to be written")
+INTENT_WRITE_RECORDS = registry.gauge("intent_write_records", "Intent writer record counts since startup", ["state"])
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class IntentWriter:
+    """Write-behind persistence for detected intents.
+
+    Records are pushed onto a bounded queue and a background task flushes them
+    as bulk multi-row inserts whenever ``batch_size`` records are pending or
+    ``flush_interval_ms`` has passed. In ``"async"`` mode ``submit`` returns
+    immediately and records are dropped (and counted) when the queue is full; in
+    ``"sync"`` mode it waits until the record's batch has been committed.
+    """
+
+    def __init__(
+        self,
+        mode: str = INTENT_WRITE_MODE,
+        queue_size: int = INTENT_WRITE_QUEUE_SIZE,
+        batch_size: int = INTENT_WRITE_BATCH_SIZE,
+        flush_interval_ms: float = INTENT_WRITE_FLUSH_INTERVAL_MS,
+    ):
+        if mode not in ("async", "sync"):
+            raise ValueError(f"Unknown intent write mode: {mode}")
+        self.mode = mode
+        self.queue_size = queue_size
+        self.batch_size = max(batch_size, 1)
+        self.flush_interval = flush_interval_ms / 1000
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self.enqueued = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.flushes = 0
+        self.max_depth = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self) -> None:
+        if self.running:
+            return
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._task = asyncio.create_task(self._run(), name="intent-writer")
+
+    async def stop(self) -> None:
+        """Flush everything still queued, then stop the background task."""
+        if not self.running:
+            return
+        await self._queue.put(_STOP)
+        await self._task
+        self._task = None
+
+    async def submit(self, name: str, confidence: float, raw_input: str, description: Optional[str] = None) -> None:
+        row = {
+            "name": name,
+            "confidence": confidence,
+            "raw_input": raw_input,
+            "description": description,
+            "created_at": datetime.utcnow(),
+        }
+        if not self.running:
+            # No background writer (scripts, tests): write through
+            await self.insert_many([row])
+            return
+
+        self.enqueued += 1
+        if self.mode == "sync":
+            done = asyncio.get_running_loop().create_future()
+            await self._queue.put((row, done))
+            self._observe_depth()
+            await done
+            return
+
+        try:
+            self._queue.put_nowait((row, None))
+        except asyncio.QueueFull:
+            self.dropped += 1
+            logger.warning("Intent write queue full (%d); dropped record, %d dropped so far", self.queue_size, self.dropped)
+            return
+        self._observe_depth()
+
+    async def insert_many(self, rows: list[dict]) -> None:
+        """Insert rows with one bulk multi-row INSERT."""
+        if not rows:
+            return
+        with timed(DB_WRITE_SECONDS.labels("intents")):
+            async with AsyncSessionLocal() as session:
+                await session.execute(insert(Intent), rows)
+                await session.commit()
+
+    def _observe_depth(self) -> None:
+        depth = self._queue.qsize()
+        if depth > self.max_depth:
+            self.max_depth = depth
+
+    async def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            item = await self._queue.get()
+            if item is _STOP:
+                break
+            batch = [item]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                try:
+                    item = self._queue.get_nowait() if timeout <= 0 else await asyncio.wait_for(self._queue.get(), timeout)
+                except (asyncio.QueueEmpty, asyncio.TimeoutError):
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            await self._flush(batch)
+
+        # Drain whatever was queued behind the stop marker
+        remaining = []
+        while not self._queue.empty():
+            item = self._queue.get_nowait()
+            if item is not _STOP:
+                remaining.append(item)
+        for start in range(0, len(remaining), self.batch_size):
+            await self._flush(remaining[start:start + self.batch_size])
+
+    async def _flush(self, batch: list[tuple[dict, Optional[asyncio.Future]]]) -> None:
+        self.flushes += 1
+        try:
+            await self.insert_many([row for row, _ in batch])
+        except Exception as e:
+            self.failed += len(batch)
+            logger.error("Failed to persist %d intent records: %s", len(batch), e)
+            for _, done in batch:
+                if done is not None and not done.done():
+                    done.set_exception(e)
+            return
+        self.written += len(batch)
+        for _, done in batch:
+            if done is not None and not done.done():
+                done.set_result(None)
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "max_queue_depth": self.max_depth,
+            "enqueued": self.enqueued,
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "flushes": self.flushes,
+        }
+
+
+    def collect_metrics(self) -> None:
+        INTENT_WRITE_QUEUE_DEPTH.set(self._queue.qsize() if self._queue is not None else 0)
+        for state in ("written", "dropped", "failed"):
+            INTENT_WRITE_RECORDS.labels(state).set(getattr(self, state))
+
+
+intent_writer = IntentWriter()
+registry.collect(intent_writer.collect_metrics)
@@ -1,3 +1,5 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from jose import jwt, JWTError
 import bcrypt
@@ -6,9 +8,19 @@ from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 
-from app.config import SECRET_KEY, ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES, REFRESH_TOKEN_EXPIRE_DAYS
+from app.config import (
+    SECRET_KEY,
+    ALGORITHM,
+    ACCESS_TOKEN_EXPIRE_MINUTES,
+    REFRESH_TOKEN_EXPIRE_DAYS,
+    BCRYPT_ROUNDS,
+    PASSWORD_HASH_WORKERS,
+    PASSWORD_HASH_MAX_PENDING,
+    AUTH_TRUST_TOKEN_CLAIMS,
+)
 from app.db import get_db
 from app.models.user import User
+from app.utils.principal_cache import Principal, principal_cache, token_cache
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/token")
 
@@ -47,7 +59,7 @@ def hash_password(password: str) -> str:
     # Encode password to bytes for bcrypt
     password_bytes = truncated.encode('utf-8')
     # Generate salt and hash
-    salt = bcrypt.gensalt()
+    salt = bcrypt.gensalt(rounds=BCRYPT_ROUNDS)
     hashed = bcrypt.hashpw(password_bytes, salt)
     # Return as string (bcrypt returns bytes)
     return hashed.decode('utf-8')
@@ -63,6 +75,52 @@ def verify_password(plain: str, hashed: str) -> bool:
     # Verify password
     return bcrypt.checkpw(password_bytes, hashed_bytes)
 
+def password_needs_rehash(hashed: str) -> bool:
+    """True if the hash was made with a different cost factor than BCRYPT_ROUNDS."""
+    try:
+        return int(hashed.split("$")[2]) != BCRYPT_ROUNDS
+    except (IndexError, ValueError):
+        return True
+
+# bcrypt releases the GIL, so a small thread pool keeps hashing off the event loop
+_hash_executor: ThreadPoolExecutor | None = None
+_hash_pending = 0
+
+def _get_hash_executor() -> ThreadPoolExecutor:
+    global _hash_executor
+    if _hash_executor is None:
+        _hash_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt")
+    return _hash_executor
+
+async def _run_hash_job(func, *args):
+    """Run a bcrypt call in the hashing pool, rejecting work beyond PASSWORD_HASH_MAX_PENDING."""
+    global _hash_pending
+    if _hash_pending >= PASSWORD_HASH_MAX_PENDING:
+        raise HTTPException(
+            status_code=503,
+            detail="Too many authentication requests, try again shortly",
+            headers={"Retry-After": "1"},
+        )
+    _hash_pending += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_get_hash_executor(), func, *args)
+    finally:
+        _hash_pending -= 1
+
+async def hash_password_async(password: str) -> str:
+    """Hash a password without blocking the event loop."""
+    return await _run_hash_job(hash_password, password)
+
+async def verify_password_async(plain: str, hashed: str) -> bool:
+    """Verify a password without blocking the event loop."""
+    return await _run_hash_job(verify_password, plain, hashed)
+
+def shutdown_password_hasher() -> None:
+    global _hash_executor
+    if _hash_executor is not None:
+        _hash_executor.shutdown(wait=False, cancel_futures=True)
+        _hash_executor = None
+
 # JWT helpers
 def create_access_token(data: dict) -> str:
     to_encode = data.copy()
@@ -80,15 +138,33 @@ def decode_token(token: str) -> dict:
     except JWTError:
         raise HTTPException(status_code=401, detail="Could not validate credentials")
 
-# Dependency: returns current user model instance
-async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)) -> User:
-    payload = decode_token(token)
+def decode_token_cached(token: str) -> dict:
+    """Decode a token, reusing the verified payload until the token expires."""
+    payload = token_cache.get(token)
+    if payload is None:
+        payload = decode_token(token)
+        token_cache.set(token, payload)
+    return payload
+
+# Dependency: returns an immutable snapshot of the current user
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)) -> Principal:
+    payload = decode_token_cached(token)
     user_id = payload.get("user_id")
     if user_id is None:
         raise HTTPException(status_code=401, detail="Invalid token payload")
 
+    if AUTH_TRUST_TOKEN_CLAIMS and payload.get("email"):
+        return Principal(id=user_id, email=payload["email"], full_name=payload.get("full_name"))
+
+    principal = await principal_cache.get(user_id)
+    if principal is not None:
+        # The session never checked out a connection, so Postgres isn't touched
+        return principal
+
     result = await db.execute(select(User).where(User.id == user_id))
     user = result.scalar_one_or_none()
     if user is None:
         raise HTTPException(status_code=401, detail="User not found")
-    return user
+    principal = Principal.from_user(user)
+    await principal_cache.set(principal)
+    return principal
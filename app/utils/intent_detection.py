@@ -1,16 +1,100 @@
+import re
+from bisect import bisect_right
+from itertools import accumulate
+from typing import NamedTuple, Optional
+
+
+class IntentRule(NamedTuple):
+    """Keyword rule; on conflicting hits the highest priority, then confidence, wins."""
+    intent: str
+    keywords: tuple[str, ...]
+    confidence: float
+    priority: int
+
+
+INTENT_RULES: tuple[IntentRule, ...] = (
+    IntentRule("greeting", ("hi", "hello", "hey"), 0.95, 50),
+    IntentRule("summarization", ("summary", "summarize", "summarise", "tl;dr"), 0.90, 40),
+    IntentRule("rag_query", ("search", "find"), 0.85, 30),
+    IntentRule("coding_help", ("code", "bug", "bugs"), 0.85, 20),
+    IntentRule("task_request", ("task", "tasks", "do this"), 0.80, 10),
+)
+
+
+def _trie_pattern(keywords: list[str]) -> str:
+    """Build an alternation factored on shared prefixes so matching cost tracks input length, not rule count."""
+    trie: dict = {}
+    for keyword in keywords:
+        node = trie
+        for char in keyword:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def build(node: dict) -> str:
+        terminal = "" in node
+        alternatives = [
+            (r"\s+" if char == " " else re.escape(char)) + build(child)
+            for char, child in sorted(node.items()) if char
+        ]
+        if not alternatives:
+            return ""
+        if len(alternatives) == 1 and not terminal:
+            return alternatives[0]
+        group = f"(?:{'|'.join(alternatives)})"
+        return f"{group}?" if terminal else group
+
+    return build(trie)
+
+
+def _compile(rules: tuple[IntentRule, ...]) -> tuple[re.Pattern, dict[str, IntentRule]]:
+    """Compile every keyword into one case-insensitive, word-bounded alternation."""
+    by_keyword: dict[str, IntentRule] = {}
+    for rule in rules:
+        for keyword in rule.keywords:
+            keyword = " ".join(keyword.lower().split())
+            current = by_keyword.get(keyword)
+            if current is None or (rule.priority, rule.confidence) > (current.priority, current.confidence):
+                by_keyword[keyword] = rule
+    pattern = re.compile(rf"\b(?:{_trie_pattern(list(by_keyword))})\b", re.IGNORECASE)
+    return pattern, by_keyword
+
+
+_PATTERN, _RULES_BY_KEYWORD = _compile(INTENT_RULES)
+
+
+def _better(rule: IntentRule, best: Optional[IntentRule]) -> bool:
+    return best is None or (rule.priority, rule.confidence) > (best.priority, best.confidence)
+
+
+def _match(raw_input: str) -> Optional[IntentRule]:
+    best: Optional[IntentRule] = None
+    for match in _PATTERN.finditer(raw_input):
+        rule = _RULES_BY_KEYWORD.get(" ".join(match.group().lower().split()))
+        if rule is not None and _better(rule, best):
+            best = rule
+    return best
+
+
 def rule_based_intent_detection(raw_input: str) -> tuple[str, float]:
     """Rule based intent detection."""
-    if any(k in raw_input for k in ["hi", "hello", "hey"]):
-        return "greeting", 0.95
-    if "summary" in raw_input or "summarize" in raw_input:
-        return "summarization", 0.90
-
-    if "search" in raw_input or "find" in raw_input:
-        return "rag_query", 0.85
+    rule = _match(raw_input)
+    if rule is None:
+        return None, None
+    return rule.intent, rule.confidence
 
-    if "code" in raw_input or "bug" in raw_input:
-        return "coding_help", 0.85
 
-    if "task" in raw_input or "do this" in raw_input:
-        return "task_request", 0.80
-    return None, None
\ No newline at end of file
+def classify_many(raw_inputs: list[str]) -> list[tuple[str, float]]:
+    """Rule based intent detection for many inputs in a single regex pass; misses are ``(None, None)``."""
+    if not raw_inputs:
+        return []
+    # NUL separators are word boundaries that no keyword (or the whitespace inside one) can span
+    starts = list(accumulate((len(raw_input) + 1 for raw_input in raw_inputs[:-1]), initial=0))
+    best: list[Optional[IntentRule]] = [None] * len(raw_inputs)
+    for match in _PATTERN.finditer("\0".join(raw_inputs)):
+        rule = _RULES_BY_KEYWORD.get(" ".join(match.group().lower().split()))
+        if rule is None:
+            continue
+        index = bisect_right(starts, match.start()) - 1
+        if _better(rule, best[index]):
+            best[index] = rule
+    return [(rule.intent, rule.confidence) if rule else (None, None) for rule in best]
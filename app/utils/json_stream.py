@@ -0,0 +1,52 @@
+import json
+from typing import Optional
+
+
+class JsonObjectStreamParser:
+    """Find the first complete top-level JSON object in text that arrives in chunks.
+
+    Only braces outside string literals are counted, and every character is
+    scanned once, so the caller can stop reading a stream the moment the object
+    closes instead of waiting for (and paying for) the rest of the completion.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self._position = 0
+        self._start = -1
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+
+    def feed(self, chunk: str) -> Optional[dict]:
+        """Add text; returns the object once one has been fully received and parses."""
+        self.buffer += chunk
+        text = self.buffer
+        for index in range(self._position, len(text)):
+            char = text[index]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                if self._depth:
+                    self._in_string = True
+            elif char == "{":
+                if self._depth == 0:
+                    self._start = index
+                self._depth += 1
+            elif char == "}" and self._depth:
+                self._depth -= 1
+                if self._depth == 0:
+                    self._position = index + 1
+                    try:
+                        result = json.loads(text[self._start:index + 1])
+                    except json.JSONDecodeError:
+                        continue
+                    if isinstance(result, dict):
+                        return result
+        self._position = len(text)
+        return None
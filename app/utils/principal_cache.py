@@ -0,0 +1,101 @@
+import hashlib
+import json
+import logging
+import time
+from dataclasses import dataclass, asdict
+from typing import Optional
+
+from app.config import PRINCIPAL_CACHE_SIZE, PRINCIPAL_CACHE_TTL, TOKEN_CACHE_SIZE
+from app.utils.cache import TTLCache
+from app.utils.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True, slots=True)
+class Principal:
+    """Immutable snapshot of the authenticated user, safe to share between requests."""
+    id: int
+    email: str
+    full_name: Optional[str] = None
+
+    @classmethod
+    def from_user(cls, user) -> "Principal":
+        return cls(id=user.id, email=user.email, full_name=user.full_name)
+
+
+class PrincipalCache:
+    """Bounded TTL LRU of principals by user id, optionally backed by Redis."""
+
+    def __init__(self, maxsize: int = PRINCIPAL_CACHE_SIZE, ttl: float = PRINCIPAL_CACHE_TTL):
+        self.ttl = ttl
+        self.local = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    @staticmethod
+    def _key(user_id: int) -> str:
+        return f"principal:{user_id}"
+
+    async def get(self, user_id: int) -> Optional[Principal]:
+        principal = self.local.get(user_id)
+        if principal is not None:
+            return principal
+        client = get_redis()
+        if client is None:
+            return None
+        try:
+            value = await client.get(self._key(user_id))
+        except Exception as e:
+            logger.warning("Principal cache Redis get failed: %s", e)
+            return None
+        if value is None:
+            return None
+        principal = Principal(**json.loads(value))
+        self.local.set(user_id, principal)
+        return principal
+
+    async def set(self, principal: Principal) -> None:
+        self.local.set(principal.id, principal)
+        client = get_redis()
+        if client is None:
+            return
+        try:
+            await client.set(self._key(principal.id), json.dumps(asdict(principal)), ex=int(self.ttl))
+        except Exception as e:
+            logger.warning("Principal cache Redis set failed: %s", e)
+
+    async def invalidate(self, user_id: int) -> None:
+        """Drop a user's snapshot; call whenever a user row is updated or deleted."""
+        self.local.delete(user_id)
+        client = get_redis()
+        if client is None:
+            return
+        try:
+            await client.delete(self._key(user_id))
+        except Exception as e:
+            logger.warning("Principal cache Redis delete failed: %s", e)
+
+
+class TokenCache:
+    """Decoded JWT payloads keyed by a digest of the token, kept until the token's ``exp``."""
+
+    def __init__(self, maxsize: int = TOKEN_CACHE_SIZE):
+        self.local = TTLCache(maxsize=maxsize, ttl=0)
+
+    @staticmethod
+    def _key(token: str) -> str:
+        return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+    def get(self, token: str) -> Optional[dict]:
+        return self.local.get(self._key(token))
+
+    def set(self, token: str, payload: dict) -> None:
+        exp = payload.get("exp")
+        if exp is None:
+            return
+        ttl = float(exp) - time.time()
+        if ttl > 0:
+            self.local.set(self._key(token), payload, ttl=ttl)
+
+
+principal_cache = PrincipalCache()
+token_cache = TokenCache()
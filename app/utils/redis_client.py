@@ -0,0 +1,24 @@
+from typing import Optional
+
+import redis.asyncio as redis
+
+from app.config import REDIS_URL
+
+_client: Optional[redis.Redis] = None
+
+
+def get_redis() -> Optional[redis.Redis]:
+    """Shared Redis client, or None when REDIS_URL is not configured."""
+    global _client
+    if not REDIS_URL:
+        return None
+    if _client is None:
+        _client = redis.from_url(REDIS_URL, decode_responses=True)
+    return _client
+
+
+async def close_redis() -> None:
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
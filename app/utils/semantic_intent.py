@@ -0,0 +1,203 @@
+"""CPU-only semantic intent tier that sits between the keyword rules and the LLM.
+
+Inputs are turned into hashed word and character n-gram features and scored
+against per-intent centroids with NumPy. The model artifact is a directory
+holding ``weights.npy`` (features x intents, float32) and ``labels.json``; the
+weights are memory-mapped at startup so loading is instant.
+
+Train from the labeled rows in the ``intents`` table with:
+
+    python -m app.utils.semantic_intent
+"""
+import asyncio
+import json
+import logging
+import os
+import re
+import zlib
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+from app.config import (
+    SEMANTIC_INTENT_MODEL_PATH,
+    SEMANTIC_INTENT_MIN_CONFIDENCE,
+    SEMANTIC_INTENT_TEMPERATURE,
+    SEMANTIC_INTENT_FEATURE_BITS,
+    SEMANTIC_INTENT_TRAIN_MIN_CONFIDENCE,
+)
+from app.utils.metrics import registry
+
+SEMANTIC_INTENT_STATS = registry.gauge(
+    "semantic_intent_stats", "Semantic tier: model loaded (0/1), inputs answered and escalated since startup", ["stat"]
+)
+
+logger = logging.getLogger(__name__)
+
+_WORDS = re.compile(r"\w+")
+
+
+def featurize(text: str, bits: int = SEMANTIC_INTENT_FEATURE_BITS) -> tuple[np.ndarray, np.ndarray]:
+    """Hash word unigrams, word bigrams and character trigrams into an L2-normalized sparse vector."""
+    mask = (1 << bits) - 1
+    words = _WORDS.findall(text.casefold())
+    grams = [f"w:{word}" for word in words]
+    grams += [f"b:{a} {b}" for a, b in zip(words, words[1:])]
+    for word in words:
+        padded = f" {word} "
+        grams += [f"c:{padded[i:i + 3]}" for i in range(len(padded) - 2)]
+    if not grams:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+    # crc32 is stable across processes, unlike the built-in str hash
+    hashed = np.fromiter((zlib.crc32(gram.encode("utf-8")) & mask for gram in grams), dtype=np.int64, count=len(grams))
+    indices, counts = np.unique(hashed, return_counts=True)
+    values = np.log1p(counts).astype(np.float32)
+    values /= np.linalg.norm(values)
+    return indices, values
+
+
+class SemanticIntentClassifier:
+    """Nearest-centroid intent classifier over hashed n-gram features."""
+
+    def __init__(
+        self,
+        min_confidence: float = SEMANTIC_INTENT_MIN_CONFIDENCE,
+        temperature: float = SEMANTIC_INTENT_TEMPERATURE,
+    ):
+        self.min_confidence = min_confidence
+        self.temperature = temperature
+        self.weights: Optional[np.ndarray] = None
+        self.labels: list[str] = []
+        self.bits = SEMANTIC_INTENT_FEATURE_BITS
+        self.answered = 0
+        self.escalated = 0
+
+    @property
+    def loaded(self) -> bool:
+        return self.weights is not None
+
+    def load(self, path: str = SEMANTIC_INTENT_MODEL_PATH) -> bool:
+        """Memory-map a trained artifact; returns False (tier disabled) if none exists."""
+        directory = Path(path)
+        if not (directory / "weights.npy").exists():
+            logger.info("No semantic intent model at %s; tier disabled", directory)
+            return False
+        meta = json.loads((directory / "labels.json").read_text())
+        weights = np.load(directory / "weights.npy", mmap_mode="r")
+        if weights.shape != (1 << meta["bits"], len(meta["labels"])):
+            # Caught between the two renames of a retrain; keep whatever is loaded
+            logger.warning("Semantic intent model at %s is mid-update; not loaded", directory)
+            return False
+        self.weights = weights
+        self.labels = meta["labels"]
+        self.bits = meta["bits"]
+        return True
+
+    def scores_many(self, texts: list[str]) -> np.ndarray:
+        """Softmax-calibrated intent probabilities, one row per text."""
+        features = [featurize(text, self.bits) for text in texts]
+        lengths = np.array([len(indices) for indices, _ in features])
+        if lengths.sum() == 0:
+            return np.full((len(texts), len(self.labels)), 1.0 / len(self.labels), dtype=np.float32)
+
+        indices = np.concatenate([indices for indices, _ in features])
+        values = np.concatenate([values for _, values in features])
+        contributions = np.asarray(self.weights[indices]) * values[:, None]
+        # Sum contributions per text; empty texts keep all-zero similarity
+        similarity = np.zeros((len(texts), len(self.labels)), dtype=np.float32)
+        nonempty = lengths > 0
+        offsets = np.concatenate(([0], np.cumsum(lengths)[:-1]))[nonempty]
+        similarity[nonempty] = np.add.reduceat(contributions, offsets, axis=0)
+
+        logits = similarity * self.temperature
+        logits -= logits.max(axis=1, keepdims=True)
+        probabilities = np.exp(logits)
+        probabilities /= probabilities.sum(axis=1, keepdims=True)
+        return probabilities
+
+    def predict_many(self, texts: list[str]) -> list[tuple[Optional[str], Optional[float]]]:
+        """Classify texts; results below the confidence threshold are ``(None, None)`` (escalate)."""
+        if not self.loaded or not texts:
+            return [(None, None)] * len(texts)
+        probabilities = self.scores_many(texts)
+        best = probabilities.argmax(axis=1)
+        results = []
+        for row, label_index in enumerate(best):
+            confidence = float(probabilities[row, label_index])
+            if confidence >= self.min_confidence:
+                self.answered += 1
+                results.append((self.labels[label_index], round(confidence, 4)))
+            else:
+                self.escalated += 1
+                results.append((None, None))
+        return results
+
+    def predict(self, text: str) -> tuple[Optional[str], Optional[float]]:
+        return self.predict_many([text])[0]
+
+    def stats(self) -> dict[str, int]:
+        return {"loaded": int(self.loaded), "answered": self.answered, "escalated": self.escalated}
+
+
+def train(rows: list[tuple[str, str]], path: str = SEMANTIC_INTENT_MODEL_PATH, bits: int = SEMANTIC_INTENT_FEATURE_BITS) -> int:
+    """Build per-intent centroids from ``(intent, raw_input)`` rows and save the artifact."""
+    labels = sorted({intent for intent, _ in rows})
+    if len(labels) < 2:
+        raise ValueError("Need labeled examples for at least two intents to train")
+    label_index = {label: i for i, label in enumerate(labels)}
+
+    weights = np.zeros((1 << bits, len(labels)), dtype=np.float32)
+    for intent, raw_input in rows:
+        indices, values = featurize(raw_input, bits)
+        weights[indices, label_index[intent]] += values
+
+    norms = np.linalg.norm(weights, axis=0)
+    weights /= np.where(norms > 0, norms, 1.0)
+
+    directory = Path(path)
+    directory.mkdir(parents=True, exist_ok=True)
+    # Live workers memory-map weights.npy: never rewrite it in place, swap in a new file.
+    # Labels go last, and load() rejects a pair whose shapes disagree mid-swap.
+    weights_tmp = directory / "weights.npy.tmp"
+    with open(weights_tmp, "wb") as f:
+        np.save(f, weights)
+    labels_tmp = directory / "labels.json.tmp"
+    labels_tmp.write_text(json.dumps({"labels": labels, "bits": bits}))
+    os.replace(weights_tmp, directory / "weights.npy")
+    os.replace(labels_tmp, directory / "labels.json")
+    return len(rows)
+
+
+async def load_training_rows(min_confidence: float = SEMANTIC_INTENT_TRAIN_MIN_CONFIDENCE) -> list[tuple[str, str]]:
+    """Read confidently labeled rows from the ``intents`` table."""
+    from sqlalchemy import select
+    from app.db import AsyncSessionLocal
+    from app.models.intent import Intent
+
+    query = (
+        select(Intent.name, Intent.raw_input)
+        .where(Intent.name != "unknown", Intent.confidence >= min_confidence)
+        .execution_options(yield_per=5000)
+    )
+    async with AsyncSessionLocal() as session:
+        result = await session.stream(query)
+        return [(name, raw_input) async for name, raw_input in result]
+
+
+semantic_intent_classifier = SemanticIntentClassifier()
+
+
+def collect_metrics() -> None:
+    for name, value in semantic_intent_classifier.stats().items():
+        SEMANTIC_INTENT_STATS.labels(name).set(value)
+
+
+registry.collect(collect_metrics)
+
+
+if __name__ == "__main__":
+    training_rows = asyncio.run(load_training_rows())
+    count = train(training_rows)
+    print(f"Trained semantic intent model on {count} rows -> {SEMANTIC_INTENT_MODEL_PATH}")
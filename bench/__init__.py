@@ -0,0 +1 @@
+# Load-testing tools: a mock OpenAI-compatible server and a load generator.
@@ -0,0 +1,424 @@
+"""Open-loop load generator for the API.
+
+Drives ``/detect-intent``, ``/chat`` and ``/auth/login`` at a target request
+rate and reports latency percentiles, throughput, errors and the load
+generator's own event-loop lag (so a saturated client is not mistaken for a
+slow server). Results are written as JSON under ``bench/results/`` so runs can
+be compared across commits.
+
+Against a running API:
+
+    python -m bench.loadgen --base-url http://localhost:8000 --rps 50 --duration 30
+
+Self-contained run (starts the mock LLM and the API on SQLite, then tears them down):
+
+    python -m bench.loadgen --spawn --rps 50 --duration 30 --mix detect-intent=6,chat=3,login=1
+
+Any JSONL file can be the traffic source (``--traffic requests.jsonl``); each
+line's ``message``, ``text``, ``body`` or ``title`` field is replayed in order.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+import uuid
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Optional
+
+import httpx
+
+RESULTS_DIR = Path(__file__).parent / "results"
+TEXT_FIELDS = ("message", "text", "body", "title")
+DEFAULT_MESSAGES = [
+    "hello there",
+    "can you summarize this article for me",
+    "write a python function to reverse a linked list",
+    "what does our onboarding document say about vacation days",
+    "please schedule a meeting with the design team tomorrow",
+    "run the time tool",
+    "I was wondering whether the new release fixed the memory leak we saw last week",
+]
+
+
+def percentile(sorted_values: list[float], q: float) -> Optional[float]:
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, round(q / 100 * len(sorted_values)) - 1))
+    return round(sorted_values[index], 2)
+
+
+def load_traffic(path: Optional[str]) -> list[str]:
+    """Messages to replay: one text field per JSONL line, or a built-in sample."""
+    if not path:
+        return DEFAULT_MESSAGES
+    messages = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                messages.append(line)
+                continue
+            if isinstance(record, str):
+                messages.append(record)
+                continue
+            text = next((record[k] for k in TEXT_FIELDS if isinstance(record.get(k), str) and record[k]), None)
+            if text:
+                messages.append(text)
+    if not messages:
+        raise SystemExit(f"No messages found in {path}")
+    return messages
+
+
+def parse_mix(spec: str) -> dict[str, float]:
+    mix = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in SCENARIOS:
+            raise SystemExit(f"Unknown scenario {name!r}; choose from {', '.join(SCENARIOS)}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+class ScenarioStats:
+    def __init__(self):
+        self.latencies_ms: list[float] = []
+        self.first_byte_ms: list[float] = []
+        self.status_codes: dict[str, int] = {}
+        self.errors: dict[str, int] = {}
+
+    def record(self, latency_ms: float, status: Optional[int], error: Optional[str] = None,
+               first_byte_ms: Optional[float] = None) -> None:
+        if status is not None:
+            self.status_codes[str(status)] = self.status_codes.get(str(status), 0) + 1
+        if error is not None:
+            self.errors[error] = self.errors.get(error, 0) + 1
+            return
+        self.latencies_ms.append(latency_ms)
+        if first_byte_ms is not None:
+            self.first_byte_ms.append(first_byte_ms)
+
+    def summary(self, elapsed_s: float) -> dict:
+        latencies = sorted(self.latencies_ms)
+        ok = len(latencies)
+        failed = sum(self.errors.values())
+        result = {
+            "requests": ok + failed,
+            "ok": ok,
+            "errors": failed,
+            "error_rate": round(failed / (ok + failed), 4) if ok + failed else 0.0,
+            "throughput_rps": round(ok / elapsed_s, 2) if elapsed_s else 0.0,
+            "latency_ms": {
+                "p50": percentile(latencies, 50),
+                "p95": percentile(latencies, 95),
+                "p99": percentile(latencies, 99),
+                "max": round(latencies[-1], 2) if latencies else None,
+                "mean": round(sum(latencies) / ok, 2) if ok else None,
+            },
+            "status_codes": self.status_codes,
+            "error_kinds": self.errors,
+        }
+        if self.first_byte_ms:
+            first = sorted(self.first_byte_ms)
+            result["first_token_ms"] = {"p50": percentile(first, 50), "p95": percentile(first, 95), "p99": percentile(first, 99)}
+        return result
+
+
+class LoopLagMonitor:
+    """Samples how late ``asyncio.sleep`` wakes up; sustained lag means the client is saturated."""
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.samples_ms: list[float] = []
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self.samples_ms.append(max(0.0, (loop.time() - expected) * 1000))
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    def summary(self) -> dict:
+        samples = sorted(self.samples_ms)
+        return {"p50": percentile(samples, 50), "p99": percentile(samples, 99),
+                "max": round(samples[-1], 2) if samples else None}
+
+
+class LoadGenerator:
+    def __init__(self, client: httpx.AsyncClient, messages: list[str], email: str, password: str, stream_chat: bool):
+        self.client = client
+        self.messages = messages
+        self.email = email
+        self.password = password
+        self.stream_chat = stream_chat
+        self.token: Optional[str] = None
+        self._next_message = 0
+
+    def message(self) -> str:
+        text = self.messages[self._next_message % len(self.messages)]
+        self._next_message += 1
+        return text
+
+    async def setup(self) -> None:
+        """Register the benchmark user (if needed) and log in once for authenticated scenarios."""
+        response = await self.client.post("/auth/register", json={"email": self.email, "password": self.password, "full_name": "Load Test"})
+        if response.status_code not in (201, 400):
+            response.raise_for_status()
+        response = await self.client.post("/auth/login", json={"email": self.email, "password": self.password})
+        response.raise_for_status()
+        self.token = response.json()["access_token"]
+
+    async def detect_intent(self, stats: ScenarioStats) -> None:
+        started = time.perf_counter()
+        response = await self.client.post("/detect-intent/", json={"message": self.message()})
+        self._finish(stats, started, response)
+
+    async def login(self, stats: ScenarioStats) -> None:
+        started = time.perf_counter()
+        response = await self.client.post("/auth/login", json={"email": self.email, "password": self.password})
+        self._finish(stats, started, response)
+
+    async def chat(self, stats: ScenarioStats) -> None:
+        headers = {"Authorization": f"Bearer {self.token}"}
+        body = {"message": self.message(), "stream": self.stream_chat}
+        started = time.perf_counter()
+        if not self.stream_chat:
+            response = await self.client.post("/chat/", json=body, headers=headers)
+            self._finish(stats, started, response)
+            return
+
+        first_token_ms = None
+        error = None
+        async with self.client.stream("POST", "/chat/", json=body, headers=headers) as response:
+            if response.status_code >= 400:
+                await response.aread()
+                self._finish(stats, started, response)
+                return
+            async for line in response.aiter_lines():
+                if line.startswith("event: error"):
+                    error = "stream_error"
+                elif first_token_ms is None and line.startswith('data: {"token"'):
+                    first_token_ms = (time.perf_counter() - started) * 1000
+        stats.record((time.perf_counter() - started) * 1000, response.status_code, error, first_token_ms)
+
+    @staticmethod
+    def _finish(stats: ScenarioStats, started: float, response: httpx.Response) -> None:
+        latency_ms = (time.perf_counter() - started) * 1000
+        error = f"http_{response.status_code}" if response.status_code >= 400 else None
+        stats.record(latency_ms, response.status_code, error)
+
+
+SCENARIOS = {
+    "detect-intent": LoadGenerator.detect_intent,
+    "chat": LoadGenerator.chat,
+    "login": LoadGenerator.login,
+}
+
+
+async def run_load(generator: LoadGenerator, mix: dict[str, float], rps: float, duration: float,
+                   max_in_flight: int, poisson: bool, seed: int) -> dict:
+    """Fire requests on an open-loop schedule; a slow server doesn't slow the arrival rate.
+
+    Arrivals that would exceed ``max_in_flight`` are counted as ``dropped``
+    instead of queueing inside the client.
+    """
+    rng = random.Random(seed)
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    stats = {name: ScenarioStats() for name in names}
+    in_flight: set[asyncio.Task] = set()
+    dropped = 0
+    lag = LoopLagMonitor()
+
+    async def one(name: str) -> None:
+        try:
+            await SCENARIOS[name](generator, stats[name])
+        except httpx.HTTPError as e:
+            stats[name].record(0.0, None, type(e).__name__)
+
+    loop = asyncio.get_running_loop()
+    lag.start()
+    started = loop.time()
+    next_at = started
+    while next_at - started < duration:
+        delay = next_at - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if len(in_flight) >= max_in_flight:
+            dropped += 1
+        else:
+            task = asyncio.create_task(one(rng.choices(names, weights)[0]))
+            in_flight.add(task)
+            task.add_done_callback(in_flight.discard)
+        next_at += rng.expovariate(rps) if poisson else 1 / rps
+    if in_flight:
+        await asyncio.wait(in_flight)
+    elapsed = loop.time() - started
+    await lag.stop()
+
+    return {
+        "elapsed_s": round(elapsed, 3),
+        "dropped": dropped,
+        "scenarios": {name: s.summary(elapsed) for name, s in stats.items()},
+        "total": _total(stats, elapsed),
+        "client_loop_lag_ms": lag.summary(),
+    }
+
+
+def _total(stats: dict[str, ScenarioStats], elapsed: float) -> dict:
+    combined = ScenarioStats()
+    for s in stats.values():
+        combined.latencies_ms.extend(s.latencies_ms)
+        for code, count in s.status_codes.items():
+            combined.status_codes[code] = combined.status_codes.get(code, 0) + count
+        for kind, count in s.errors.items():
+            combined.errors[kind] = combined.errors.get(kind, 0) + count
+    return combined.summary(elapsed)
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def _wait_until_up(url: str, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while True:
+            try:
+                await client.get(url, timeout=1.0)
+                return
+            except httpx.HTTPError:
+                if time.monotonic() > deadline:
+                    raise SystemExit(f"{url} did not come up within {timeout:.0f}s")
+                await asyncio.sleep(0.2)
+
+
+@asynccontextmanager
+async def spawned_stack(args):
+    """Start the mock LLM and the API (on ``--database-url``, SQLite by default) as subprocesses."""
+    env = {
+        **os.environ,
+        "DATABASE_URL": args.database_url,
+        "LLM_BASE_URLS": f"http://127.0.0.1:{args.mock_port}",
+        "SECRET_KEY": os.environ.get("SECRET_KEY", "bench-secret"),
+        # All load comes from 127.0.0.1, i.e. one rate-limit bucket; measure the pipeline instead
+        "ADMISSION_ENABLED": "true" if args.admission else "false",
+    }
+    mock = subprocess.Popen([sys.executable, "-m", "bench.mock_llm", "--port", str(args.mock_port), *args.mock_args.split()], env=env)
+    api = None
+    try:
+        subprocess.run([sys.executable, "-m", "app.create_table"], env=env, check=True)
+        api = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1",
+             "--port", str(args.api_port), "--log-level", "warning"],
+            env=env,
+        )
+        await _wait_until_up(f"http://127.0.0.1:{args.mock_port}/v1/models")
+        await _wait_until_up(f"http://127.0.0.1:{args.api_port}/")
+        yield f"http://127.0.0.1:{args.api_port}"
+    finally:
+        for process in (api, mock):
+            if process is not None:
+                process.terminate()
+                process.wait(timeout=10)
+
+
+async def main_async(args) -> dict:
+    messages = load_traffic(args.traffic)
+    mix = parse_mix(args.mix)
+    limits = httpx.Limits(max_connections=args.max_in_flight, max_keepalive_connections=args.max_in_flight)
+    timeout = httpx.Timeout(args.timeout)
+
+    async def run(base_url: str) -> dict:
+        async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=timeout) as client:
+            generator = LoadGenerator(client, messages, args.email, args.password, not args.no_stream)
+            await generator.setup()
+            if args.warmup > 0:
+                await run_load(generator, mix, args.rps, args.warmup, args.max_in_flight, args.poisson, args.seed)
+            return await run_load(generator, mix, args.rps, args.duration, args.max_in_flight, args.poisson, args.seed)
+
+    if args.spawn:
+        async with spawned_stack(args) as base_url:
+            return await run(base_url)
+    return await run(args.base_url)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Load-test the API at a target request rate")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--rps", type=float, default=20.0, help="target arrival rate (requests/second)")
+    parser.add_argument("--duration", type=float, default=30.0, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=0.0, help="unmeasured seconds before the run")
+    parser.add_argument("--mix", default="detect-intent=6,chat=3,login=1", help="scenario=weight,...")
+    parser.add_argument("--traffic", help="JSONL file of messages to replay (e.g. requests.jsonl)")
+    parser.add_argument("--max-in-flight", type=int, default=256)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--poisson", action="store_true", help="exponential inter-arrival times instead of a fixed rate")
+    parser.add_argument("--no-stream", action="store_true", help="call /chat with stream=false")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--email", default=f"loadtest-{uuid.uuid4().hex[:8]}@example.com")
+    parser.add_argument("--password", default="loadtest-password")
+    parser.add_argument("--label", default="", help="free-form tag stored with the results")
+    parser.add_argument("--output", help="results file (default: bench/results/<timestamp>-<rev>.json)")
+    spawn = parser.add_argument_group("self-contained run")
+    spawn.add_argument("--spawn", action="store_true", help="start the mock LLM and the API as subprocesses")
+    spawn.add_argument("--database-url", default="sqlite+aiosqlite:///bench/results/bench.db",
+                       help="database for the spawned API (SQLite or a local Postgres)")
+    spawn.add_argument("--api-port", type=int, default=8100)
+    spawn.add_argument("--mock-port", type=int, default=1234)
+    spawn.add_argument("--admission", action="store_true",
+                       help="keep rate limiting and load shedding on in the spawned API (off by default)")
+    spawn.add_argument("--mock-args", default="", help="extra arguments for bench.mock_llm, e.g. '--latency constant:50'")
+    args = parser.parse_args()
+
+    RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+    report = asyncio.run(main_async(args))
+    now = datetime.now(timezone.utc)
+    revision = _git_revision()
+    report = {
+        "timestamp": now.isoformat(timespec="seconds"),
+        "revision": revision,
+        "label": args.label,
+        "config": {
+            "base_url": "spawned" if args.spawn else args.base_url,
+            "database_url": args.database_url if args.spawn else None,
+            "mock_args": args.mock_args if args.spawn else None,
+            "rps": args.rps, "duration": args.duration, "mix": parse_mix(args.mix),
+            "traffic": args.traffic, "poisson": args.poisson, "stream_chat": not args.no_stream,
+            "max_in_flight": args.max_in_flight,
+        },
+        **report,
+    }
+    output = Path(args.output) if args.output else RESULTS_DIR / f"{now:%Y%m%dT%H%M%S}-{revision or 'norev'}.json"
+    output.write_text(json.dumps(report, indent=2))
+    print(json.dumps({"total": report["total"], "client_loop_lag_ms": report["client_loop_lag_ms"]}, indent=2))
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""OpenAI-compatible stand-in for LM Studio with configurable latency, token rate and errors.
+
+    python -m bench.mock_llm --port 1234 --latency lognormal:150,0.4 --tokens-per-second 80 --error-rate 0.01
+
+Intent-classifier prompts get valid intent JSON (one object, or {"results": [...]}
+for batched prompts) so the API's parsing paths are exercised realistically.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+import re
+import time
+
+import numpy as np
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+INTENTS = ["greeting", "task_request", "summarization", "rag_query", "coding_help", "agent_command", "unknown"]
+WORDS = "the model server streams tokens back to the client one small piece at a time".split()
+
+
+class LatencyDistribution:
+    """Parse ``constant:MS``, ``uniform:LO,HI``, ``exponential:MEAN`` or ``lognormal:MEDIAN,SIGMA``."""
+
+    def __init__(self, spec: str, rng: random.Random):
+        kind, _, args = spec.partition(":")
+        self.kind = kind
+        self.args = [float(a) for a in args.split(",") if a]
+        self.rng = rng
+        if kind not in ("constant", "uniform", "exponential", "lognormal"):
+            raise ValueError(f"Unknown latency distribution: {spec}")
+
+    def sample(self) -> float:
+        """Latency in seconds."""
+        if self.kind == "constant":
+            ms = self.args[0]
+        elif self.kind == "uniform":
+            ms = self.rng.uniform(self.args[0], self.args[1])
+        elif self.kind == "exponential":
+            ms = self.rng.expovariate(1 / self.args[0])
+        else:
+            ms = self.rng.lognormvariate(np.log(self.args[0]), self.args[1])
+        return max(ms, 0.0) / 1000
+
+
+def create_app(latency: str, tokens_per_second: float, error_rate: float,
+               completion_tokens: int, embedding_dim: int, seed: int) -> FastAPI:
+    rng = random.Random(seed)
+    first_token = LatencyDistribution(latency, rng)
+    app = FastAPI(title="Mock LLM")
+    stats = {"requests": 0, "errors": 0, "in_flight": 0}
+
+    def completion_text(messages: list[dict], max_tokens: int | None) -> list[str]:
+        prompt = messages[-1]["content"] if messages else ""
+        if "intent classifier" in prompt:
+            def one() -> dict:
+                return {"intent": rng.choice(INTENTS), "confidence": round(rng.uniform(0.5, 0.99), 2)}
+            if "User inputs:" in prompt:
+                count = len(re.findall(r"^\d+\. ", prompt, re.M))
+                text = json.dumps({"results": [one() for _ in range(count)]})
+            else:
+                text = json.dumps(one())
+            # Roughly 4 characters per token
+            return [text[i:i + 4] for i in range(0, len(text), 4)]
+        count = min(completion_tokens, max_tokens or completion_tokens)
+        return [rng.choice(WORDS) + " " for _ in range(count)]
+
+    def chunk(model: str, content: str) -> str:
+        return "data: " + json.dumps({"object": "chat.completion.chunk", "model": model,
+                                      "choices": [{"index": 0, "delta": {"content": content}}]}) + "\n\n"
+
+    @app.get("/v1/models")
+    async def models():
+        return {"object": "list", "data": [{"id": "mock", "object": "model"}]}
+
+    @app.get("/stats")
+    async def get_stats():
+        return stats
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        stats["requests"] += 1
+        if rng.random() < error_rate:
+            stats["errors"] += 1
+            return JSONResponse({"error": {"message": "injected failure"}}, status_code=503)
+
+        model = body.get("model", "mock")
+        tokens = completion_text(body.get("messages", []), body.get("max_tokens"))
+        delay = first_token.sample()
+        per_token = 1 / tokens_per_second if tokens_per_second > 0 else 0.0
+
+        if body.get("stream"):
+            async def events():
+                stats["in_flight"] += 1
+                try:
+                    await asyncio.sleep(delay)
+                    for token in tokens:
+                        yield chunk(model, token)
+                        if per_token:
+                            await asyncio.sleep(per_token)
+                    yield "data: [DONE]\n\n"
+                finally:
+                    stats["in_flight"] -= 1
+            return StreamingResponse(events(), media_type="text/event-stream")
+
+        stats["in_flight"] += 1
+        try:
+            await asyncio.sleep(delay + per_token * len(tokens))
+        finally:
+            stats["in_flight"] -= 1
+        return {
+            "id": f"mock-{time.time_ns()}",
+            "object": "chat.completion",
+            "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": "".join(tokens)}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": 0, "completion_tokens": len(tokens), "total_tokens": len(tokens)},
+        }
+
+    @app.post("/v1/embeddings")
+    async def embeddings(request: Request):
+        body = await request.json()
+        inputs = body.get("input", [])
+        inputs = [inputs] if isinstance(inputs, str) else inputs
+        await asyncio.sleep(first_token.sample() / 4)
+        data = []
+        for index, text in enumerate(inputs):
+            seed_bytes = hashlib.sha256(text.encode("utf-8")).digest()[:8]
+            vector = np.random.default_rng(int.from_bytes(seed_bytes, "little")).standard_normal(embedding_dim)
+            data.append({"object": "embedding", "index": index, "embedding": vector.astype(np.float32).tolist()})
+        return {"object": "list", "data": data, "model": body.get("model", "mock")}
+
+    return app
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Mock OpenAI-compatible LLM server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=1234)
+    parser.add_argument("--latency", default="lognormal:150,0.4", help="time to first token distribution (ms)")
+    parser.add_argument("--tokens-per-second", type=float, default=80.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--completion-tokens", type=int, default=64)
+    parser.add_argument("--embedding-dim", type=int, default=256)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    app = create_app(args.latency, args.tokens_per_second, args.error_rate,
+                     args.completion_tokens, args.embedding_dim, args.seed)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
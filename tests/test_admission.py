@@ -0,0 +1,129 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from app.services.admission import (
+    BULK,
+    INTERACTIVE,
+    STANDARD,
+    PriorityLimiter,
+    RateLimiter,
+    current_max_wait,
+    current_priority,
+)
+
+
+async def _waiter(limiter: PriorityLimiter, priority: int, max_wait=None, granted: list = None) -> float:
+    current_priority.set(priority)
+    current_max_wait.set(max_wait)
+    waited = await limiter.acquire()
+    if granted is not None:
+        granted.append(priority)
+    return waited
+
+
+def test_waiters_are_served_by_priority_then_arrival():
+    async def run():
+        limiter = PriorityLimiter(capacity=1)
+        await limiter.acquire()
+        granted = []
+        tasks = []
+        for priority in (BULK, STANDARD, INTERACTIVE, STANDARD):
+            tasks.append(asyncio.create_task(_waiter(limiter, priority, granted=granted)))
+            await asyncio.sleep(0)
+        assert limiter.waiting == 4
+        for _ in tasks:
+            limiter.release()
+            await asyncio.sleep(0)
+        await asyncio.gather(*tasks)
+        assert granted == [INTERACTIVE, STANDARD, STANDARD, BULK]
+        assert limiter.in_use == 1 and limiter.waiting == 0
+
+    asyncio.run(run())
+
+
+def test_expected_wait_past_the_budget_is_shed_without_queueing():
+    async def run():
+        limiter = PriorityLimiter(capacity=1)
+        await limiter.acquire()
+        limiter.hold_seconds = 2.0
+        with pytest.raises(HTTPException) as error:
+            await _waiter(limiter, STANDARD, max_wait=1.0)
+        assert error.value.status_code == 503
+        assert error.value.headers["Retry-After"] == "2"
+        assert limiter.waiting == 0 and limiter.shed == 1
+
+    asyncio.run(run())
+
+
+def test_timed_out_waiter_is_shed_and_leaks_no_slot():
+    async def run():
+        limiter = PriorityLimiter(capacity=1)
+        await limiter.acquire()
+        limiter.hold_seconds = 0.001  # looks admissible, then the holder never finishes in time
+        with pytest.raises(HTTPException) as error:
+            await _waiter(limiter, STANDARD, max_wait=0.02)
+        assert error.value.status_code == 503
+        assert limiter.waiting == 0
+        limiter.release()
+        assert limiter.in_use == 0
+
+    asyncio.run(run())
+
+
+def test_slot_granted_to_a_cancelled_waiter_is_passed_on():
+    async def run():
+        limiter = PriorityLimiter(capacity=1)
+        await limiter.acquire()
+        first = asyncio.create_task(_waiter(limiter, STANDARD))
+        second = asyncio.create_task(_waiter(limiter, STANDARD))
+        await asyncio.sleep(0)
+        # Grant the slot to the first waiter, then cancel it before it resumes
+        limiter.release()
+        first.cancel()
+        await asyncio.sleep(0)
+        await asyncio.wait_for(second, timeout=1)
+        assert first.cancelled()
+        assert limiter.in_use == 1 and limiter.waiting == 0
+
+    asyncio.run(run())
+
+
+def test_full_queue_displaces_the_newest_lower_priority_waiter():
+    async def run():
+        limiter = PriorityLimiter(capacity=1, max_queue=2)
+        await limiter.acquire()
+        older = asyncio.create_task(_waiter(limiter, BULK))
+        newer = asyncio.create_task(_waiter(limiter, BULK))
+        await asyncio.sleep(0)
+        urgent = asyncio.create_task(_waiter(limiter, INTERACTIVE))
+        await asyncio.sleep(0)
+
+        with pytest.raises(HTTPException) as error:
+            await newer
+        assert error.value.status_code == 503
+        # Full again, and nothing queued ranks below BULK: a BULK newcomer is refused
+        with pytest.raises(HTTPException):
+            await _waiter(limiter, BULK)
+
+        limiter.release()
+        await urgent
+        limiter.release()
+        await older
+        assert limiter.in_use == 1 and limiter.waiting == 0
+
+    asyncio.run(run())
+
+
+def test_rate_limiter_refuses_past_the_burst():
+    async def run():
+        limiter = RateLimiter(rate=1, burst=2, backend="memory")
+        assert await limiter.take("client") == 0
+        assert await limiter.take("client") == 0
+        assert await limiter.take("client") > 0
+        assert await limiter.take("other") == 0
+        # A cost above the burst is charged as a full bucket rather than refused forever
+        assert await RateLimiter(rate=1, burst=2, backend="memory").take("big", cost=50) == 0
+
+    asyncio.run(run())
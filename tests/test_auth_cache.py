@@ -0,0 +1,80 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+
+from app.utils import auth
+from app.utils.principal_cache import PrincipalCache, TokenCache
+
+
+class _Result:
+    def __init__(self, user):
+        self.user = user
+
+    def scalar_one_or_none(self):
+        return self.user
+
+
+class _Session:
+    """Stands in for the request's AsyncSession and counts the queries it runs."""
+
+    def __init__(self, user=None):
+        self.user = user
+        self.queries = 0
+
+    async def execute(self, statement):
+        self.queries += 1
+        return _Result(self.user)
+
+
+@pytest.fixture
+def caches(monkeypatch):
+    tokens, principals = TokenCache(maxsize=16), PrincipalCache(maxsize=16, ttl=60)
+    monkeypatch.setattr(auth, "token_cache", tokens)
+    monkeypatch.setattr(auth, "principal_cache", principals)
+    monkeypatch.setattr(auth, "AUTH_TRUST_TOKEN_CLAIMS", False)
+    return tokens, principals
+
+
+def test_verified_token_is_decoded_once_until_it_expires(monkeypatch, caches):
+    tokens, _ = caches
+    decodes = []
+
+    def decode(token):
+        decodes.append(token)
+        return {"user_id": 1, "exp": time.time() + (60 if token == "live" else -1)}
+
+    monkeypatch.setattr(auth, "decode_token", decode)
+    assert auth.decode_token_cached("live") == auth.decode_token_cached("live")
+    assert decodes == ["live"]
+    # An already expired payload is never cached
+    auth.decode_token_cached("expired")
+    auth.decode_token_cached("expired")
+    assert decodes == ["live", "expired", "expired"]
+
+
+def test_cached_principal_skips_the_database(caches):
+    token = auth.create_access_token({"user_id": 7})
+    db = _Session(SimpleNamespace(id=7, email="a@example.com", full_name="A"))
+
+    first = asyncio.run(auth.get_current_user(token, db))
+    second = asyncio.run(auth.get_current_user(token, db))
+    assert first == second and first.email == "a@example.com"
+    assert db.queries == 1
+
+    # Invalidation forces the next request back to the database
+    asyncio.run(caches[1].invalidate(7))
+    asyncio.run(auth.get_current_user(token, db))
+    assert db.queries == 2
+
+
+def test_unknown_user_is_rejected_and_not_cached(caches):
+    token = auth.create_access_token({"user_id": 9})
+    db = _Session(None)
+    for _ in range(2):
+        with pytest.raises(HTTPException) as error:
+            asyncio.run(auth.get_current_user(token, db))
+        assert error.value.status_code == 401
+    assert db.queries == 2
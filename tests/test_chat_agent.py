@@ -0,0 +1,48 @@
+import asyncio
+
+import pytest
+
+from app.services import chat_agent
+
+
+@pytest.fixture
+def fake_pipeline(monkeypatch):
+    """Intent detection slower than retrieval, so retrieval always finishes first."""
+    intent = {"name": "greeting"}
+
+    async def detect(message):
+        await asyncio.sleep(0.02)
+        return intent["name"], 0.9
+
+    async def recall(message, k):
+        return [{"text": "retrieved fact"}]
+
+    async def history(conversation_id):
+        return []
+
+    async def submit(**row):
+        return None
+
+    monkeypatch.setattr(chat_agent, "intent_detection_agent", detect)
+    monkeypatch.setattr(chat_agent.long_term_memory, "recall", recall)
+    monkeypatch.setattr(chat_agent.short_term_memory, "messages", history)
+    monkeypatch.setattr(chat_agent.intent_writer, "submit", submit)
+    return intent
+
+
+def _retrieval_status(plan) -> str:
+    return next(step["status"] for step in plan.trace.to_list() if step["name"] == "retrieval")
+
+
+def test_finished_speculative_retrieval_is_discarded_for_other_intents(fake_pipeline):
+    plan = asyncio.run(chat_agent.plan_chat_turn("user:1", "hello"))
+    assert plan.intent == "greeting"
+    assert "Retrieved context" not in plan.messages[0]["content"]
+    assert _retrieval_status(plan) == "discarded"
+
+
+def test_retrieval_is_used_for_retrieval_intents(fake_pipeline):
+    fake_pipeline["name"] = "rag_query"
+    plan = asyncio.run(chat_agent.plan_chat_turn("user:1", "what did we decide?"))
+    assert "Retrieved context:\n- retrieved fact" in plan.messages[0]["content"]
+    assert _retrieval_status(plan) == "ok"
@@ -0,0 +1,93 @@
+import asyncio
+import json
+
+import pytest
+
+from app.routers import chat
+from app.services.chat_agent import ChatPlan, Trace
+
+
+class _Request:
+    async def is_disconnected(self):
+        return False
+
+
+@pytest.fixture
+def saved(monkeypatch):
+    calls = []
+
+    async def save_turn(user, message, started_at, reply):
+        calls.append(reply)
+
+    monkeypatch.setattr(chat, "_save_turn", save_turn)
+    return calls
+
+
+def _stream(monkeypatch, tokens, fail=False):
+    async def chat_stream(messages):
+        for token in tokens:
+            yield token
+        if fail:
+            raise RuntimeError("upstream reset")
+
+    monkeypatch.setattr(chat.llm, "chat_stream", chat_stream)
+
+
+def _plan() -> ChatPlan:
+    return ChatPlan(intent="greeting", confidence=0.9, messages=[], trace=Trace())
+
+
+def _generation(plan: ChatPlan) -> dict:
+    return next(step for step in plan.trace.to_list() if step["name"] == "generation")
+
+
+async def _drain():
+    plan = _plan()
+    return plan, [frame async for frame in chat._relay_tokens(_Request(), plan, None, "hi", None)]
+
+
+def test_completed_stream_saves_the_reply_once(monkeypatch, saved):
+    _stream(monkeypatch, ["he", "llo"])
+    plan, frames = asyncio.run(_drain())
+    assert frames[-1].startswith("event: done")
+    assert saved == ["hello"]
+    assert _generation(plan)["status"] == "ok"
+
+
+def test_failed_stream_saves_the_message_once(monkeypatch, saved):
+    _stream(monkeypatch, ["he"], fail=True)
+    plan, frames = asyncio.run(_drain())
+    assert frames[-1] == 'event: error\ndata: {"detail": "upstream reset"}\n\n'
+    assert saved == [None]
+    assert _generation(plan)["status"] == "error"
+
+
+def test_failing_save_is_not_retried(monkeypatch):
+    _stream(monkeypatch, ["hello"])
+    calls = []
+
+    async def save_turn(user, message, started_at, reply):
+        calls.append(reply)
+        raise RuntimeError("database is locked")
+
+    monkeypatch.setattr(chat, "_save_turn", save_turn)
+    with pytest.raises(RuntimeError):
+        asyncio.run(_drain())
+    assert calls == ["hello"]
+
+
+def test_closed_generator_persists_as_cancelled(monkeypatch, saved):
+    _stream(monkeypatch, ["a", "b", "c"])
+
+    async def run():
+        plan = _plan()
+        relay = chat._relay_tokens(_Request(), plan, None, "hi", None)
+        assert json.loads((await relay.__anext__()).split("data: ")[1])["intent"] == "greeting"
+        await relay.__anext__()
+        # What the server does when the response task is torn down mid-stream
+        await relay.aclose()
+        return plan
+
+    plan = asyncio.run(run())
+    assert saved == [None]
+    assert _generation(plan)["status"] == "cancelled"
@@ -0,0 +1,48 @@
+import argparse
+import asyncio
+import json
+
+from app.classify_jsonl import Checkpoint, run
+
+MESSAGES = ["hello", "summarize this", "find it", "fix the bug", "hi", "do this"]
+
+
+def _args(tmp_path, **overrides) -> argparse.Namespace:
+    args = dict(
+        input=str(tmp_path / "in.jsonl"), output=str(tmp_path / "out.jsonl"), field=None, workers=0,
+        concurrency=4, chunk_size=2, pipeline_depth=2, persist=False, restart=False,
+    )
+    args.update(overrides)
+    return argparse.Namespace(**args)
+
+
+def _results(path) -> list[tuple]:
+    with open(path, encoding="utf-8") as f:
+        return [(r["line"], r["name"], r["raw_input"]) for r in map(json.loads, f)]
+
+
+def test_resume_truncates_past_the_checkpoint_and_continues(tmp_path):
+    args = _args(tmp_path)
+    lines = [json.dumps({"message": message}).encode() + b"\n" for message in MESSAGES]
+    (tmp_path / "in.jsonl").write_bytes(b"".join(lines))
+
+    checkpoint = asyncio.run(run(args))
+    assert checkpoint.lines == len(MESSAGES)
+    expected = _results(args.output)
+    assert [line for line, _, _ in expected] == list(range(len(MESSAGES)))
+
+    # Simulate a crash after the first chunk: a checkpoint for it, and a torn write after it
+    with open(args.output, "rb") as f:
+        first_chunk = f.readline() + f.readline()
+    with open(args.output, "wb") as f:
+        f.write(first_chunk + b'{"line": 2, "na')
+    state = Checkpoint(f"{args.output}.checkpoint")
+    state.input_offset = len(lines[0]) + len(lines[1])
+    state.output_size = len(first_chunk)
+    state.lines = 2
+    state.save(args.input)
+
+    checkpoint = asyncio.run(run(args))
+    assert checkpoint.lines == len(MESSAGES)
+    assert _results(args.output) == expected
+    assert not (tmp_path / "out.jsonl.checkpoint").exists()
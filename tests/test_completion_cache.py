@@ -0,0 +1,122 @@
+import asyncio
+import json
+
+import httpx
+
+from app.llm.completion_cache import CompletionCache, completion_key
+from app.llm.factory import LLM
+
+MESSAGES = [{"role": "user", "content": "classify this"}]
+
+
+def _mock_llm(requests: list[dict]) -> httpx.AsyncClient:
+    """An OpenAI-compatible backend that answers "answer <n>" to the n-th request."""
+    def handler(request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content)
+        requests.append(body)
+        content = f"answer {len(requests)}"
+        if body.get("stream"):
+            chunk = {"choices": [{"delta": {"content": content}}]}
+            sse = f"data: {json.dumps(chunk)}\n\ndata: [DONE]\n\n"
+            return httpx.Response(200, text=sse, headers={"content-type": "text/event-stream"})
+        return httpx.Response(200, json={"choices": [{"message": {"content": content}}]})
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+
+async def _collect(stream) -> str:
+    return "".join([delta async for delta in stream])
+
+
+def test_stale_streamed_entry_is_refreshed(tmp_path):
+    async def run():
+        requests: list[dict] = []
+        cache = CompletionCache(path=str(tmp_path / "cache.sqlite3"), ttl=0, stale_ttl=60)
+        llm = LLM(base_urls=["http://llm.test"], cache=cache, hedge=False)
+        llm._client = _mock_llm(requests)
+        try:
+            assert await _collect(llm.chat_stream(MESSAGES, temperature=0)) == "answer 1"
+            # ttl=0: already stale, served as-is while a refresh runs
+            assert await _collect(llm.chat_stream(MESSAGES, temperature=0)) == "answer 1"
+            await asyncio.gather(*llm._refreshing.values())
+
+            assert len(requests) == 2
+            assert "stream" not in requests[1]
+            key = completion_key({"temperature": 0, "model": llm.model, "messages": MESSAGES})
+            content, _ = await cache.get(key)
+            assert content == "answer 2"
+        finally:
+            await llm.aclose()
+
+    asyncio.run(run())
+
+
+def test_non_deterministic_requests_are_not_cached(tmp_path):
+    async def run():
+        requests: list[dict] = []
+        cache = CompletionCache(path=str(tmp_path / "cache.sqlite3"))
+        llm = LLM(base_urls=["http://llm.test"], cache=cache, hedge=False)
+        llm._client = _mock_llm(requests)
+        try:
+            assert await llm.chat(MESSAGES, temperature=0) == "answer 1"
+            assert await llm.chat(MESSAGES, temperature=0) == "answer 1"
+            assert await llm.chat(MESSAGES, temperature=0.7) == "answer 2"
+            assert await llm.chat(MESSAGES, temperature=0.7) == "answer 3"
+        finally:
+            await llm.aclose()
+
+    asyncio.run(run())
+
+
+def test_eviction_keeps_the_store_under_its_budget(tmp_path):
+    async def run():
+        cache = CompletionCache(path=str(tmp_path / "cache.sqlite3"), max_bytes=10_000)
+        try:
+            for i in range(100):
+                await cache.set(f"k{i}", "x" * 500)
+            assert cache.stats()["bytes"] <= 10_000
+            assert await cache.get("k0") is None
+            assert await cache.get("k99") == ("x" * 500, False)
+        finally:
+            await cache.close()
+
+    asyncio.run(run())
+
+
+def test_intent_stream_served_from_cache_is_not_written_back(tmp_path, monkeypatch):
+    from app.agents import intent_detection_agent as agent
+
+    async def run():
+        responses = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            responses.append(request)
+            if len(responses) > 1:
+                return httpx.Response(500)
+            # The object closes before the stream ends, so the agent stops early
+            chunks = ['{"intent": "greeting", ', '"confidence": 0.9}', " trailing"]
+            sse = "".join(f"data: {json.dumps({'choices': [{'delta': {'content': c}}]})}\n\n" for c in chunks)
+            return httpx.Response(200, text=sse + "data: [DONE]\n\n")
+
+        cache = CompletionCache(path=str(tmp_path / "cache.sqlite3"), ttl=0, stale_ttl=60)
+        llm = LLM(base_urls=["http://llm.test"], cache=cache, hedge=False)
+        llm._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        monkeypatch.setattr(agent, "llm", llm)
+        try:
+            result, _ = await agent._stream_intent_json("classify: hi", "m")
+            assert result == {"intent": "greeting", "confidence": 0.9}
+            writes = cache._writes
+
+            # Stale hit; the background refresh fails with a 500
+            result, _ = await agent._stream_intent_json("classify: hi", "m")
+            assert result == {"intent": "greeting", "confidence": 0.9}
+            await asyncio.gather(*llm._refreshing.values())
+            assert cache._writes == writes
+
+            params = agent._completion_params(agent.INTENT_RESPONSE_FORMAT, agent.INTENT_MAX_TOKENS)
+            payload = {**params, "model": "m", "messages": [{"role": "user", "content": "classify: hi"}]}
+            _, stale = await cache.get(completion_key(payload))
+            assert stale
+        finally:
+            await llm.aclose()
+
+    asyncio.run(run())
@@ -0,0 +1,67 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from app.routers import detect_intent
+from app.services import admission
+
+
+class _UploadRequest:
+    """NDJSON upload that records how many body chunks were read."""
+
+    def __init__(self, lines: int):
+        self.headers = {"content-type": "application/x-ndjson"}
+        self.client = None
+        self.lines = lines
+        self.chunks_read = 0
+
+    async def stream(self):
+        for i in range(self.lines):
+            self.chunks_read += 1
+            yield f'{{"message": "m{i}"}}\n'.encode()
+
+
+@pytest.fixture
+def bucket(monkeypatch):
+    limiter = admission.RateLimiter(rate=0.001, burst=3, backend="memory")
+    monkeypatch.setattr(admission, "ADMISSION_ENABLED", True)
+    monkeypatch.setattr(admission, "rate_limiter", limiter)
+    monkeypatch.setattr(detect_intent, "rate_limiter", limiter)
+    monkeypatch.setattr(detect_intent, "RATE_LIMIT_BATCH_ITEMS_PER_TOKEN", 2)
+    return limiter
+
+
+def test_empty_bucket_is_refused_before_the_body_is_read(bucket):
+    request = _UploadRequest(lines=4)
+    asyncio.run(bucket.take("ip:unknown", 3))
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(detect_intent.detect_intent_batch(request))
+    assert error.value.status_code == 429
+    assert request.chunks_read == 0
+
+
+def test_upload_is_cut_off_once_its_tokens_run_out(bucket):
+    request = _UploadRequest(lines=100)
+
+    async def run():
+        await bucket.take("ip:unknown", 1)
+        await admission.enter(request, admission.BULK)
+        return await detect_intent._read_messages(request)
+
+    # enter() and item 2 take the last two tokens; item 4 finds the bucket empty
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(run())
+    assert error.value.status_code == 429
+    assert request.chunks_read == 4
+
+
+def test_large_upload_costs_at_most_a_full_bucket(bucket):
+    request = _UploadRequest(lines=100)
+
+    async def run():
+        await admission.enter(request, admission.BULK)
+        return await detect_intent._read_messages(request)
+
+    assert asyncio.run(run()) == [f"m{i}" for i in range(100)]
+
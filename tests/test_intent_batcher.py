@@ -0,0 +1,121 @@
+import asyncio
+
+from fastapi import HTTPException
+
+from app.agents.intent_batcher import IntentBatcher
+from app.services.admission import BULK, INTERACTIVE, current_max_wait, current_priority
+
+
+def test_batch_runs_at_the_best_priority_and_tightest_budget_of_its_members():
+    async def run():
+        seen = []
+
+        async def classify_many(texts):
+            seen.append((current_priority.get(), current_max_wait.get()))
+            return [("greeting", 0.9) for _ in texts]
+
+        async def classify_one(text):
+            return await classify_many([text])
+
+        batcher = IntentBatcher(classify_one, classify_many, window_ms=20, max_size=16)
+
+        async def caller(text, priority, max_wait):
+            current_priority.set(priority)
+            current_max_wait.set(max_wait)
+            return await batcher.classify(text)
+
+        # The bulk caller opens the window; the interactive one joins it
+        bulk = asyncio.create_task(caller("a", BULK, 30.0))
+        await asyncio.sleep(0)
+        interactive = asyncio.create_task(caller("b", INTERACTIVE, 8.0))
+        await asyncio.gather(bulk, interactive)
+
+        assert seen == [(INTERACTIVE, 8.0)]
+        assert batcher.stats()["batches"] == 1
+
+        # The next batch starts from scratch
+        await caller("c", BULK, None)
+        assert seen[-1] == (BULK, None)
+
+    asyncio.run(run())
+
+
+def test_shed_batch_fails_all_waiters_without_per_item_retries():
+    async def run():
+        calls = {"many": 0, "one": 0}
+
+        async def classify_many(texts):
+            calls["many"] += 1
+            raise HTTPException(status_code=503, detail="overloaded", headers={"Retry-After": "1"})
+
+        async def classify_one(text):
+            calls["one"] += 1
+            return "greeting", 0.9
+
+        batcher = IntentBatcher(classify_one, classify_many, window_ms=5, max_size=16)
+        results = await asyncio.gather(*(batcher.classify(text) for text in "abcd"), return_exceptions=True)
+
+        assert all(isinstance(result, HTTPException) and result.status_code == 503 for result in results)
+        assert calls == {"many": 1, "one": 0}
+
+    asyncio.run(run())
+
+
+def test_unparsable_batch_falls_back_to_single_calls():
+    async def run():
+        async def classify_many(texts):
+            raise ValueError("Could not find a JSON array in LLM response")
+
+        async def classify_one(text):
+            return text, 0.5
+
+        batcher = IntentBatcher(classify_one, classify_many, window_ms=5, max_size=16)
+        assert await asyncio.gather(*(batcher.classify(text) for text in "ab")) == [("a", 0.5), ("b", 0.5)]
+
+    asyncio.run(run())
+
+
+def test_identical_inputs_in_flight_share_one_classification():
+    async def run():
+        batches = []
+
+        async def classify_many(texts):
+            batches.append(list(texts))
+            await asyncio.sleep(0.01)
+            return [(f"intent-{text}", 0.9) for text in texts]
+
+        async def classify_one(text):
+            return (await classify_many([text]))[0]
+
+        batcher = IntentBatcher(classify_one, classify_many, window_ms=5, max_size=16)
+        results = await asyncio.gather(*(batcher.classify(text) for text in "aabab"))
+
+        assert results == [("intent-a", 0.9), ("intent-a", 0.9), ("intent-b", 0.9), ("intent-a", 0.9), ("intent-b", 0.9)]
+        assert batches == [["a", "b"]]
+        assert batcher.coalesced == 3
+        # Once a result is delivered the input is no longer in flight; a repeat classifies again
+        assert batcher.stats()["in_flight"] == 0
+        await batcher.classify("a")
+        assert batches[-1] == ["a"]
+
+    asyncio.run(run())
+
+
+def test_cancelled_caller_does_not_cancel_the_shared_result():
+    async def run():
+        async def classify_many(texts):
+            await asyncio.sleep(0.01)
+            return [("greeting", 0.9) for _ in texts]
+
+        async def classify_one(text):
+            return (await classify_many([text]))[0]
+
+        batcher = IntentBatcher(classify_one, classify_many, window_ms=1, max_size=16)
+        first = asyncio.create_task(batcher.classify("hi"))
+        second = asyncio.create_task(batcher.classify("hi"))
+        await asyncio.sleep(0)
+        first.cancel()
+        assert await second == ("greeting", 0.9)
+        assert first.cancelled()
+
+    asyncio.run(run())
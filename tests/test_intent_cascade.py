@@ -0,0 +1,47 @@
+import asyncio
+
+from app.agents.intent_cascade import IntentCascade
+
+
+def _classifier(answers: dict[str, tuple[str, float]], calls: list):
+    async def classify(raw_input, model):
+        calls.append(model)
+        return answers[model]
+    return classify
+
+
+def test_first_confident_stage_answers():
+    cascade = IntentCascade(["small", "medium", "large"], max_depth=3, default_threshold=0.7, thresholds={})
+    calls = []
+    classify = _classifier({"small": ("greeting", 0.5), "medium": ("greeting", 0.7), "large": ("greeting", 0.99)}, calls)
+    assert asyncio.run(cascade.run("hi", classify)) == ("greeting", 0.7)
+    assert calls == ["small", "medium"]
+    assert cascade.stats() == {"resolved_by_model": {"medium": 1}, "unresolved": 0}
+
+
+def test_per_intent_thresholds_override_the_default():
+    cascade = IntentCascade(["small", "large"], max_depth=2, default_threshold=0.7, thresholds={"coding_help": 0.9})
+    calls = []
+    classify = _classifier({"small": ("coding_help", 0.8), "large": ("coding_help", 0.95)}, calls)
+    assert asyncio.run(cascade.run("fix my bug", classify)) == ("coding_help", 0.95)
+    assert calls == ["small", "large"]
+    assert cascade.accepts("greeting", 0.8)
+
+
+def test_no_confident_stage_returns_the_best_answer_within_max_depth():
+    cascade = IntentCascade(["small", "medium", "large"], max_depth=2, default_threshold=0.9, thresholds={})
+    calls = []
+    classify = _classifier({"small": ("rag_query", 0.6), "medium": ("task_request", 0.4), "large": ("x", 1.0)}, calls)
+    assert asyncio.run(cascade.run("q", classify)) == ("rag_query", 0.6)
+    assert calls == ["small", "medium"]
+    assert cascade.unresolved == 1
+
+
+def test_escalation_from_a_batched_first_stage_keeps_its_answer():
+    cascade = IntentCascade(["small", "large"], max_depth=2, default_threshold=0.7, thresholds={})
+    assert not cascade.record(0, ("summarization", 0.65))
+    calls = []
+    classify = _classifier({"large": ("summarization", 0.3)}, calls)
+    result = asyncio.run(cascade.run("tl;dr", classify, start=1, first=("summarization", 0.65)))
+    assert result == ("summarization", 0.65)
+    assert calls == ["large"]
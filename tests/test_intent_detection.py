@@ -0,0 +1,45 @@
+import asyncio
+
+from app.agents import intent_detection_agent as agent
+from app.utils.intent_detection import classify_many, rule_based_intent_detection
+
+
+def test_classify_many_matches_one_at_a_time():
+    messages = [
+        "hello there",
+        "",
+        "please summarize this",
+        "nothing to see",
+        "find the bug",
+        "Do   this now",
+        "hi",
+        "",
+    ]
+    assert classify_many(messages) == [rule_based_intent_detection(m) for m in messages]
+
+
+def test_keywords_never_match_across_message_boundaries():
+    # "do" + "this" only form the "do this" keyword if the join leaked them together
+    assert classify_many(["please do", "this"]) == [(None, None), (None, None)]
+    assert classify_many(["abc", "hi"]) == [(None, None), ("greeting", 0.95)]
+
+
+def test_highest_priority_rule_wins_within_a_message():
+    intent, _ = classify_many(["find the code, hello"])[0]
+    assert intent == "greeting"
+
+
+def test_rules_answer_before_the_cache_is_consulted(monkeypatch):
+    lookups = []
+
+    async def cache_get(raw_input):
+        lookups.append(raw_input)
+        return "coding_help", 0.99
+
+    monkeypatch.setattr(agent.intent_cache, "get", cache_get)
+    monkeypatch.setattr(agent, "record_resolution", lambda *args, **kwargs: None)
+
+    assert asyncio.run(agent.detect_intent_with_tier("hello there")) == ("greeting", 0.95, "rules")
+    assert lookups == []
+    assert asyncio.run(agent.detect_intent_with_tier("nothing to see")) == ("coding_help", 0.99, "cache")
+    assert lookups == ["nothing to see"]
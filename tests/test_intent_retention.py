@@ -0,0 +1,73 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.db import AsyncSessionLocal, Base
+from app.models.intent import Intent
+from app.models.intent_rollup import IntentRollup
+from app.services.intent_analytics import IntentRollups, minute_bucket
+
+pytest.importorskip("aiosqlite")
+
+
+async def _with_database(path, body):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all, tables=[Intent.__table__, IntentRollup.__table__])
+    AsyncSessionLocal.configure(bind=engine)
+    try:
+        return await body()
+    finally:
+        AsyncSessionLocal.configure(bind=None)
+        await engine.dispose()
+
+
+async def _count(model) -> int:
+    async with AsyncSessionLocal() as session:
+        return (await session.execute(select(func.count()).select_from(model))).scalar_one()
+
+
+def test_retention_deletes_expired_rows_in_batches_and_keeps_the_rest(tmp_path):
+    now = datetime.utcnow()
+    old, recent = now - timedelta(days=40), now - timedelta(days=1)
+
+    async def body():
+        async with AsyncSessionLocal() as session:
+            session.add_all(
+                [Intent(name="greeting", confidence=0.9, raw_input="hi", created_at=old) for _ in range(7)]
+                + [Intent(name="greeting", confidence=0.9, raw_input="hi", created_at=recent) for _ in range(3)]
+                + [
+                    IntentRollup(bucket=minute_bucket(now - timedelta(days=500)), intent="greeting", tier="rules",
+                                 count=7, confidence_sum=6.3),
+                    IntentRollup(bucket=minute_bucket(old), intent="greeting", tier="rules",
+                                 count=7, confidence_sum=6.3),
+                ]
+            )
+            await session.commit()
+
+        rollups = IntentRollups(retention_days=30, rollup_retention_days=400, retention_batch_size=3)
+        assert await rollups.apply_retention() == 7
+        assert await _count(Intent) == 3
+        # Rollups outlive the raw rows they summarise
+        assert await _count(IntentRollup) == 1
+        assert await rollups.apply_retention() == 0
+        assert rollups.stats()["deleted_rows"] == 7
+
+    asyncio.run(_with_database(tmp_path / "intents.db", body))
+
+
+def test_zero_retention_keeps_everything(tmp_path):
+    async def body():
+        async with AsyncSessionLocal() as session:
+            session.add(Intent(name="greeting", confidence=0.9, raw_input="hi",
+                               created_at=datetime.utcnow() - timedelta(days=4000)))
+            await session.commit()
+
+        rollups = IntentRollups(retention_days=0, rollup_retention_days=0)
+        assert await rollups.apply_retention() == 0
+        assert await _count(Intent) == 1
+
+    asyncio.run(_with_database(tmp_path / "intents.db", body))
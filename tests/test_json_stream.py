@@ -0,0 +1,42 @@
+from app.utils.json_stream import JsonObjectStreamParser
+
+
+def feed_all(chunks):
+    parser = JsonObjectStreamParser()
+    for chunk in chunks:
+        result = parser.feed(chunk)
+        if result is not None:
+            return result, parser
+    return None, parser
+
+
+def test_object_split_across_chunks():
+    result, _ = feed_all(['Sure: {"inte', 'nt": "greeting", ', '"confidence": 0.9', '} trailing'])
+    assert result == {"intent": "greeting", "confidence": 0.9}
+
+
+def test_returns_as_soon_as_the_object_closes():
+    result, parser = feed_all(['{"intent": "a", "confidence": 1}', ' never read'])
+    assert result == {"intent": "a", "confidence": 1}
+    assert parser.buffer == '{"intent": "a", "confidence": 1}'
+
+
+def test_braces_and_escaped_quotes_inside_strings_are_ignored():
+    chunks = ['{"intent": "co', 'ding_help", "note": "a } and a \\"{\\" ', 'here", "confidence": 0.5}']
+    result, _ = feed_all(chunks)
+    assert result == {"intent": "coding_help", "note": 'a } and a "{" here', "confidence": 0.5}
+
+
+def test_nested_objects():
+    result, _ = feed_all(['{"intent": "x", "meta": {"a": {"b": 1}}', ', "confidence": 0.2}'])
+    assert result == {"intent": "x", "meta": {"a": {"b": 1}}, "confidence": 0.2}
+
+
+def test_skips_an_invalid_object_and_finds_the_next():
+    result, _ = feed_all(['{not json} then ', '{"intent": "y", "confidence": 0.3}'])
+    assert result == {"intent": "y", "confidence": 0.3}
+
+
+def test_incomplete_object_returns_none():
+    result, _ = feed_all(['{"intent": "z", "confid'])
+    assert result is None
@@ -0,0 +1,77 @@
+import asyncio
+
+import httpx
+import pytest
+
+from app.config import LLM_HEALTH_FAILURE_THRESHOLD
+from app.llm.router import BackendRouter, track_request
+
+
+def _status_error(status: int) -> httpx.HTTPStatusError:
+    request = httpx.Request("POST", "http://a/v1/chat/completions")
+    return httpx.HTTPStatusError("error", request=request, response=httpx.Response(status, request=request))
+
+
+def _fail(backend, error: Exception) -> None:
+    with pytest.raises(type(error)):
+        with track_request(backend):
+            raise error
+
+
+def test_pick_prefers_the_backend_with_the_least_expected_wait():
+    router = BackendRouter(["http://a", "http://b"], health_check_interval=0)
+    a, b = router.backends
+    a.record_latency(100)
+    b.record_latency(300)
+    assert router.pick() is a
+    # Two requests queued on a make it (2 + 1) * 100 ms away, behind b's 300 ms
+    a.in_flight = 3
+    assert router.pick() is b
+    assert router.pick(exclude=[b]) is a
+
+
+def test_consecutive_server_errors_eject_a_backend():
+    router = BackendRouter(["http://a", "http://b"], health_check_interval=0)
+    a, b = router.backends
+    for _ in range(LLM_HEALTH_FAILURE_THRESHOLD - 1):
+        _fail(a, _status_error(502))
+    # A success resets the streak
+    with track_request(a):
+        pass
+    for _ in range(LLM_HEALTH_FAILURE_THRESHOLD - 1):
+        _fail(a, httpx.ConnectError("refused"))
+    assert a.healthy
+    _fail(a, httpx.ReadTimeout("slow"))
+    assert not a.healthy and a.in_flight == 0
+    assert router.healthy_count == 1
+    a.ewma_ms, b.ewma_ms = 1.0, 1000.0
+    assert router.pick() is b
+    assert router.pick(exclude=[b]) is None
+
+
+def test_client_errors_do_not_count_against_the_backend():
+    router = BackendRouter(["http://a"], health_check_interval=0)
+    [a] = router.backends
+    for _ in range(LLM_HEALTH_FAILURE_THRESHOLD * 2):
+        _fail(a, _status_error(400))
+    assert a.healthy and a.consecutive_failures == 0
+
+
+def test_all_backends_ejected_fails_open_and_a_probe_readmits():
+    router = BackendRouter(["http://a", "http://b"], health_check_interval=1)
+    for backend in router.backends:
+        for _ in range(LLM_HEALTH_FAILURE_THRESHOLD):
+            _fail(backend, httpx.ConnectError("refused"))
+    assert router.healthy_count == 0
+    assert router.pick() is not None
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200 if request.url.host == "b" else 503, json={"data": []})
+
+    async def probe():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            return await router.probe_all(client)
+
+    assert asyncio.run(probe()) == 1
+    assert [backend.healthy for backend in router.backends] == [False, True]
+    assert router.pick() is router.backends[1]
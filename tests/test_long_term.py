@@ -0,0 +1,54 @@
+import threading
+
+import numpy as np
+
+from app.memory.long_term import VectorStore
+
+
+def _vectors(rng, n, dim=16):
+    return rng.standard_normal((n, dim)).astype(np.float32)
+
+
+def test_search_finds_rows_added_after_the_ivf_build(tmp_path):
+    rng = np.random.default_rng(0)
+    store = VectorStore(str(tmp_path)).open()
+    store.add(_vectors(rng, 64), [{"i": i} for i in range(64)])
+    store.build_ivf(n_lists=4)
+    late = _vectors(rng, 1)
+    [late_id] = store.add(late, [{"i": "late"}])
+
+    scores, ids = store.search(late, k=1, nprobe=1)
+    assert ids[0, 0] == late_id
+    assert store.metadata([late_id]) == [{"i": "late"}]
+    reopened = VectorStore(str(tmp_path)).open()
+    assert reopened.count == 65 and reopened.search(late, k=1)[1][0, 0] == late_id
+
+
+def test_search_while_adding_never_sees_a_half_mapped_store(tmp_path):
+    rng = np.random.default_rng(1)
+    store = VectorStore(str(tmp_path)).open()
+    store.add(_vectors(rng, 32), [{} for _ in range(32)])
+    query = _vectors(rng, 1)
+    errors = []
+    done = threading.Event()
+
+    def search():
+        while not done.is_set():
+            try:
+                scores, ids = store.search(query, k=5)
+                assert ids.shape == (1, 5)
+                store.metadata(ids[0].tolist())
+            except Exception as e:
+                errors.append(e)
+                return
+
+    readers = [threading.Thread(target=search) for _ in range(4)]
+    for reader in readers:
+        reader.start()
+    for _ in range(200):
+        store.add(_vectors(rng, 1), [{}])
+    done.set()
+    for reader in readers:
+        reader.join()
+    assert errors == []
+    assert store.count == 232
@@ -0,0 +1,38 @@
+import json
+
+import numpy as np
+
+from app.utils.semantic_intent import SemanticIntentClassifier, train
+
+ROWS = [
+    ("greeting", "hello there friend"), ("greeting", "good morning to you"),
+    ("coding_help", "my python function throws an exception"), ("coding_help", "fix this stack trace"),
+]
+
+
+def test_retrain_swaps_files_under_a_live_memory_map(tmp_path):
+    train(ROWS, path=str(tmp_path), bits=10)
+    live = SemanticIntentClassifier(min_confidence=0.0)
+    assert live.load(str(tmp_path))
+    before = np.array(live.weights)
+
+    # A retrain with another label count must not touch the mapped file
+    train(ROWS + [("rag_query", "search the docs for pricing")], path=str(tmp_path), bits=10)
+    assert np.array_equal(np.array(live.weights), before)
+    assert not list(tmp_path.glob("*.tmp"))
+
+    fresh = SemanticIntentClassifier(min_confidence=0.0)
+    assert fresh.load(str(tmp_path))
+    assert fresh.weights.shape == (1 << 10, 3)
+    assert fresh.predict("hello friend")[0] == "greeting"
+
+
+def test_mismatched_labels_and_weights_are_not_loaded(tmp_path):
+    train(ROWS, path=str(tmp_path), bits=10)
+    meta = json.loads((tmp_path / "labels.json").read_text())
+    meta["labels"].append("rag_query")
+    (tmp_path / "labels.json").write_text(json.dumps(meta))
+
+    classifier = SemanticIntentClassifier()
+    assert not classifier.load(str(tmp_path))
+    assert not classifier.loaded